@@ -0,0 +1,9 @@
+"""Benchmarks do bot com históricos sintéticos de partidas.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks --tamanhos 1000 100000 1000000 --saida resultados.json
+    python -m benchmarks.carga --operacoes 2000 --concorrencia 50
+
+Os arquivos são gravados em um diretório temporário; os dados reais em data/ não são tocados.
+"""
@@ -0,0 +1,3 @@
+from benchmarks.executar import principal
+
+principal()
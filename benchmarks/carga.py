@@ -0,0 +1,277 @@
+"""Teste de carga ponta a ponta: executa os callbacks reais de bot.tree com um Discord falso local.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.carga --operacoes 2000 --concorrencia 50 --latencia-membros 0.05
+
+Cada operação é um comando slash (/game, /rank*, /rank_jogador...) disparado com Interaction,
+Member e Guild falsos. O prazo de 3 s do Discord vale para a primeira resposta (send_message ou
+defer); o relatório traz vazão, p50/p99, prazos perdidos e a verificação de que nenhuma partida ou
+ponto se perdeu (e de que os ratings batem), tanto em memória quanto após recarregar do disco.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import main
+from benchmarks.gerador import gerar_dados
+
+PRAZO_INTERACAO = 3.0  # segundos até a primeira resposta, como no Discord
+MISTURA_PADRAO = "game=4,rank=2,rank_semanal=1,rank_mensal=1,rank_all=0.5,rank_jogador=1.5"
+
+class MembroFalso:
+    def __init__(self, membro_id):
+        self.id = int(membro_id)
+        self.display_name = f"Jogador {str(membro_id)[-4:]}"
+        self.mention = f"<@{self.id}>"
+
+class GuildaFalsa:
+    """Guild com latência configurável nas buscas de membros (gateway e REST)"""
+
+    def __init__(self, guild_id, latencia, fracao_cache):
+        self.id = guild_id
+        self.latencia = latencia
+        self.fracao_cache = fracao_cache  # Fração dos membros presentes no cache do gateway
+        self.consultas = 0
+        self.fetches = 0
+
+    def get_member(self, membro_id):
+        # Determinístico por id: o mesmo membro está (ou não) sempre no cache
+        if (int(membro_id) % 1000) < self.fracao_cache * 1000:
+            return MembroFalso(membro_id)
+        return None
+
+    async def query_members(self, user_ids, limit):
+        self.consultas += 1
+        await asyncio.sleep(self.latencia)
+        return [MembroFalso(membro_id) for membro_id in user_ids]
+
+    async def fetch_member(self, membro_id):
+        self.fetches += 1
+        await asyncio.sleep(self.latencia)
+        return MembroFalso(membro_id)
+
+class RespostaFalsa:
+    def __init__(self, interacao):
+        self.interacao = interacao
+        self.respondida = False
+
+    def marcar(self, conteudo=None):
+        if not self.respondida:
+            self.respondida = True
+            self.interacao.primeira_resposta = time.perf_counter()
+        if conteudo is not None:
+            self.interacao.mensagens.append(conteudo)
+
+    async def send_message(self, content=None, **kwargs):
+        if self.respondida:
+            raise RuntimeError("Interação já respondida")
+        self.marcar(content)
+
+    async def defer(self, **kwargs):
+        if self.respondida:
+            raise RuntimeError("Interação já respondida")
+        self.marcar()
+
+    async def edit_message(self, content=None, **kwargs):
+        self.marcar(content)
+
+    def is_done(self):
+        return self.respondida
+
+class FollowupFalso:
+    def __init__(self, interacao):
+        self.interacao = interacao
+
+    async def send(self, content=None, **kwargs):
+        if not self.interacao.response.respondida:
+            raise RuntimeError("Followup antes da resposta inicial")
+        self.interacao.mensagens.append(content)
+
+class InteracaoFalsa:
+    def __init__(self, comando, guilda, usuario):
+        self.command = main.bot.tree.get_command(comando)
+        self.guild = guilda
+        self.guild_id = guilda.id
+        self.user = usuario
+        self.criada = time.perf_counter()
+        self.primeira_resposta = None
+        self.mensagens = []
+        self.response = RespostaFalsa(self)
+        self.followup = FollowupFalso(self)
+
+def ler_mistura(texto):
+    pesos = {}
+    for item in texto.split(","):
+        comando, peso = item.split("=")
+        pesos[comando.strip()] = float(peso)
+    return pesos
+
+def argumentos_comando(comando, aleatorio, membros, jogos):
+    """Argumentos do callback para uma invocação aleatória do comando"""
+    if comando == "game":
+        jogadores = aleatorio.sample(membros, aleatorio.randint(main.MINIMO_JOGADORES, len(main.POSICOES) - 2))
+        argumentos = {"jogo": aleatorio.choice(jogos), "duracao": f"{aleatorio.randint(5, 120)}m"}
+        argumentos.update({f"jogador{n}": membro for n, membro in enumerate(jogadores, start=1)})
+        return argumentos
+    if comando == "rank_jogador":
+        return {"jogador": aleatorio.choice(membros)}
+    modo = "rating" if aleatorio.random() < 0.3 else "pontos"
+    if comando in ("rank", "rank_semanal", "rank_mensal", "rank_anual"):
+        return {"jogo": aleatorio.choice(jogos) if aleatorio.random() < 0.3 else None, "modo": modo}
+    if comando == "rank_all":
+        return {"modo": modo}
+    return {}
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+def resumir(valores):
+    return {
+        "p50": percentil(valores, 0.50),
+        "p99": percentil(valores, 0.99),
+        "max": max(valores) if valores else None,
+        "media": statistics.fmean(valores) if valores else None,
+    }
+
+async def executar_carga(args):
+    aleatorio = random.Random(args.semente)
+    dados = gerar_dados(args.partidas_iniciais, args.jogadores, args.jogos, semente=args.semente)
+    await main.em_executor(main.init_persistence)
+    await main.em_executor(main.salvar_dados, dados)
+
+    guilda = GuildaFalsa(main.GUILD_ID, args.latencia_membros, args.cache_gateway)
+    main.bot.get_guild = lambda guild_id: guilda if guild_id == guilda.id else None
+    armazem = await main.guildas.obter(main.GUILD_ID)
+    iniciais = armazem.total_partidas()
+
+    membros = [MembroFalso(jogador_id) for jogador_id in dados["pontuacao"]] or \
+        [MembroFalso(100000000000000000 + n) for n in range(args.jogadores)]
+    jogos = armazem.jogos() or ["uno"]
+    pesos = ler_mistura(args.mistura)
+    comandos = list(pesos)
+
+    fila = [aleatorio.choices(comandos, weights=[pesos[c] for c in comandos])[0] for _ in range(args.operacoes)]
+    resultados = []
+    partidas_enviadas = []
+
+    async def trabalhador():
+        while fila:
+            comando = fila.pop()
+            interacao = InteracaoFalsa(comando, guilda, aleatorio.choice(membros))
+            argumentos = argumentos_comando(comando, aleatorio, membros, jogos)
+            erro = None
+            try:
+                await interacao.command.callback(interacao, **argumentos)
+            except Exception as e:
+                erro = repr(e)
+            fim = time.perf_counter()
+            falhou = erro is not None or any(str(m).startswith("❌") for m in interacao.mensagens if m)
+            if comando == "game" and not falhou:
+                partidas_enviadas.append(argumentos)
+            resultados.append({
+                "comando": comando,
+                "primeira_resposta": (interacao.primeira_resposta or fim) - interacao.criada,
+                "total": fim - interacao.criada,
+                "respondida": interacao.primeira_resposta is not None,
+                "falhou": falhou,
+                "erro": erro or next((m for m in interacao.mensagens if m and str(m).startswith("❌")), None),
+            })
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(args.concorrencia)))
+    duracao = time.perf_counter() - inicio
+
+    # Nenhuma atualização perdida: em memória e depois de recarregar do disco (anos arquivados incluídos)
+    await armazem.compactar_async()
+    partidas = await main.em_executor(armazem.arquivados.todas_partidas)
+    partidas += armazem.dados["partidas"]
+    recarregado = main.ArmazemDados(main.criar_backend())
+    await recarregado.carregar_async()
+    verificacao = {
+        "partidas_esperadas": iniciais + len(partidas_enviadas),
+        "partidas_em_memoria": len(partidas),
+        "partidas_no_disco": recarregado.total_partidas(),
+        "pontuacao_consistente": armazem.dados["pontuacao"] == main.recalcular_pontuacao(partidas),
+        "disco_igual_memoria": recarregado.dados == armazem.dados and recarregado.arquivados.anos == armazem.arquivados.anos,
+        "ratings_consistentes": recarregado.ratings.estado() == armazem.ratings.estado(),
+    }
+    verificacao["ok"] = (
+        verificacao["partidas_esperadas"] == verificacao["partidas_em_memoria"] == verificacao["partidas_no_disco"]
+        and verificacao["pontuacao_consistente"] and verificacao["disco_igual_memoria"]
+        and verificacao["ratings_consistentes"]
+    )
+
+    por_comando = {}
+    for resultado in resultados:
+        por_comando.setdefault(resultado["comando"], []).append(resultado)
+
+    def agregar(lista):
+        return {
+            "operacoes": len(lista),
+            "falhas": sum(r["falhou"] for r in lista),
+            "sem_resposta": sum(not r["respondida"] for r in lista),
+            "prazos_perdidos": sum(r["primeira_resposta"] > PRAZO_INTERACAO for r in lista),
+            "primeira_resposta": resumir([r["primeira_resposta"] for r in lista]),
+            "total": resumir([r["total"] for r in lista]),
+        }
+
+    erros = sorted({r["erro"] for r in resultados if r["erro"]})
+    return {
+        "parametros": {k: v for k, v in vars(args).items() if k != "saida"},
+        "duracao": duracao,
+        "vazao": len(resultados) / duracao if duracao else None,
+        "geral": agregar(resultados),
+        "por_comando": {comando: agregar(lista) for comando, lista in sorted(por_comando.items())},
+        "buscas_membros": {"query_members": guilda.consultas, "fetch_member": guilda.fetches},
+        "verificacao": verificacao,
+        "erros": erros[:20],
+    }
+
+def principal():
+    parser = argparse.ArgumentParser(description="Teste de carga com um Discord falso local")
+    parser.add_argument("--operacoes", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=50, help="Interações em andamento ao mesmo tempo")
+    parser.add_argument("--mistura", default=MISTURA_PADRAO, help="Pesos por comando (comando=peso,...)")
+    parser.add_argument("--latencia-membros", type=float, default=0.05,
+                        help="Latência (s) de query_members/fetch_member falsos")
+    parser.add_argument("--cache-gateway", type=float, default=0.0,
+                        help="Fração dos membros já no cache do gateway (0-1)")
+    parser.add_argument("--partidas-iniciais", type=int, default=10000)
+    parser.add_argument("--jogadores", type=int, default=200)
+    parser.add_argument("--jogos", type=int, default=10)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    saida = os.path.abspath(args.saida) if args.saida else None
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="carga_") as pasta, contextlib.redirect_stdout(sys.stderr):
+        os.chdir(pasta)  # Os caminhos de dados do bot são relativos: tudo fica no diretório temporário
+        try:
+            relatorio = asyncio.run(executar_carga(args))
+        finally:
+            os.chdir(diretorio_original)
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if saida:
+        with open(saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+        print(f"📄 Resultados gravados em {saida}", file=sys.stderr)
+    else:
+        print(texto)
+    if not relatorio["verificacao"]["ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    principal()
@@ -0,0 +1,210 @@
+"""Mede as operações principais do bot sobre históricos sintéticos e gera um relatório JSON"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import main
+from benchmarks.gerador import gerar_dados
+
+class MembroFalso:
+    def __init__(self, membro_id):
+        self.id = int(membro_id)
+        self.display_name = f"Jogador {str(membro_id)[-4:]}"
+
+class GuildaFalsa:
+    """Substitui a guild do discord.py: nenhum membro no cache do gateway, todos resolvidos em lote"""
+
+    def __init__(self, guild_id=main.GUILD_ID):
+        self.id = guild_id
+        self.consultas = 0  # Chamadas a query_members
+
+    def get_member(self, membro_id):
+        return None
+
+    async def query_members(self, user_ids, limit):
+        self.consultas += 1
+        return [MembroFalso(membro_id) for membro_id in user_ids]
+
+def medir(funcao, repeticoes, preparar=None):
+    """Executa `funcao` `repeticoes` vezes; `preparar` roda antes de cada execução, fora da medição"""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "min": min(tempos),
+        "mediana": statistics.median(tempos),
+        "media": statistics.fmean(tempos),
+        "repeticoes": repeticoes,
+    }
+
+def medir_memoria(caminhos):
+    """Memória (tracemalloc) do segmento vivo em dicts de um json.load e nas colunas do HistoricoColunar,
+    e do armazém carregado inteiro (colunas + baldes, agregados, confrontos, ratings)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with open(caminhos.dados, "rb") as f:
+            dados = json.load(f)
+        json_load = tracemalloc.get_traced_memory()[0]
+        colunas = main.HistoricoColunar()
+        for partida in dados["partidas"]:
+            colunas.adicionar(partida, main.timestamp_partida(partida))
+        del dados
+        gc.collect()
+        historico = tracemalloc.get_traced_memory()[0]
+        del colunas
+        gc.collect()
+
+        base = tracemalloc.get_traced_memory()[0]
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), main.GUILD_ID, caminhos)
+        armazem.carregar()
+        gc.collect()
+        carregado = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return {
+        "json_load": json_load,
+        "colunas": historico,
+        "reducao_historico": round(json_load / max(historico, 1), 2),
+        "armazem": carregado,
+        "armazem_estimada": armazem.memoria_estimada(),
+    }
+
+def medir_tamanho(pasta, partidas, args, loop):
+    """Resultados de todas as operações para um histórico de `partidas` partidas"""
+    dados = gerar_dados(partidas, args.jogadores, args.jogos, args.dias, args.semente)
+    caminhos = main.Caminhos(os.path.join(pasta, str(partidas)))
+    main.init_persistence(caminhos)
+    resultados = {}
+
+    resultados["salvar_dados"] = medir(lambda: main.salvar_dados(dados, caminhos.dados), args.repeticoes)
+    resultados["tamanho_arquivo"] = os.path.getsize(caminhos.dados)
+    resultados["carregar_dados"] = medir(lambda: main.carregar_dados(caminhos), args.repeticoes)
+
+    # Carga completa do armazém: arquivo + journal + índices derivados. A primeira carga move os anos
+    # fechados para o arquivo e fica fora da medição; as seguintes leem só o segmento vivo
+    armazem = main.ArmazemDados(main.BackendJSON(caminhos), main.GUILD_ID, caminhos)
+    armazem.carregar()
+    resultados["partidas_arquivadas"] = armazem.arquivados.total_partidas()
+    resultados["carregar_armazem"] = medir(armazem.carregar, args.repeticoes)
+    resultados["memoria"] = medir_memoria(caminhos)
+
+    jogo_mais_jogado = max(armazem.jogos(), key=lambda jogo: len(armazem.indices.linha_do_tempo.get(jogo, ((),))[0]))
+
+    # Caminhos dos comandos /rank*: agregados do período (baldes diários + linha do tempo) e a
+    # mensagem renderizada por gerar_ranking, sem cache de rankings/nomes e depois servida do cache
+    guilda = GuildaFalsa()
+    main.bot.get_guild = lambda guild_id: guilda
+
+    def limpar_rankings():
+        main.cache_nomes = main.CacheNomes()
+        armazem.rankings.limpar()
+
+    for periodo in (None, "semana", "mes", "ano"):
+        for jogo in (None, jogo_mais_jogado):
+            sufixo = f"[{periodo or 'geral'}{', jogo' if jogo else ''}]"
+            resultados[f"estatisticas_periodo{sufixo}"] = medir(
+                lambda: armazem.estatisticas_periodo(periodo, jogo), args.repeticoes
+            )
+            resultados[f"gerar_ranking{sufixo}"] = medir(
+                lambda: loop.run_until_complete(main.gerar_ranking(armazem, periodo, jogo, "Ranking")),
+                args.repeticoes, limpar_rankings
+            )
+    loop.run_until_complete(main.gerar_ranking(armazem, "mes", None, "Ranking"))
+    resultados["gerar_ranking[mes, cache]"] = medir(
+        lambda: loop.run_until_complete(main.gerar_ranking(armazem, "mes", None, "Ranking")), args.repeticoes
+    )
+    resultados["estatisticas_rating[geral]"] = medir(lambda: armazem.estatisticas_rating(), args.repeticoes)
+
+    amostra = list(dados["pontuacao"])[:args.amostra_jogadores]
+    total = medir(lambda: [armazem.estatisticas_jogador(j) for j in amostra], args.repeticoes)
+    resultados["rank_jogador"] = {
+        **{chave: valor / len(amostra) for chave, valor in total.items() if chave != "repeticoes"},
+        "repeticoes": args.repeticoes,
+        "jogadores_por_repeticao": len(amostra),
+    }
+
+    guilda.consultas = 0
+    resultados["rank_all"] = medir(
+        lambda: loop.run_until_complete(main.gerar_rankings_jogos(armazem, guilda)),
+        args.repeticoes, limpar_rankings
+    )
+    resultados["rank_all"]["consultas_membros"] = guilda.consultas // args.repeticoes
+    resultados["rank_all[cache]"] = medir(
+        lambda: loop.run_until_complete(main.gerar_rankings_jogos(armazem, guilda)), args.repeticoes
+    )
+    return resultados
+
+def comparar(atual, anterior):
+    """Razão entre as medianas (atual / anterior) das operações presentes nos dois relatórios"""
+    comparacao = {}
+    for tamanho, operacoes in atual["resultados"].items():
+        antigas = anterior.get("resultados", {}).get(tamanho, {})
+        for nome, medida in operacoes.items():
+            if isinstance(medida, dict) and isinstance(antigas.get(nome), dict) and antigas[nome]["mediana"]:
+                comparacao.setdefault(tamanho, {})[nome] = round(medida["mediana"] / antigas[nome]["mediana"], 3)
+    return comparacao
+
+def principal():
+    parser = argparse.ArgumentParser(description="Benchmarks do bot com históricos sintéticos")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 100000],
+                        help="Quantidades de partidas (ex: 1000 100000 1000000)")
+    parser.add_argument("--jogadores", type=int, default=2000)
+    parser.add_argument("--jogos", type=int, default=30)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--amostra-jogadores", type=int, default=100)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--comparar", help="Relatório JSON anterior para comparar as medianas")
+    args = parser.parse_args()
+
+    relatorio = {
+        "criado": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "numpy": main.np is not None,
+        "parametros": {
+            "jogadores": args.jogadores, "jogos": args.jogos, "dias": args.dias,
+            "semente": args.semente, "repeticoes": args.repeticoes,
+        },
+        "resultados": {},
+    }
+
+    loop = asyncio.new_event_loop()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_") as pasta, contextlib.redirect_stdout(sys.stderr):
+            for partidas in args.tamanhos:
+                print(f"⏱️ {partidas} partidas...")
+                relatorio["resultados"][str(partidas)] = medir_tamanho(pasta, partidas, args, loop)
+    finally:
+        loop.close()
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            relatorio["comparacao"] = comparar(relatorio, json.load(f))
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(saida + "\n")
+        print(f"📄 Resultados gravados em {args.saida}", file=sys.stderr)
+    else:
+        print(saida)
+
+if __name__ == "__main__":
+    principal()
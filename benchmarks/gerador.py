@@ -0,0 +1,64 @@
+"""Gerador de históricos sintéticos no formato do dados.json"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+import main
+
+NOMES_JOGOS = [
+    "Uno", "Xadrez", "Catan", "Dama", "Truco", "Poker", "Ticket to Ride", "Carcassonne", "Dixit",
+    "Azul", "Splendor", "Codenames", "Coup", "Sushi Go", "King of Tokyo", "Pandemic", "Dominó",
+    "Buraco", "War", "Banco Imobiliário", "Detetive", "Jenga", "Mahjong", "Gartic", "Mario Kart",
+    "Smash", "FIFA", "Among Us", "Fall Guys", "Valorant", "League of Legends", "Rocket League",
+]
+
+def gerar_dados(partidas, jogadores=2000, jogos=30, dias=730, semente=0, fim=None):
+    """Histórico com `partidas` partidas em ordem cronológica, terminando em `fim` (padrão: agora).
+
+    A atividade é desigual, como no uso real: poucos jogadores e jogos concentram a maior parte
+    das partidas (pesos seguindo uma cauda de Pareto)."""
+    aleatorio = random.Random(semente)
+    fim = fim or datetime.now()
+    inicio = fim - timedelta(days=dias)
+
+    ids = [str(100000000000000000 + aleatorio.randrange(10 ** 17)) for _ in range(jogadores)]
+    pesos_jogadores = [aleatorio.paretovariate(1.2) for _ in ids]
+    nomes = [NOMES_JOGOS[i] if i < len(NOMES_JOGOS) else f"Jogo {i + 1}" for i in range(jogos)]
+    pesos_jogos = [aleatorio.paretovariate(1.5) for _ in nomes]
+    maximo = min(len(main.POSICOES), jogadores)
+
+    segundos = (fim - inicio).total_seconds()
+    instantes = sorted(aleatorio.random() * segundos for _ in range(partidas))
+    lista = []
+    for instante in instantes:
+        quantidade = aleatorio.randint(main.MINIMO_JOGADORES, maximo)
+        participantes = set()
+        while len(participantes) < quantidade:
+            participantes.update(aleatorio.choices(ids, weights=pesos_jogadores, k=quantidade - len(participantes)))
+        participantes = list(participantes)
+        aleatorio.shuffle(participantes)
+        lista.append({
+            "jogo": aleatorio.choices(nomes, weights=pesos_jogos)[0],
+            "duracao": f"{aleatorio.randint(5, 180)}m",
+            "data": (inicio + timedelta(seconds=instante)).isoformat(),
+            "jogadores": participantes,
+        })
+
+    return {"partidas": lista, "pontuacao": main.recalcular_pontuacao(lista)}
+
+def principal():
+    parser = argparse.ArgumentParser(description="Gera um dados.json sintético")
+    parser.add_argument("partidas", type=int)
+    parser.add_argument("saida", help="Arquivo de saída (.json)")
+    parser.add_argument("--jogadores", type=int, default=2000)
+    parser.add_argument("--jogos", type=int, default=30)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    dados = gerar_dados(args.partidas, args.jogadores, args.jogos, args.dias, args.semente)
+    main.salvar_dados(dados, args.saida)
+    print(f"📄 {len(dados['partidas'])} partidas gravadas em {args.saida}")
+
+if __name__ == "__main__":
+    principal()
@@ -1,15 +1,37 @@
 import os
 import discord
 import json
+import msgspec
 import asyncio
+import bisect
+import contextlib
+import contextvars
 import shutil
+import sqlite3
+import sys
+import tempfile
 import atexit
+import functools
+import gzip
+import hashlib
+import itertools
+import time
 import traceback
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
 from datetime import datetime, timedelta
+from typing import Annotated, Literal, TypedDict
 from discord.ext import commands
 from discord import app_commands
 
+try:
+    import numpy as np
+except ImportError:  # Opcional: sem NumPy a agregação colunar roda em Python puro
+    np = None
+
 # ======================
 # CONFIGURAÇÕES GLOBAIS
 # ======================
@@ -20,12 +42,64 @@ GUILD_ID = 709705286083936256
 DATA_DIR = "data"
 DADOS_FILE = os.path.join(DATA_DIR, "dados.json")
 BACKUP_DIR = os.path.join(DATA_DIR, "backups")
+JOURNAL_FILE = os.path.join(DATA_DIR, "partidas.jsonl")
+COMPACTAR_A_CADA = 500  # Partidas no journal antes de consolidar no dados.json
+DADOS_COMPACTOS = os.getenv("DADOS_COMPACTOS", "1") == "1"  # "0" grava o dados.json indentado, como antes
+AGENDADOR_FILE = os.path.join(DATA_DIR, "agendador.json")  # Última execução de cada ranking automático, por guilda
+GUILDAS_FILE = os.path.join(DATA_DIR, "guildas.json")  # Configuração de cada guilda (canal de rankings, mínimo de jogadores)
+GUILDAS_DIR = os.path.join(DATA_DIR, "guildas")  # Dados das demais guildas; a original (GUILD_ID) fica na raiz de DATA_DIR
+SNAPSHOT_A_CADA = 1000  # Partidas acumuladas em deltas antes de um novo snapshot completo
+DIAS_BALDES = 366  # Dias cobertos pelos agregados diários (janela anual + dia corrente)
+ARQUIVAR_APOS_DIAS = DIAS_BALDES  # Um ano é arquivado quando já saiu de todas as janelas móveis
+CONFRONTOS_JOGADORES = 1 << 24  # Limites de índices (jogadores, jogos) na chave da matriz de confrontos
+CONFRONTOS_JOGOS = 1 << 12
+CONFRONTOS_RECENTES = 50000  # Pares atualizados em dict antes de consolidar nos arrays da matriz
+BYTES_POR_CONFRONTO = 200  # Estimativa de memória de cada par ainda no dict de recentes
+RATING_INICIAL = 1500  # Rating (Elo) de quem ainda não jogou
+RATING_K = 32  # Ajuste máximo por partida, dividido entre os adversários
+RATING_MINIMO_PARTIDAS = 5  # Partidas (no jogo do ranking) para aparecer no ranking por rating
+RATING_CHECKPOINT_A_CADA = 1000  # Partidas, em ordem cronológica, entre checkpoints dos ratings
+RATING_CHECKPOINTS_MAX = 10  # Checkpoints mantidos (os mais recentes)
+BYTES_POR_RATING = 50  # Memória de cada rating (estado atual e checkpoints, ids compartilhados), medida com 50 mil partidas
+RETENCAO_BACKUPS = {"horas": 24, "dias": 30, "meses": 12}  # Um backup por hora/dia/mês nessas janelas
+BACKEND_ARMAZENAMENTO = os.getenv("STORAGE_BACKEND", "json")  # "json" ou "sqlite"
 POSICOES = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
-CANAL_RANKING_ID = 1360294622768926901
-MINIMO_JOGADORES = 2
+CANAL_RANKING_ID = 1360294622768926901  # Canal padrão da guilda original
+MINIMO_JOGADORES = 2  # Padrão de cada guilda e menor valor aceito pelo esquema
+EXPORTAR_BLOCO = 1000  # Partidas codificadas por escrita na exportação
+PARTIDAS_POR_PAGINA = 5  # Partidas exibidas por página no /view_data
+GRUPO_MAX = 256  # Partidas gravadas no máximo em uma única escrita em grupo
 
 # Lock para operações de arquivo
 file_lock = Lock()
+backup_lock = Lock()
+
+# Cache de nomes de exibição dos membros
+NOMES_TTL = 6 * 3600  # segundos até um nome ser considerado desatualizado
+NOMES_MAX = 5000  # entradas mantidas no cache (LRU)
+
+# Cache de mensagens de ranking já renderizadas (por guilda)
+RANKINGS_CACHE_MAX = 128
+
+# Guildas carregadas em memória: sob demanda, descarregadas quando ociosas ou acima do orçamento (LRU)
+MEMORIA_GUILDAS = int(os.getenv("MEMORIA_GUILDAS_MB", "512")) * 1024 * 1024
+BYTES_POR_PARTIDA = 1600  # Memória por partida (colunas + baldes + agregados), medida com 50 mil partidas do benchmarks.gerador
+GUILDA_OCIOSA = 3600  # segundos sem comandos até uma guilda ser descarregada
+GUILDAS_VERIFICAR = 300  # segundos entre verificações de guildas ociosas
+AGENDADOR_REPETIR = 60  # segundos até tentar de novo um ranking automático que falhou
+
+# Executor dedicado: todo I/O de disco e JSON roda fora do event loop, em uma única thread
+persistencia_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistencia")
+
+# Monitoramento do atraso do event loop
+LAG_INTERVALO = 1.0  # segundos entre medições
+LAG_ALERTA = 0.25  # atraso (s) a partir do qual é emitido um aviso
+lag_loop = {"ultimo": 0.0, "maximo": 0.0, "alertas": 0}
+
+# Métricas (histogramas de latência, tempos de armazenamento, chamadas REST)
+METRICAS_FILE = os.path.join(DATA_DIR, "metricas.prom")  # Formato texto do Prometheus (textfile collector)
+METRICAS_INTERVALO = 60  # segundos entre exportações do arquivo de métricas
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # buckets (s)
 
 # ======================
 # INICIALIZAÇÃO DO BOT
@@ -35,166 +109,2642 @@ intents.message_content = True
 intents.members = True
 bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
 
+# ======================
+# MÉTRICAS
+# ======================
+class Histograma:
+    """Contagens por bucket (limites superiores), como um histograma do Prometheus"""
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # O último bucket é o +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, p):
+        """Limite superior do bucket que contém o percentil `p` (0-1)"""
+        acumulado = 0
+        for limite, contagem in zip(self.limites + (float("inf"),), self.contagens):
+            acumulado += contagem
+            if acumulado >= p * self.total:
+                return limite
+        return 0.0
+
+class Metricas:
+    """Contadores, medidores e histogramas em memória; atualizados tanto do event loop quanto do executor"""
+
+    AJUDA = {
+        "bot_comando_latencia_segundos": "Tempo de execução de cada comando slash",
+        "bot_comando_erros_total": "Comandos que terminaram com exceção",
+        "bot_armazenamento_segundos": "Tempo gasto carregando, indexando e gravando dados",
+        "bot_agregacao_segundos": "Tempo gasto agregando estatísticas",
+        "bot_discord_rest_total": "Chamadas REST à API do Discord, por comando e rota",
+        "bot_consultas_membros_total": "Buscas de membros em lote pelo gateway",
+        "bot_event_loop_atraso_segundos": "Atraso do event loop para acordar de um sleep curto",
+        "bot_arquivo_dados_bytes": "Tamanho dos arquivos de dados da guilda",
+        "bot_partidas": "Partidas da guilda em memória (incluindo as dos anos arquivados)",
+    }
+
+    def __init__(self):
+        self.lock = Lock()
+        self.tipos = {}  # nome -> "counter" | "gauge" | "histogram"
+        self.series = {}  # nome -> {rótulos (tupla ordenada): valor ou Histograma}
+
+    def serie(self, nome, tipo, rotulos):
+        self.tipos.setdefault(nome, tipo)
+        return self.series.setdefault(nome, {}), tuple(sorted(rotulos.items()))
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        with self.lock:
+            series, chave = self.serie(nome, "counter", rotulos)
+            series[chave] = series.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        with self.lock:
+            series, chave = self.serie(nome, "gauge", rotulos)
+            series[chave] = valor
+
+    def observar(self, nome, valor, **rotulos):
+        with self.lock:
+            series, chave = self.serie(nome, "histogram", rotulos)
+            if chave not in series:
+                series[chave] = Histograma()
+            series[chave].observar(valor)
+
+    @contextlib.contextmanager
+    def cronometro(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def remover(self, nome):
+        """Descarta todas as séries de uma métrica (ex: medidores de guildas descarregadas)"""
+        with self.lock:
+            self.series.pop(nome, None)
+
+    def obter(self, nome):
+        """{rótulos: valor ou Histograma} de uma métrica (cópia rasa, segura para iterar)"""
+        with self.lock:
+            return dict(self.series.get(nome, {}))
+
+    def prometheus(self):
+        """Todas as séries no formato texto de exposição do Prometheus"""
+        def formatar(rotulos):
+            if not rotulos:
+                return ""
+            escapados = (
+                (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in rotulos
+            )
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escapados) + "}"
+
+        linhas = []
+        with self.lock:
+            for nome in sorted(self.series):
+                tipo = self.tipos[nome]
+                if nome in self.AJUDA:
+                    linhas.append(f"# HELP {nome} {self.AJUDA[nome]}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+                for rotulos, valor in sorted(self.series[nome].items()):
+                    if tipo != "histogram":
+                        linhas.append(f"{nome}{formatar(rotulos)} {valor}")
+                        continue
+                    acumulado = 0
+                    for limite, contagem in zip(valor.limites + ("+Inf",), valor.contagens):
+                        acumulado += contagem
+                        linhas.append(f"{nome}_bucket{formatar(rotulos + (('le', limite),))} {acumulado}")
+                    linhas.append(f"{nome}_sum{formatar(rotulos)} {valor.soma}")
+                    linhas.append(f"{nome}_count{formatar(rotulos)} {valor.total}")
+        return "\n".join(linhas) + "\n"
+
+metricas = Metricas()
+comando_atual = contextvars.ContextVar("comando_atual", default=None)  # Comando slash em execução na tarefa
+
+def cronometrado(nome, **rotulos):
+    """Decorador: registra a duração de cada chamada da função no histograma `nome`"""
+    def decorador(func):
+        @functools.wraps(func)
+        def medida(*args, **kwargs):
+            with metricas.cronometro(nome, **rotulos):
+                return func(*args, **kwargs)
+        return medida
+    return decorador
+
+def medir_comando(func):
+    """Decorador dos comandos slash: latência, erros e chamadas REST atribuídas ao comando.
+    Enquanto o comando roda, os dados da guilda dele não são descarregados da memória."""
+    @functools.wraps(func)
+    async def medido(interaction, *args, **kwargs):
+        nome = interaction.command.name if interaction.command else func.__name__
+        token = comando_atual.set(nome)
+        inicio = time.perf_counter()
+        try:
+            with guildas.fixada(interaction.guild_id):
+                return await func(interaction, *args, **kwargs)
+        except Exception:
+            metricas.incrementar("bot_comando_erros_total", comando=nome)
+            raise
+        finally:
+            metricas.observar("bot_comando_latencia_segundos", time.perf_counter() - inicio, comando=nome)
+            comando_atual.reset(token)
+    return medido
+
+async def responder(interaction, *args, **kwargs):
+    """Responde à interação; se a resposta já foi adiada (guilda carregando do disco), vai pelo followup"""
+    if interaction.response.is_done():
+        return await interaction.followup.send(*args, **kwargs)
+    return await interaction.response.send_message(*args, **kwargs)
+
+_requisicao_rest = bot.http.request
+
+async def requisicao_rest_medida(route, **kwargs):
+    # Rota sem parâmetros (ex: GET /guilds/{guild_id}/members/{user_id}), para não explodir as séries
+    metricas.incrementar("bot_discord_rest_total", comando=comando_atual.get() or "-", rota=f"{route.method} {route.path}")
+    return await _requisicao_rest(route, **kwargs)
+
+bot.http.request = requisicao_rest_medida
+
+# ======================
+# ESQUEMA DOS DADOS
+# ======================
+JogadorId = Annotated[str, msgspec.Meta(pattern=r"^\d+$")]
+
+class Partida(TypedDict):
+    jogo: Annotated[str, msgspec.Meta(min_length=1)]
+    duracao: str
+    data: str  # ISO 8601, conferida em validar_dados
+    jogadores: Annotated[list[JogadorId], msgspec.Meta(min_length=MINIMO_JOGADORES, max_length=len(POSICOES))]
+
+class Dados(TypedDict):
+    partidas: list[Partida]
+    pontuacao: dict[JogadorId, int]
+
+class RegistroJournal(TypedDict):
+    indice: Annotated[int, msgspec.Meta(ge=0)]
+    partida: Partida
+
+class SegmentoArquivo(TypedDict):
+    ano: int
+    partidas: list[Partida]
+
+def codificar_sequencia(obj):
+    """Sequências que o msgspec não conhece (PartidasColunares) são gravadas como listas"""
+    if isinstance(obj, Sequence):
+        return list(obj)
+    raise NotImplementedError(f"Tipo não serializável: {type(obj).__name__}")
+
+codificador_json = msgspec.json.Encoder(enc_hook=codificar_sequencia)
+decodificador_dados = msgspec.json.Decoder(Dados)
+decodificador_journal = msgspec.json.Decoder(RegistroJournal)
+decodificador_segmento = msgspec.json.Decoder(SegmentoArquivo)
+
+def validar_dados(dados):
+    """Validações que o esquema não expressa; levanta ValueError indicando a partida"""
+    for num, partida in enumerate(dados["partidas"]):
+        try:
+            datetime.fromisoformat(partida["data"])
+        except ValueError:
+            raise ValueError(f"Partida {num}: data inválida '{partida['data']}'")
+    return dados
+
+def decodificar_dados(bruto):
+    """Decodifica e valida um dados.json; ValueError descreve o primeiro problema encontrado"""
+    try:
+        return validar_dados(decodificador_dados.decode(bruto))
+    except msgspec.ValidationError as e:
+        raise ValueError(f"Estrutura inválida: {e}")
+
+def codificar_dados(dados):
+    bruto = codificador_json.encode(dados)
+    return bruto if DADOS_COMPACTOS else msgspec.json.format(bruto, indent=2)
+
 # ======================
 # SISTEMA DE PERSISTÊNCIA (JSON)
 # ======================
-def init_persistence():
+class Caminhos:
+    """Arquivos de dados de uma guilda, todos dentro de `pasta`"""
+
+    def __init__(self, pasta=DATA_DIR):
+        self.pasta = pasta
+        self.dados = os.path.join(pasta, "dados.json")
+        self.journal = os.path.join(pasta, "partidas.jsonl")
+        self.sqlite = os.path.join(pasta, "dados.db")
+        self.arquivo = os.path.join(pasta, "arquivo")  # Anos fechados: um segmento comprimido por ano
+        self.ratings = os.path.join(pasta, "ratings.json.gz")  # Checkpoints dos ratings (Elo)
+        self.backups = os.path.join(pasta, "backups")
+        self.manifesto = os.path.join(self.backups, "manifesto.json")
+        self.backups_arquivo = os.path.join(self.backups, "arquivo")  # Cópias dos segmentos anuais, pelo hash
+
+CAMINHOS_PADRAO = Caminhos()  # Guilda original: DADOS_FILE, JOURNAL_FILE, BACKUP_DIR...
+
+def init_persistence(caminhos=CAMINHOS_PADRAO):
     """Garante a estrutura de arquivos e diretórios"""
     try:
-        if not os.path.exists(DATA_DIR):
-            os.makedirs(DATA_DIR)
-            print(f"📁 Diretório '{DATA_DIR}' criado")
+        if not os.path.exists(caminhos.pasta):
+            os.makedirs(caminhos.pasta)
+            print(f"📁 Diretório '{caminhos.pasta}' criado")
 
-        if not os.path.exists(BACKUP_DIR):
-            os.makedirs(BACKUP_DIR)
-            print(f"📁 Diretório de backups '{BACKUP_DIR}' criado")
+        if not os.path.exists(caminhos.backups):
+            os.makedirs(caminhos.backups)
+            print(f"📁 Diretório de backups '{caminhos.backups}' criado")
 
-        if not os.path.exists(DADOS_FILE):
-            with open(DADOS_FILE, "w") as f:
+        if not os.path.exists(caminhos.dados):
+            with open(caminhos.dados, "w") as f:
                 json.dump({"partidas": [], "pontuacao": {}}, f)
-            print(f"📄 Arquivo '{DADOS_FILE}' criado com estrutura inicial")
+            print(f"📄 Arquivo '{caminhos.dados}' criado com estrutura inicial")
 
     except Exception as e:
         print(f"❌ Erro na inicialização: {str(e)}")
         traceback.print_exc()
 
-def carregar_dados():
+@cronometrado("bot_armazenamento_segundos", operacao="carregar_json")
+def carregar_dados(caminhos=CAMINHOS_PADRAO):
     """Carrega os dados do arquivo JSON"""
     try:
         with file_lock:
-            if not os.path.exists(DADOS_FILE) or os.path.getsize(DADOS_FILE) == 0:
+            if not os.path.exists(caminhos.dados) or os.path.getsize(caminhos.dados) == 0:
                 return {"partidas": [], "pontuacao": {}}
 
-            with open(DADOS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(caminhos.dados, "rb") as f:
+                bruto = f.read()
+
+        try:
+            return decodificar_dados(bruto)
+        except ValueError as e:
+            if isinstance(e, msgspec.DecodeError) and not isinstance(e, msgspec.ValidationError):
+                raise  # JSON corrompido
+            # Dados antigos fora do esquema: carrega assim mesmo para não perder nada
+            print(f"⚠️ {caminhos.dados} fora do esquema, carregado sem validação: {e}")
+            return msgspec.json.decode(bruto)
     except Exception as e:
         print(f"❌ Erro ao carregar dados: {e}")
-        backup_corrupt_file()
+        backup_corrupt_file(caminhos)
         return {"partidas": [], "pontuacao": {}}
 
-def salvar_dados(dados):
+@cronometrado("bot_armazenamento_segundos", operacao="salvar_json")
+def salvar_dados(dados, caminho=DADOS_FILE):
     """Salva os dados no arquivo JSON"""
     try:
         with file_lock:
-            temp_file = DADOS_FILE + ".tmp"
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(dados, f, indent=2, ensure_ascii=False)
+            temp_file = caminho + ".tmp"
+            with open(temp_file, "wb") as f:
+                f.write(codificar_dados(dados))
 
-            if os.path.exists(DADOS_FILE):
-                os.replace(temp_file, DADOS_FILE)
+            if os.path.exists(caminho):
+                os.replace(temp_file, caminho)
             else:
-                shutil.move(temp_file, DADOS_FILE)
+                shutil.move(temp_file, caminho)
     except Exception as e:
         print(f"❌ Erro ao salvar dados: {e}")
         if os.path.exists(temp_file):
             os.remove(temp_file)
         raise
 
-def backup_corrupt_file():
+def aplicar_partida(dados, partida):
+    """Adiciona a partida aos dados e atualiza a pontuação acumulada"""
+    dados["partidas"].append(partida)
+    somar_pontuacao(dados["pontuacao"], partida)
+
+def somar_pontuacao(pontuacao, partida):
+    total_jogadores = len(partida["jogadores"])
+    for pos, jogador_id in enumerate(partida["jogadores"]):
+        pontuacao[jogador_id] = pontuacao.get(jogador_id, 0) + calcular_pontos(pos, total_jogadores)
+
+def recalcular_pontuacao(partidas):
+    """Pontuação acumulada de cada jogador, calculada só a partir das partidas"""
+    pontuacao = {}
+    for partida in partidas:
+        total_jogadores = len(partida["jogadores"])
+        for pos, jogador_id in enumerate(partida["jogadores"]):
+            pontuacao[jogador_id] = pontuacao.get(jogador_id, 0) + calcular_pontos(pos, total_jogadores)
+    return pontuacao
+
+def timestamp_partida(partida):
+    return datetime.fromisoformat(partida["data"]).timestamp()
+
+@cronometrado("bot_armazenamento_segundos", operacao="anexar_journal")
+def anexar_journal(partidas, indice, caminho=JOURNAL_FILE):
+    """Acrescenta partidas ao journal (uma linha JSON por partida) com um único fsync"""
+    linhas = b"".join(
+        codificador_json.encode({"indice": indice + n, "partida": partida}) + b"\n"
+        for n, partida in enumerate(partidas)
+    )
+    with file_lock:
+        with open(caminho, "ab") as f:
+            f.write(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+
+def aplicar_journal(dados, caminho=JOURNAL_FILE):
+    """Reaplica sobre o snapshot as partidas do journal ainda não consolidadas"""
+    if not os.path.exists(caminho):
+        return 0
+
+    aplicadas = 0
+    with file_lock:
+        with open(caminho, "rb") as f:
+            linhas = f.readlines()
+
+        offset_valido = 0
+        for num, linha in enumerate(linhas, start=1):
+            try:
+                if not linha.endswith(b"\n"):
+                    raise ValueError("linha incompleta")
+                registro = decodificador_journal.decode(linha)
+                indice, partida = registro["indice"], registro["partida"]
+            except ValueError as e:
+                if num == len(linhas):
+                    # Escrita interrompida no meio: descarta a cauda para não corromper os próximos appends
+                    print(f"⚠️ Última linha do journal incompleta descartada ({e})")
+                    with open(caminho, "r+b") as f:
+                        f.truncate(offset_valido)
+                    break
+                print(f"⚠️ Linha {num} do journal ignorada: {e}")
+                offset_valido += len(linha)
+                continue
+
+            offset_valido += len(linha)
+            if indice < len(dados["partidas"]):
+                continue  # Já consolidada no snapshot
+
+            aplicar_partida(dados, partida)
+            aplicadas += 1
+
+    if aplicadas:
+        print(f"📜 {aplicadas} partidas recuperadas do journal")
+    return aplicadas
+
+def limpar_journal(caminho=JOURNAL_FILE):
+    """Descarta o journal depois que o snapshot já contém todas as partidas"""
+    with file_lock:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+async def em_executor(func, *args, **kwargs):
+    """Executa uma função bloqueante no executor de persistência"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(persistencia_executor, functools.partial(func, *args, **kwargs))
+
+def validar_arquivo_upload(caminho):
+    """Lê e valida um arquivo de dados enviado (.json ou .json.gz; todas as partidas, pelo esquema)"""
+    with (gzip.open(caminho, "rb") if caminho.endswith(".gz") else open(caminho, "rb")) as f:
+        return decodificar_dados(f.read())
+
+def instalar_arquivo_upload(caminho, dados, caminhos=CAMINHOS_PADRAO):
+    """Faz backup do arquivo atual e grava os dados enviados (já validados e recalculados) no lugar"""
+    if os.path.exists(caminhos.dados):
+        backup_path = os.path.join(caminhos.backups, f"backup_pre_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        shutil.copy2(caminhos.dados, backup_path)
+    salvar_dados(dados, caminhos.dados)
+    os.remove(caminho)
+
+def exportar_partidas(partidas, caminho, pontuacao=None, compactado=True):
+    """Grava um dados.json (opcionalmente gzip) escrevendo as partidas em blocos, sem montar o documento inteiro.
+    `partidas` pode ser qualquer iterável: só um bloco de dicts existe por vez. Sem `pontuacao`, ela é
+    somada a partir das partidas exportadas durante a escrita. Retorna quantas partidas foram gravadas."""
+    recalcular = pontuacao is None
+    pontuacao = {} if recalcular else pontuacao
+    partidas = iter(partidas)
+    quantidade = 0
+
+    temp_file = caminho + ".tmp"
+    try:
+        with (gzip.open(temp_file, "wb", compresslevel=6) if compactado else open(temp_file, "wb")) as f:
+            f.write(b'{"partidas":[')
+            while bloco := list(itertools.islice(partidas, EXPORTAR_BLOCO)):
+                if quantidade:
+                    f.write(b",")
+                f.write(b",".join(codificador_json.encode(p) for p in bloco))
+                if recalcular:
+                    for partida in bloco:
+                        somar_pontuacao(pontuacao, partida)
+                quantidade += len(bloco)
+            f.write(b'],"pontuacao":' + codificador_json.encode(pontuacao) + b"}")
+        os.replace(temp_file, caminho)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    return quantidade
+
+def backup_corrupt_file(caminhos=CAMINHOS_PADRAO):
     """Faz backup de um arquivo possivelmente corrompido"""
     try:
-        if not os.path.exists(DADOS_FILE) or os.path.getsize(DADOS_FILE) == 0:
+        if not os.path.exists(caminhos.dados) or os.path.getsize(caminhos.dados) == 0:
             return
 
-        corrupt_backup = os.path.join(BACKUP_DIR, f"dados_corruptos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        shutil.copy2(DADOS_FILE, corrupt_backup)
+        corrupt_backup = os.path.join(caminhos.backups, f"dados_corruptos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        shutil.copy2(caminhos.dados, corrupt_backup)
         print(f"⚠️ Backup do arquivo corrompido salvo em: {corrupt_backup}")
     except Exception as e:
         print(f"⚠️ Falha ao criar backup do arquivo corrompido: {e}")
 
-def criar_backup_automatico():
-    """Cria um backup automático dos dados"""
-    try:
-        dados = carregar_dados()
-        if not dados:
-            return
+def ler_manifesto_backups(caminhos=CAMINHOS_PADRAO):
+    if not os.path.exists(caminhos.manifesto):
+        return {"backups": []}
+    with open(caminhos.manifesto, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-        # Backup diário
-        backup_file = os.path.join(BACKUP_DIR, f"dados_backup_{datetime.now().strftime('%Y%m%d')}.json")
-        with open(backup_file, "w") as f:
-            json.dump(dados, f, indent=2, ensure_ascii=False)
+def salvar_manifesto_backups(manifesto, caminhos=CAMINHOS_PADRAO):
+    temp_file = caminhos.manifesto + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, caminhos.manifesto)
 
-        # Backup com timestamp
-        timestamp_backup = os.path.join(BACKUP_DIR, f"dados_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(timestamp_backup, "w") as f:
-            json.dump(dados, f, indent=2, ensure_ascii=False)
+def ler_backup_gz(arquivo, caminhos=CAMINHOS_PADRAO):
+    with gzip.open(os.path.join(caminhos.backups, arquivo), "rb") as f:
+        return msgspec.json.decode(f.read())
 
-        print(f"✅ Backup automático criado em: {backup_file}")
+def atualizar_prefixo(hash_prefixo, partidas):
+    """Acrescenta partidas ao hash encadeado (sensível à ordem e ao conteúdo) de um histórico"""
+    for partida in partidas:
+        hash_prefixo.update(codificador_json.encode(chave_partida(partida)))
+    return hash_prefixo
+
+class PrefixosHistorico:
+    """Hash encadeado de um histórico que só recebe partidas no final, mantido entre um backup e outro:
+    cada backup só passa pelo hash as partidas que chegaram depois do anterior"""
+
+    def __init__(self, marcas=8):
+        self.hash = hashlib.sha256()
+        self.contagem = 0  # Partidas já no hash
+        self.marcas = OrderedDict()  # quantidade de partidas -> prefixo, das consultadas mais recentemente
+        self.maximo_marcas = marcas
+
+    def prefixo(self, partidas, quantidade):
+        """Prefixo das `quantidade` primeiras partidas"""
+        if quantidade in self.marcas:
+            self.marcas.move_to_end(quantidade)
+            return self.marcas[quantidade]
+        if quantidade < self.contagem:
+            self.hash, self.contagem = hashlib.sha256(), 0  # Ponto anterior ao hash atual: recomeça
+        atualizar_prefixo(self.hash, partidas[self.contagem:quantidade])
+        self.contagem = quantidade
+        self.marcas[quantidade] = self.hash.hexdigest()
+        while len(self.marcas) > self.maximo_marcas:
+            self.marcas.popitem(last=False)
+        return self.marcas[quantidade]
+
+def guardar_segmentos(arquivados, caminhos=CAMINHOS_PADRAO):
+    """Copia para os backups os segmentos anuais que ainda não estão lá (um arquivo por hash, copiado uma
+    única vez) e retorna o que o backup registra do arquivo: {ano: {"hash", "partidas"}}"""
+    anos = {}
+    for ano, entrada in sorted(arquivados.anos.items()):
+        destino = os.path.join(caminhos.backups_arquivo, f"{entrada['hash']}.json.gz")
+        if not os.path.exists(destino):
+            os.makedirs(caminhos.backups_arquivo, exist_ok=True)
+            shutil.copyfile(os.path.join(arquivados.pasta, entrada["arquivo"]), destino + ".tmp")
+            os.replace(destino + ".tmp", destino)
+        anos[str(ano)] = {"hash": entrada["hash"], "partidas": entrada["partidas"]}
+    return anos
+
+def registrar_backup(manifesto, dados, agora, caminhos=CAMINHOS_PADRAO, prefixos=None, arquivados=None):
+    """Grava um snapshot completo ou um delta desde o último snapshot; retorna a entrada ou None se nada mudou.
+    `prefixos` (PrefixosHistorico de `dados`, mantido pelo armazém) evita refazer o hash do histórico inteiro.
+    Com `arquivados`, a entrada também registra os anos arquivados, cujos segmentos são guardados à parte."""
+    partidas = dados["partidas"]
+    prefixos = prefixos or PrefixosHistorico()
+    anos = guardar_segmentos(arquivados, caminhos) if arquivados else {}
+    snapshots = [e for e in manifesto["backups"] if e["tipo"] == "snapshot"]
+    snapshot = snapshots[-1] if snapshots else None
+
+    # Delta só vale se o histórico atual é o do snapshot com partidas acrescentadas no final:
+    # as primeiras snapshot["partidas"] partidas precisam ter o mesmo hash encadeado (o "prefixo")
+    estende_snapshot = (
+        snapshot is not None
+        and snapshot["partidas"] <= len(partidas)
+        and len(partidas) - snapshot["partidas"] < SNAPSHOT_A_CADA
+        # Entradas antigas, sem prefixo: novo snapshot
+        and snapshot.get("prefixo") == prefixos.prefixo(partidas, snapshot["partidas"])
+    )
+    prefixo = prefixos.prefixo(partidas, len(partidas))
+    if estende_snapshot:
+        tipo = "delta"
+        base = snapshot["arquivo"]
+        conteudo = {"base": base, "desde": snapshot["partidas"], "partidas": partidas[snapshot["partidas"]:]}
+    else:
+        tipo = "snapshot"
+        base = None
+        conteudo = dados
+
+    bruto = codificador_json.encode(conteudo)
+    hash_conteudo = hashlib.sha256(bruto).hexdigest()
+
+    # Deduplicação: mesmo conteúdo do último backup, ou delta vazio logo após o próprio snapshot
+    ultimo = manifesto["backups"][-1] if manifesto["backups"] else None
+    if ultimo and ultimo.get("anos_arquivados", {}) == anos:
+        if ultimo["hash"] == hash_conteudo:
+            return None
+        if tipo == "delta" and ultimo["arquivo"] == base and len(partidas) == snapshot["partidas"]:
+            return None
+
+    arquivo = f"{tipo}_{agora.strftime('%Y%m%d_%H%M%S')}.json.gz"
+    sufixo = 1
+    while os.path.exists(os.path.join(caminhos.backups, arquivo)):
+        arquivo = f"{tipo}_{agora.strftime('%Y%m%d_%H%M%S')}_{sufixo}.json.gz"
+        sufixo += 1
+
+    with gzip.open(os.path.join(caminhos.backups, arquivo), "wb") as f:
+        f.write(bruto)
+
+    entrada = {
+        "arquivo": arquivo,
+        "tipo": tipo,
+        "base": base,
+        "criado": agora.isoformat(),
+        "hash": hash_conteudo,
+        "partidas": len(partidas),
+        "prefixo": prefixo,
+        "anos_arquivados": anos
+    }
+    manifesto["backups"].append(entrada)
+    return entrada
+
+def aplicar_retencao_backups(manifesto, agora, caminhos=CAMINHOS_PADRAO):
+    """Mantém o backup mais recente de cada hora, dia e mês dentro das janelas configuradas"""
+    if not manifesto["backups"]:
+        return []
+
+    janelas = [
+        (timedelta(hours=RETENCAO_BACKUPS["horas"]), "%Y%m%d%H"),
+        (timedelta(days=RETENCAO_BACKUPS["dias"]), "%Y%m%d"),
+        (timedelta(days=31 * RETENCAO_BACKUPS["meses"]), "%Y%m"),
+    ]
+    manter = {manifesto["backups"][-1]["arquivo"]}
+    vistos = set()
+    for entrada in reversed(manifesto["backups"]):
+        criado = datetime.fromisoformat(entrada["criado"])
+        for janela, formato in janelas:
+            if agora - criado <= janela:
+                balde = (formato, criado.strftime(formato))
+                if balde not in vistos:
+                    vistos.add(balde)
+                    manter.add(entrada["arquivo"])
+                break
+
+    # Snapshots usados por deltas mantidos também ficam
+    for entrada in manifesto["backups"]:
+        if entrada["arquivo"] in manter and entrada["tipo"] == "delta":
+            manter.add(entrada["base"])
+
+    removidos = [e for e in manifesto["backups"] if e["arquivo"] not in manter]
+    for entrada in removidos:
+        caminho = os.path.join(caminhos.backups, entrada["arquivo"])
+        if os.path.exists(caminho):
+            os.remove(caminho)
+    manifesto["backups"] = [e for e in manifesto["backups"] if e["arquivo"] in manter]
+
+    # Segmentos que nenhum backup mantido usa mais
+    usados = {f"{ano['hash']}.json.gz" for e in manifesto["backups"] for ano in e.get("anos_arquivados", {}).values()}
+    if removidos and os.path.isdir(caminhos.backups_arquivo):
+        for nome in os.listdir(caminhos.backups_arquivo):
+            if nome not in usados:
+                os.remove(os.path.join(caminhos.backups_arquivo, nome))
+    return removidos
+
+def criar_backup_automatico(armazem):
+    """Cria um backup incremental dos dados de uma guilda (snapshot comprimido ou delta) e aplica a retenção"""
+    try:
+        dados = armazem.obter()
+        if not dados:
+            return None
+
+        caminhos = armazem.caminhos
+        agora = datetime.now()
+        with backup_lock:
+            manifesto = ler_manifesto_backups(caminhos)
+            entrada = registrar_backup(manifesto, dados, agora, caminhos, armazem.indices.prefixos, armazem.arquivados)
+            removidos = aplicar_retencao_backups(manifesto, agora, caminhos)
+            salvar_manifesto_backups(manifesto, caminhos)
+
+        if entrada:
+            print(f"✅ Backup automático ({entrada['tipo']}) criado em: {os.path.join(caminhos.backups, entrada['arquivo'])}")
+        else:
+            print("ℹ️ Backup automático ignorado: nada mudou desde o último")
+        if removidos:
+            print(f"🧹 {len(removidos)} backups antigos removidos pela retenção")
+        return entrada
     except Exception as e:
         print(f"⚠️ Falha ao criar backup automático: {e}")
+        return None
+
+def entrada_backup(arquivo=None, caminhos=CAMINHOS_PADRAO):
+    """Entrada do manifesto de um backup (o mais recente se `arquivo` for None)"""
+    with backup_lock:
+        manifesto = ler_manifesto_backups(caminhos)
+    if not manifesto["backups"]:
+        raise ValueError("Nenhum backup disponível")
+
+    entradas = {e["arquivo"]: e for e in manifesto["backups"]}
+    entrada = entradas.get(arquivo) if arquivo else manifesto["backups"][-1]
+    if entrada is None:
+        raise ValueError(f"Backup '{arquivo}' não encontrado")
+    return entrada
+
+def restaurar_backup(arquivo=None, caminhos=CAMINHOS_PADRAO):
+    """Reconstrói o segmento vivo de um backup do manifesto (o mais recente se `arquivo` for None)"""
+    entrada = entrada_backup(arquivo, caminhos)
+
+    if entrada["tipo"] == "snapshot":
+        return ler_backup_gz(entrada["arquivo"], caminhos)
+
+    dados = ler_backup_gz(entrada["base"], caminhos)
+    delta = ler_backup_gz(entrada["arquivo"], caminhos)
+    if len(dados["partidas"]) != delta["desde"]:
+        raise ValueError(f"Snapshot base '{entrada['base']}' não corresponde ao delta")
+    for partida in delta["partidas"]:
+        aplicar_partida(dados, partida)
+    return dados
+
+def restaurar_arquivo_backup(arquivo=None, arquivados=None, caminhos=CAMINHOS_PADRAO):
+    """Anos arquivados de um backup: None se o arquivo atual (`arquivados`) ainda é o mesmo, senão
+    {ano: partidas} lidos das cópias do backup, conferidas pelo hash. Backups anteriores ao registro
+    dos anos arquivados também dão None (só tinham o segmento vivo)."""
+    entrada = entrada_backup(arquivo, caminhos)
+    anos = entrada.get("anos_arquivados")
+    atuais = {str(ano): {"hash": e["hash"], "partidas": e["partidas"]} for ano, e in (arquivados.anos if arquivados else {}).items()}
+    if anos is None or anos == atuais:
+        return None
+
+    por_ano = {}
+    for ano, registro in anos.items():
+        caminho = os.path.join(caminhos.backups_arquivo, f"{registro['hash']}.json.gz")
+        if not os.path.exists(caminho):
+            raise ValueError(f"Segmento de {ano} do backup não encontrado")
+        with gzip.open(caminho, "rb") as f:
+            bruto = f.read()
+        if hashlib.sha256(bruto).hexdigest() != registro["hash"]:
+            raise ValueError(f"Segmento de {ano} do backup corrompido")
+        por_ano[int(ano)] = decodificador_segmento.decode(bruto)["partidas"]
+    return por_ano
 
 # ======================
-# FUNÇÕES AUXILIARES
+# BACKENDS DE ARMAZENAMENTO
 # ======================
-def calcular_pontos(pos, total_jogadores):
-    if pos == 0: return 3
-    elif pos == 1: return 1
-    elif pos == total_jogadores - 1: return -1
-    else: return 0
+class BackendPersistencia:
+    """Interface dos backends usados pelo ArmazemDados para persistir as partidas"""
+    nome = "base"
 
-def filtrar_partidas_por_periodo_e_jogo(dados, periodo=None, jogo=None):
-    agora = datetime.now()    
-    if periodo == "semana":
-        limite = agora - timedelta(weeks=1)
-    elif periodo == "mes":
-        limite = agora - timedelta(days=30)
-    elif periodo == "ano":
-        limite = agora - timedelta(days=365)
-    else:
-        limite = None
+    def carregar(self):
+        """Retorna o dicionário completo {"partidas": [...], "pontuacao": {...}}"""
+        raise NotImplementedError
+
+    def registrar(self, partidas, indice):
+        """Persiste novas partidas (a primeira na posição `indice` de `partidas`) em uma única escrita durável"""
+        raise NotImplementedError
+
+    def precisa_compactar(self):
+        return False
+
+    def compactar(self, dados):
+        pass
+
+    def substituir(self, dados):
+        """Substitui todo o conteúdo persistido"""
+        raise NotImplementedError
+
+    def instalar_upload(self, caminho, dados):
+        """Substitui o conteúdo por um arquivo enviado e já validado, guardando backup do atual"""
+        raise NotImplementedError
+
+    def fechar(self):
+        """Libera os recursos abertos (a guilda foi descarregada da memória)"""
+        pass
+
+class BackendJSON(BackendPersistencia):
+    """Snapshot em dados.json + journal de partidas em partidas.jsonl"""
+    nome = "json"
+
+    def __init__(self, caminhos=CAMINHOS_PADRAO):
+        self.caminhos = caminhos
+        self.pendentes = 0  # Partidas no journal ainda não consolidadas
+
+    def carregar(self):
+        dados = carregar_dados(self.caminhos)
+        self.pendentes = aplicar_journal(dados, self.caminhos.journal)
+        return dados
+
+    def registrar(self, partidas, indice):
+        anexar_journal(partidas, indice, self.caminhos.journal)
+        self.pendentes += len(partidas)
+
+    def precisa_compactar(self):
+        return self.pendentes >= COMPACTAR_A_CADA
+
+    def compactar(self, dados):
+        """Consolida o journal em um novo snapshot do dados.json"""
+        if self.pendentes == 0:
+            return
+        salvar_dados(dados, self.caminhos.dados)
+        limpar_journal(self.caminhos.journal)
+        self.pendentes = 0
+        print(f"🗜️ Journal consolidado em {self.caminhos.dados}")
+
+    def substituir(self, dados):
+        salvar_dados(dados, self.caminhos.dados)
+        limpar_journal(self.caminhos.journal)
+        self.pendentes = 0
+
+    def instalar_upload(self, caminho, dados):
+        instalar_arquivo_upload(caminho, dados, self.caminhos)
+        limpar_journal(self.caminhos.journal)
+        self.pendentes = 0
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS partidas (
+    id INTEGER PRIMARY KEY,
+    jogo TEXT NOT NULL,
+    jogo_chave TEXT NOT NULL,
+    duracao TEXT NOT NULL,
+    data TEXT NOT NULL,
+    ts REAL NOT NULL,
+    total_jogadores INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS participantes (
+    partida_id INTEGER NOT NULL REFERENCES partidas (id) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    jogador TEXT NOT NULL,
+    pontos INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (partida_id, posicao)
+);
+CREATE TABLE IF NOT EXISTS pontuacao (
+    jogador TEXT PRIMARY KEY,
+    pontos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_partidas_jogo_data ON partidas (jogo_chave, ts);
+CREATE INDEX IF NOT EXISTS idx_partidas_data ON partidas (ts);
+CREATE INDEX IF NOT EXISTS idx_participantes_jogador_data ON participantes (jogador, ts);
+"""
+
+class BackendSQLite(BackendPersistencia):
+    """Banco SQLite indexado: cada partida é um INSERT, sem reescrever o histórico.
+    É só formato de armazenamento: os rankings saem dos índices em memória, como no JSON."""
+    nome = "sqlite"
+
+    def __init__(self, caminhos=CAMINHOS_PADRAO):
+        self.caminhos = caminhos
+        self.caminho = caminhos.sqlite
+        self.conexao = None
+
+    def conectar(self):
+        if self.conexao is None:
+            self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self.conexao.execute("PRAGMA journal_mode=WAL")
+            self.conexao.execute("PRAGMA foreign_keys=ON")
+            self.conexao.executescript(SQLITE_SCHEMA)
+        return self.conexao
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+            self.conexao = None
+
+    @cronometrado("bot_armazenamento_segundos", operacao="carregar_sqlite")
+    def carregar(self):
+        self.migrar_de_json()
+        with file_lock:
+            conexao = self.conectar()
+            partidas = {}
+            for partida_id, jogo, duracao, data in conexao.execute(
+                "SELECT id, jogo, duracao, data FROM partidas ORDER BY id"
+            ):
+                partidas[partida_id] = {"jogo": jogo, "duracao": duracao, "data": data, "jogadores": []}
+            for partida_id, jogador in conexao.execute(
+                "SELECT partida_id, jogador FROM participantes ORDER BY partida_id, posicao"
+            ):
+                partidas[partida_id]["jogadores"].append(jogador)
+
+            pontuacao = dict(conexao.execute("SELECT jogador, pontos FROM pontuacao"))
+        return {"partidas": list(partidas.values()), "pontuacao": pontuacao}
+
+    def migrar_de_json(self):
+        """Importa o dados.json (+ journal) uma única vez, na primeira abertura do banco"""
+        conexao = self.conectar()
+        if conexao.execute("SELECT 1 FROM meta WHERE chave = 'migrado_de_json'").fetchone():
+            return
+
+        vazio = conexao.execute("SELECT COUNT(*) FROM partidas").fetchone()[0] == 0
+        if vazio and os.path.exists(self.caminhos.dados):
+            dados = BackendJSON(self.caminhos).carregar()
+            self.substituir(dados)
+            print(f"🔁 {len(dados['partidas'])} partidas migradas de '{self.caminhos.dados}' para '{self.caminho}'")
+
+            pontos = dict(conexao.execute("SELECT jogador, SUM(pontos) FROM participantes GROUP BY jogador"))
+            divergencias = {
+                jogador_id: (dados["pontuacao"].get(jogador_id, 0), total)
+                for jogador_id, total in pontos.items()
+                if total != dados["pontuacao"].get(jogador_id, 0)
+            }
+            if divergencias:
+                print(f"⚠️ Pontuação divergente das partidas para {len(divergencias)} jogadores após a migração")
+
+        with conexao:
+            conexao.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('migrado_de_json', ?)",
+                            (datetime.now().isoformat(),))
+
+    def inserir_partida(self, conexao, partida, indice):
+        ts = timestamp_partida(partida)
+        total_jogadores = len(partida["jogadores"])
+        conexao.execute(
+            "INSERT INTO partidas (id, jogo, jogo_chave, duracao, data, ts, total_jogadores) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (indice, partida["jogo"], partida["jogo"].lower(), partida["duracao"], partida["data"], ts, total_jogadores)
+        )
+        conexao.executemany(
+            "INSERT INTO participantes (partida_id, posicao, jogador, pontos, ts) VALUES (?, ?, ?, ?, ?)",
+            [(indice, pos, jogador_id, calcular_pontos(pos, total_jogadores), ts)
+             for pos, jogador_id in enumerate(partida["jogadores"])]
+        )
+
+    def inserir_tudo(self, conexao, dados):
+        conexao.execute("DELETE FROM participantes")
+        conexao.execute("DELETE FROM partidas")
+        conexao.execute("DELETE FROM pontuacao")
+        for indice, partida in enumerate(dados["partidas"]):
+            self.inserir_partida(conexao, partida, indice)
+        conexao.executemany("INSERT INTO pontuacao (jogador, pontos) VALUES (?, ?)", dados["pontuacao"].items())
+
+    @cronometrado("bot_armazenamento_segundos", operacao="registrar_sqlite")
+    def registrar(self, partidas, indice):
+        with file_lock:
+            conexao = self.conectar()
+            with conexao:  # Uma transação (um commit) para o grupo inteiro
+                for n, partida in enumerate(partidas):
+                    self.inserir_partida(conexao, partida, indice + n)
+                conexao.executemany(
+                    "INSERT INTO pontuacao (jogador, pontos) VALUES (?, ?) "
+                    "ON CONFLICT (jogador) DO UPDATE SET pontos = pontos + excluded.pontos",
+                    list(recalcular_pontuacao(partidas).items())
+                )
+
+    def substituir(self, dados):
+        with file_lock:
+            conexao = self.conectar()
+            with conexao:
+                self.inserir_tudo(conexao, dados)
+
+    def instalar_upload(self, caminho, dados):
+        backup_path = os.path.join(self.caminhos.backups, f"backup_pre_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+        with file_lock:
+            destino = sqlite3.connect(backup_path)
+            try:
+                self.conectar().backup(destino)
+            finally:
+                destino.close()
+        self.substituir(dados)
+        os.remove(caminho)
+
+def criar_backend(caminhos=CAMINHOS_PADRAO):
+    if BACKEND_ARMAZENAMENTO == "sqlite":
+        return BackendSQLite(caminhos)
+    return BackendJSON(caminhos)
+
+# ======================
+# ARQUIVO DE ANOS FECHADOS
+# ======================
+def corte_arquivo(agora=None):
+    """Início do ano mais antigo que continua no segmento vivo. Os anos anteriores já saíram de todas
+    as janelas móveis (rank_anual, baldes diários), então só entram nos rankings gerais"""
+    limite = (agora or datetime.now()) - timedelta(days=ARQUIVAR_APOS_DIAS)
+    return datetime(limite.year, 1, 1)
+
+def separar_anos_fechados(partidas, corte):
+    """({ano: partidas} dos anos anteriores ao corte, partidas que ficam no segmento vivo), na ordem de registro"""
+    limite = corte.timestamp()
+    fechadas, vivas = {}, []
+    for partida in partidas:
+        momento = datetime.fromisoformat(partida["data"])
+        if momento.timestamp() < limite:
+            fechadas.setdefault(momento.year, []).append(partida)
+        else:
+            vivas.append(partida)
+    return fechadas, vivas
 
-    partidas = dados.get("partidas", [])
-    return [p for p in partidas if (not limite or datetime.fromisoformat(p["data"]) >= limite) and 
-                               (not jogo or p["jogo"].lower() == jogo.lower())]
+def chave_partida(partida):
+    return (partida["data"], partida["jogo"], partida["duracao"], tuple(partida["jogadores"]))
 
-def obter_jogos_unicos(dados):
-    partidas = dados.get("partidas", [])
-    return sorted({p["jogo"].lower() for p in partidas})
+def resumo_partida(partida):
+    """Hash de 64 bits da partida; a soma (mod 2^64) dos resumos identifica um trecho do histórico"""
+    bruto = codificador_json.encode(chave_partida(partida))
+    return int.from_bytes(hashlib.blake2b(bruto, digest_size=8).digest(), "little")
 
-async def criar_embed_ranking(partidas, titulo):
-    estatisticas = {}
+def impressao_partidas(partidas):
+    return sum(map(resumo_partida, partidas)) % (1 << 64)
 
+def totais_partidas(partidas):
+    """Totais por jogador, gerais e por jogo (minúsculo), guardados no índice do arquivo"""
+    geral, por_jogo = {}, {}
     for partida in partidas:
         total_jogadores = len(partida["jogadores"])
+        do_jogo = por_jogo.setdefault(partida["jogo"].lower(), {})
+        for pos, jogador_id in enumerate(partida["jogadores"]):
+            acumular_estatisticas(geral, jogador_id, pos, total_jogadores)
+            acumular_estatisticas(do_jogo, jogador_id, pos, total_jogadores)
+    return {"geral": geral, "por_jogo": por_jogo}
+
+class HistoricoArquivado:
+    """Anos fechados de uma guilda: um segmento gzip somente leitura por ano (AAAA.json.gz) e um
+    indice.json com os totais pré-calculados de cada ano. Os rankings gerais só usam os totais;
+    as partidas de um ano são lidas na primeira vez em que alguém precisa delas (exportação, /view_data)."""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.indice = os.path.join(pasta, "indice.json")
+        self.anos = {}  # ano -> {"arquivo", "partidas", "hash", "totais", "confrontos", "impressao"}
+        self.segmentos = {}  # ano -> partidas já lidas do disco
+
+    def carregar(self):
+        if os.path.exists(self.indice):
+            with open(self.indice, "rb") as f:
+                anos = msgspec.json.decode(f.read())["anos"]
+            self.anos = {int(ano): entrada for ano, entrada in anos.items()}
+            self.completar()
+        return self
+
+    def completar(self):
+        """Calcula o que falta nos anos arquivados por versões anteriores (matriz de confrontos, impressão)"""
+        incompletos = [ano for ano, entrada in self.anos.items() if "confrontos" not in entrada or "impressao" not in entrada]
+        for ano in incompletos:
+            partidas = self.ler_partidas(ano)
+            if "confrontos" not in self.anos[ano]:
+                self.gravar_confrontos(ano, partidas)
+            self.anos[ano]["impressao"] = impressao_partidas(partidas)
+        if incompletos:
+            self.salvar_indice()
+
+    def total_partidas(self):
+        return sum(entrada["partidas"] for entrada in self.anos.values())
+
+    def partidas_carregadas(self):
+        return sum(len(partidas) for partidas in self.segmentos.values())
+
+    def agregados(self):
+        """Totais de todos os anos no formato de IndicesDerivados.agregados (jogo ou None -> {jogador_id: estatísticas})"""
+        agregados = {}
+        for ano in sorted(self.anos):
+            totais = self.anos[ano]["totais"]
+            somar_estatisticas(agregados.setdefault(None, {}), totais["geral"])
+            for jogo, estatisticas in totais["por_jogo"].items():
+                somar_estatisticas(agregados.setdefault(jogo, {}), estatisticas)
+        return agregados
+
+    def ler_partidas(self, ano):
+        """Partidas de um ano arquivado sem mantê-las em memória (a não ser que já estivessem)"""
+        if ano in self.segmentos:
+            return self.segmentos[ano]
+        with gzip.open(os.path.join(self.pasta, self.anos[ano]["arquivo"]), "rb") as f:
+            return decodificador_segmento.decode(f.read())["partidas"]
+
+    def partidas(self, ano):
+        """Partidas de um ano arquivado, lidas do segmento só na primeira vez"""
+        if ano not in self.segmentos:
+            self.segmentos[ano] = self.ler_partidas(ano)
+        return self.segmentos[ano]
+
+    def ler_anos(self, anos):
+        """Partidas dos anos pedidos, sem guardá-las no cache: ficam só com quem as pediu"""
+        return {ano: self.ler_partidas(ano) for ano in anos}
+
+    def todas_partidas(self):
+        return [partida for ano in sorted(self.anos) for partida in self.partidas(ano)]
+
+    def gravar_ano(self, ano, partidas):
+        """Grava o segmento do ano inteiro de uma vez (nunca é alterado no lugar); o índice é salvo à parte"""
+        os.makedirs(self.pasta, exist_ok=True)
+        arquivo = f"{ano}.json.gz"
+        caminho = os.path.join(self.pasta, arquivo)
+        bruto = codificador_json.encode({"ano": ano, "partidas": partidas})
+        temp_file = caminho + ".tmp"
+        if os.path.exists(temp_file):
+            os.remove(temp_file)  # Sobra somente leitura de uma gravação interrompida
+        with gzip.open(temp_file, "wb", compresslevel=6) as f:
+            f.write(bruto)
+        os.chmod(temp_file, 0o444)
+        os.replace(temp_file, caminho)
+        self.anos[ano] = {
+            "arquivo": arquivo,
+            "partidas": len(partidas),
+            "hash": hashlib.sha256(bruto).hexdigest(),
+            "totais": totais_partidas(partidas),
+            "impressao": impressao_partidas(partidas),
+        }
+        self.gravar_confrontos(ano, partidas)
+        self.segmentos.pop(ano, None)
+
+    def gravar_confrontos(self, ano, partidas):
+        """Matriz de confrontos do ano, ao lado do segmento (AAAA.confrontos.json.gz)"""
+        arquivo = f"{ano}.confrontos.json.gz"
+        temp_file = os.path.join(self.pasta, arquivo + ".tmp")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        with gzip.open(temp_file, "wb", compresslevel=6) as f:
+            f.write(codificador_json.encode(confrontos_de_partidas(partidas).registros()))
+        os.chmod(temp_file, 0o444)
+        os.replace(temp_file, os.path.join(self.pasta, arquivo))
+        self.anos[ano]["confrontos"] = arquivo
+
+    def registros_confrontos(self):
+        """Matrizes de confrontos de todos os anos, sem ler as partidas"""
+        registros = []
+        for ano in sorted(self.anos):
+            with gzip.open(os.path.join(self.pasta, self.anos[ano]["confrontos"]), "rb") as f:
+                registros.append(msgspec.json.decode(f.read()))
+        return registros
+
+    def salvar_indice(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        temp_file = self.indice + ".tmp"
+        with open(temp_file, "wb") as f:
+            f.write(codificador_json.encode({"anos": {str(ano): entrada for ano, entrada in sorted(self.anos.items())}}))
+        os.replace(temp_file, self.indice)
+
+    def arquivar(self, por_ano):
+        """Acrescenta partidas aos segmentos dos anos fechados; retorna quantas eram novas.
+        As que o segmento já contém são ignoradas: o segmento vivo ainda as tem se o processo
+        caiu entre gravar o arquivo e regravar o dados.json."""
+        novas_total = 0
+        for ano, partidas in sorted(por_ano.items()):
+            existentes = self.partidas(ano) if ano in self.anos else []
+            restantes = Counter(map(chave_partida, existentes))
+            novas = []
+            for partida in partidas:
+                chave = chave_partida(partida)
+                if restantes[chave] > 0:
+                    restantes[chave] -= 1
+                else:
+                    novas.append(partida)
+            if novas:
+                self.gravar_ano(ano, existentes + novas)
+                novas_total += len(novas)
+        self.salvar_indice()
+        return novas_total
+
+    def mudar_pasta(self, pasta):
+        """Passa a ler de `pasta`, para onde os arquivos deste histórico foram movidos"""
+        self.pasta = pasta
+        self.indice = os.path.join(pasta, "indice.json")
+
+    def instalar(self, destino, guardar_em=None):
+        """Move este arquivo (montado em outra pasta) para `destino`, no lugar do atual.
+        Com `guardar_em`, o arquivo atual é movido para lá em vez de apagado."""
+        antigo = destino + ".antigo" if guardar_em is None else guardar_em
+        if guardar_em is None and os.path.exists(antigo):
+            shutil.rmtree(antigo)
+        if os.path.exists(destino):
+            os.rename(destino, antigo)
+        if os.path.exists(self.pasta):
+            os.rename(self.pasta, destino)
+        self.mudar_pasta(destino)
+        if guardar_em is None and os.path.exists(antigo):
+            shutil.rmtree(antigo)
+
+def pasta_arquivo_temporaria(caminhos):
+    """Pasta única, ao lado do arquivo atual, onde um arquivo novo é montado antes de instalar"""
+    return tempfile.mkdtemp(prefix=os.path.basename(caminhos.arquivo) + ".novo_", dir=caminhos.pasta)
+
+def montar_arquivo(pasta, por_ano):
+    """Monta do zero, em `pasta`, um arquivo com os anos de `por_ano` (instalado depois com instalar)"""
+    if os.path.exists(pasta):
+        shutil.rmtree(pasta)
+    arquivados = HistoricoArquivado(pasta)
+    for ano, partidas in sorted(por_ano.items()):
+        arquivados.gravar_ano(ano, partidas)
+    if arquivados.anos:
+        arquivados.salvar_indice()
+    return arquivados
+
+# ======================
+# DADOS EM MEMÓRIA
+# ======================
+class BaldesDiarios:
+    """Anel de agregados por dia (e por jogo) cobrindo os últimos DIAS_BALDES dias"""
+
+    def __init__(self, tamanho=DIAS_BALDES):
+        self.tamanho = tamanho
+        self.dias = [None] * tamanho  # ordinal do dia guardado em cada posição do anel
+        self.baldes = [None] * tamanho  # jogo (ou None) -> {jogador_id: estatísticas}
+        self.ultimo_dia = None
+
+    def adicionar(self, partida, dia):
+        if dia <= datetime.now().toordinal() - self.tamanho:
+            return  # Fora de qualquer janela: nem ocupa o anel
+        slot = dia % self.tamanho
+        if self.dias[slot] != dia:
+            if self.dias[slot] is not None and self.dias[slot] > dia:
+                return  # Mais antiga que a janela coberta pelo anel
+            self.dias[slot] = dia
+            self.baldes[slot] = {}
+        self.ultimo_dia = dia if self.ultimo_dia is None else max(self.ultimo_dia, dia)
+
+        total_jogadores = len(partida["jogadores"])
+        geral = self.baldes[slot].setdefault(None, {})
+        por_jogo = self.baldes[slot].setdefault(partida["jogo"].lower(), {})
+        for pos, jogador_id in enumerate(partida["jogadores"]):
+            acumular_estatisticas(geral, jogador_id, pos, total_jogadores)
+            acumular_estatisticas(por_jogo, jogador_id, pos, total_jogadores)
+
+    def somar(self, estatisticas, dia_inicio, dia_fim, jogo=None):
+        """Soma em `estatisticas` os baldes dos dias [dia_inicio, dia_fim]"""
+        chave = jogo.lower() if jogo else None
+        for dia in range(dia_inicio, min(dia_fim, dia_inicio + self.tamanho - 1) + 1):
+            slot = dia % self.tamanho
+            if self.dias[slot] == dia and chave in self.baldes[slot]:
+                somar_estatisticas(estatisticas, self.baldes[slot][chave])
+        return estatisticas
+
+class HistoricoColunar:
+    """Histórico em colunas (`array`) com ids de jogadores, jogos e durações internados. É a única cópia
+    do segmento vivo em memória: os dicts das partidas só são montados quando alguém os pede
+    (PartidasColunares), para gravar, exportar ou exibir. Com 50 mil partidas do benchmarks.gerador,
+    as colunas ocupam uns 5 MB, contra uns 40 MB das mesmas partidas vindas de um json.load
+    (ver "memoria" no relatório do benchmarks.executar)."""
+
+    def __init__(self):
+        self.jogadores = []  # índice -> id do jogador (string única compartilhada)
+        self.indice_jogador = {}
+        self.jogos = []  # índice -> nome do jogo em minúsculas
+        self.indice_jogo = {}
+        self.textos = []  # índice -> nome do jogo ou duração como foram registrados
+        self.indice_texto = {}
+
+        # Uma posição por partida, na ordem de registro
+        self.ts = array("d")
+        self.jogo = array("I")
+        self.nome_jogo = array("I")  # índice em textos
+        self.duracao = array("I")  # índice em textos
+        self.datas = bytearray()  # "data" de cada partida (ISO 8601), uma após a outra
+        self.fim_data = array("I", [0])  # data da partida i: datas[fim_data[i]:fim_data[i + 1]]
+        self.inicio = array("I", [0])  # participantes da partida i: linhas [inicio[i], inicio[i + 1])
+
+        # Uma linha por participação, na ordem de chegada (posição = linha - inicio da partida)
+        self.participante = array("I")
+        self.posicao = array("B")
+        self.pontos = array("b")
+        self.partida_da_linha = array("I")
+
+    def internar_jogador(self, jogador_id):
+        indice = self.indice_jogador.get(jogador_id)
+        if indice is None:
+            indice = len(self.jogadores)
+            jogador_id = sys.intern(jogador_id)
+            self.jogadores.append(jogador_id)
+            self.indice_jogador[jogador_id] = indice
+        return indice
+
+    def internar_jogo(self, jogo):
+        indice = self.indice_jogo.get(jogo)
+        if indice is None:
+            indice = len(self.jogos)
+            self.jogos.append(sys.intern(jogo))
+            self.indice_jogo[jogo] = indice
+        return indice
+
+    def internar_texto(self, texto):
+        indice = self.indice_texto.get(texto)
+        if indice is None:
+            indice = len(self.textos)
+            self.textos.append(sys.intern(texto))
+            self.indice_texto[texto] = indice
+        return indice
+
+    def __len__(self):
+        return len(self.ts)
+
+    def adicionar(self, partida, ts):
+        """Acrescenta a partida às colunas (o dict não é guardado) e troca os ids dos jogadores no dict pelas
+        versões internadas, que quem ainda o usa (baldes, agregados) passa a compartilhar"""
+        indice = len(self.ts)
+        self.ts.append(ts)
+        self.jogo.append(self.internar_jogo(partida["jogo"].lower()))
+        self.nome_jogo.append(self.internar_texto(partida["jogo"]))
+        self.duracao.append(self.internar_texto(partida["duracao"]))
+        self.datas += partida["data"].encode()
+        self.fim_data.append(len(self.datas))
+
+        jogadores = partida["jogadores"]
+        total_jogadores = len(jogadores)
+        for pos, jogador_id in enumerate(jogadores):
+            jogador = self.internar_jogador(jogador_id)
+            jogadores[pos] = self.jogadores[jogador]
+            self.participante.append(jogador)
+            self.posicao.append(pos)
+            self.pontos.append(calcular_pontos(pos, total_jogadores))
+            self.partida_da_linha.append(indice)
+        self.inicio.append(len(self.participante))
+        return indice
+
+    def linhas(self, indice):
+        return range(self.inicio[indice], self.inicio[indice + 1])
+
+    def partida(self, indice):
+        """Monta o dict da partida `indice`, igual ao que foi registrado"""
+        return {
+            "jogo": self.textos[self.nome_jogo[indice]],
+            "duracao": self.textos[self.duracao[indice]],
+            "data": self.datas[self.fim_data[indice]:self.fim_data[indice + 1]].decode(),
+            "jogadores": [self.jogadores[self.participante[linha]] for linha in self.linhas(indice)],
+        }
+
+    @cronometrado("bot_agregacao_segundos", consulta="agregar_por_jogo")
+    def agregar_por_jogo(self):
+        """Estatísticas por (jogo, jogador) e gerais em uma passada; vetorizada quando há NumPy"""
+        if np is not None and len(self.participante):
+            return self._agregar_numpy()
+
+        agregados = {}
+        for indice in range(len(self.ts)):
+            geral = agregados.setdefault(None, {})
+            por_jogo = agregados.setdefault(self.jogos[self.jogo[indice]], {})
+            linhas = self.linhas(indice)
+            for linha in linhas:
+                jogador_id = self.jogadores[self.participante[linha]]
+                acumular_estatisticas(geral, jogador_id, self.posicao[linha], len(linhas))
+                acumular_estatisticas(por_jogo, jogador_id, self.posicao[linha], len(linhas))
+        return agregados
+
+    def _agregar_numpy(self):
+        participante = np.frombuffer(self.participante, dtype=np.uint32).astype(np.int64)
+        posicao = np.frombuffer(self.posicao, dtype=np.uint8)
+        pontos = np.frombuffer(self.pontos, dtype=np.int8).astype(np.int64)
+        partida = np.frombuffer(self.partida_da_linha, dtype=np.uint32)
+        tamanhos = np.diff(np.frombuffer(self.inicio, dtype=np.uint32).astype(np.int64))
+        total_jogadores = tamanhos[partida]
+        jogo = np.frombuffer(self.jogo, dtype=np.uint32).astype(np.int64)[partida]
+
+        vitorias = (posicao == 0).astype(np.int64)
+        fracassos = (posicao == total_jogadores - 1).astype(np.int64)
+        num_jogadores = len(self.jogadores)
+
+        agregados = {}
+        # Chave None: todos os jogos; depois uma chave composta (jogo, jogador) para o resto
+        grupos = [(None, participante, num_jogadores)]
+        grupos.append(("por_jogo", jogo * num_jogadores + participante, len(self.jogos) * num_jogadores))
+        for grupo, chave, tamanho in grupos:
+            colunas = {
+                "pontos": np.bincount(chave, weights=pontos, minlength=tamanho),
+                "partidas": np.bincount(chave, minlength=tamanho),
+                "vitorias": np.bincount(chave, weights=vitorias, minlength=tamanho),
+                "fracassos": np.bincount(chave, weights=fracassos, minlength=tamanho),
+            }
+            # Ordem de primeira aparição, como no cálculo dict a dict
+            _, primeiras = np.unique(chave, return_index=True)
+            for k in chave[np.sort(primeiras)].tolist():
+                jogo_idx, jogador_idx = divmod(k, num_jogadores)
+                destino = agregados.setdefault(None if grupo is None else self.jogos[jogo_idx], {})
+                destino[self.jogadores[jogador_idx]] = {
+                    nome: int(valores[k]) for nome, valores in colunas.items()
+                }
+        return agregados
+
+class PartidasColunares(Sequence):
+    """As partidas de um HistoricoColunar vistas como lista de dicts (dados["partidas"]), montados a cada acesso.
+    Acompanha as partidas acrescentadas depois; retrato() fixa o tamanho atual, e como as colunas só crescem
+    no final, as partidas do retrato não mudam mais."""
+
+    def __init__(self, colunas, tamanho=None):
+        self.colunas = colunas
+        self.tamanho = tamanho
+
+    def __len__(self):
+        return len(self.colunas) if self.tamanho is None else self.tamanho
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self.colunas.partida(i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("partida fora do histórico")
+        return self.colunas.partida(indice)
+
+    def __iter__(self):
+        return map(self.colunas.partida, range(len(self)))
+
+    def __eq__(self, outras):
+        if not isinstance(outras, Sequence) or isinstance(outras, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(outras) and all(a == b for a, b in zip(self, outras))
+
+    def retrato(self):
+        return PartidasColunares(self.colunas, len(self))
+
+def chave_confronto(a, b, jogo):
+    """Chave de um par de jogadores (índices da matriz, a < b) em um jogo, empacotada em um inteiro;
+    só vale enquanto a e b cabem em CONFRONTOS_JOGADORES e jogo em CONFRONTOS_JOGOS"""
+    return (a * CONFRONTOS_JOGADORES + b) * CONFRONTOS_JOGOS + jogo
+
+def desempacotar_confronto(chave):
+    par, jogo = divmod(chave, CONFRONTOS_JOGOS)
+    return (*divmod(par, CONFRONTOS_JOGADORES), jogo)
+
+class MatrizConfrontos:
+    """Matriz esparsa de confrontos diretos: para cada par de jogadores que esteve na mesma partida, por jogo,
+    [vitórias de a, vitórias de b, soma das vantagens de a, soma das vantagens de b] (a < b; vantagem =
+    diferença de colocação de quem terminou na frente). O total de todos os jogos é somado na consulta.
+
+    Com NumPy, o grosso fica em arrays ordenados (busca binária) e as partidas novas num dict de
+    recentes, consolidado de tempos em tempos; sem NumPy, tudo fica no dict. Acima de
+    CONFRONTOS_JOGADORES jogadores ou CONFRONTOS_JOGOS jogos as chaves empacotadas colidiriam:
+    a matriz passa a usar tuplas (a, b, jogo), só no dict."""
+
+    def __init__(self):
+        self.jogadores = []  # índice -> id do jogador
+        self.indice_jogador = {}
+        self.jogos = []  # índice -> nome do jogo em minúsculas
+        self.indice_jogo = {}
+        self.compacta = True  # Chaves inteiras (chave_confronto); False = tuplas
+        # (chaves ordenadas, contagens) consolidadas + recentes; trocado de uma vez ao consolidar
+        self.estado = (None, None, {})
+
+    def internar_jogador(self, jogador_id):
+        indice = self.indice_jogador.get(jogador_id)
+        if indice is None:
+            indice = self.indice_jogador[jogador_id] = len(self.jogadores)
+            self.jogadores.append(jogador_id)
+            if indice >= CONFRONTOS_JOGADORES and self.compacta:
+                self.descompactar()
+        return indice
+
+    def internar_jogo(self, jogo):
+        indice = self.indice_jogo.get(jogo)
+        if indice is None:
+            indice = self.indice_jogo[jogo] = len(self.jogos)
+            self.jogos.append(jogo)
+            if indice >= CONFRONTOS_JOGOS and self.compacta:
+                self.descompactar()
+        return indice
+
+    def chave(self, a, b, jogo):
+        return chave_confronto(a, b, jogo) if self.compacta else (a, b, jogo)
+
+    def descompactar(self):
+        """Passa todas as chaves para tuplas (limites de chave_confronto excedidos)"""
+        chaves, contagens, recentes = self.estado
+        tuplas = {}
+        if chaves is not None:
+            for chave, linha in zip(chaves.tolist(), contagens.tolist()):
+                tuplas[desempacotar_confronto(chave)] = linha
+        for chave, linha in recentes.items():
+            atual = tuplas.setdefault(desempacotar_confronto(chave), [0, 0, 0, 0])
+            for i, valor in enumerate(linha):
+                atual[i] += valor
+        self.compacta = False
+        self.estado = (None, None, tuplas)
+        print(f"⚠️ Matriz de confrontos com {len(self.jogadores)} jogadores e {len(self.jogos)} jogos: usando chaves em tupla")
+
+    def somar(self, chave, contagens):
+        recentes = self.estado[2]
+        atual = recentes.get(chave)
+        if atual is None:
+            recentes[chave] = list(contagens)
+        else:
+            for i, valor in enumerate(contagens):
+                atual[i] += valor
+
+    def somar_posicoes(self, posicoes, jogo):
+        """Soma uma partida dada por {índice do jogador: posição}"""
+        itens = sorted(posicoes.items())
+        for i, (a, pos_a) in enumerate(itens):
+            for b, pos_b in itens[i + 1:]:
+                if pos_a < pos_b:
+                    self.somar(self.chave(a, b, jogo), (1, 0, pos_b - pos_a, 0))
+                else:
+                    self.somar(self.chave(a, b, jogo), (0, 1, 0, pos_a - pos_b))
+
+    def adicionar(self, partida):
+        jogo = self.internar_jogo(partida["jogo"].lower())
+        posicoes = {}
         for pos, jogador_id in enumerate(partida["jogadores"]):
-            pontos = calcular_pontos(pos, total_jogadores)
+            posicoes.setdefault(self.internar_jogador(jogador_id), pos)  # Vale a primeira posição do jogador
+        self.somar_posicoes(posicoes, jogo)
+
+    def construir(self, colunas, registros=()):
+        """Monta a matriz a partir das colunas do histórico e de matrizes já calculadas (`registros`)"""
+        # Limites estimados por cima (jogadores/jogos de cada parte somados, sem descontar repetidos)
+        jogadores = len(colunas.jogadores) + sum(len(registro["jogadores"]) for registro in registros)
+        jogos = len(colunas.jogos) + sum(len(registro["jogos"]) for registro in registros)
+        if jogadores > CONFRONTOS_JOGADORES or jogos > CONFRONTOS_JOGOS or any(
+            registro["chaves"] and not isinstance(registro["chaves"][0], int) for registro in registros
+        ):
+            self.compacta = False
+        elif np is not None:
+            return self._construir_numpy(colunas, registros)
+
+        jogadores = [self.internar_jogador(jogador_id) for jogador_id in colunas.jogadores]
+        jogos = [self.internar_jogo(jogo) for jogo in colunas.jogos]
+        for indice in range(len(colunas.ts)):
+            posicoes = {}
+            for linha in colunas.linhas(indice):
+                posicoes.setdefault(jogadores[colunas.participante[linha]], colunas.posicao[linha])
+            self.somar_posicoes(posicoes, jogos[colunas.jogo[indice]])
+
+        for registro in registros:
+            jogadores = [self.internar_jogador(jogador_id) for jogador_id in registro["jogadores"]]
+            jogos = [self.internar_jogo(jogo) for jogo in registro["jogos"]]
+            contagens = registro["contagens"]
+            for n, chave in enumerate(registro["chaves"]):
+                a, b, jogo = desempacotar_confronto(chave) if isinstance(chave, int) else chave
+                a, b = jogadores[a], jogadores[b]
+                valores = contagens[4 * n:4 * n + 4]
+                if a > b:
+                    a, b, valores = b, a, [valores[1], valores[0], valores[3], valores[2]]
+                self.somar(self.chave(a, b, jogos[jogo]), valores)
+        return self
+
+    def _construir_numpy(self, colunas, registros):
+        partes_chaves, partes_contagens = [], []
+
+        def acrescentar(a, b, jogo, contagens):
+            # Ordena cada par (a < b) trocando as colunas de contagem junto
+            trocar = a > b
+            partes_chaves.append(chave_confronto(np.where(trocar, b, a), np.where(trocar, a, b), jogo))
+            partes_contagens.append(np.where(trocar[:, None], contagens[:, [1, 0, 3, 2]], contagens))
+
+        if len(colunas.participante):
+            jogadores = np.array([self.internar_jogador(j) for j in colunas.jogadores], dtype=np.int64)
+            jogos = np.array([self.internar_jogo(jogo) for jogo in colunas.jogos], dtype=np.int64)
+            participante = jogadores[np.frombuffer(colunas.participante, dtype=np.uint32)]
+            jogo_partida = jogos[np.frombuffer(colunas.jogo, dtype=np.uint32)]
+            inicio = np.frombuffer(colunas.inicio, dtype=np.uint32).astype(np.int64)
+            tamanhos = np.diff(inicio)
+            # Partidas agrupadas por número de jogadores: cada grupo vira uma matriz (partidas x posições)
+            for tamanho in np.unique(tamanhos).tolist():
+                selecionadas = np.nonzero(tamanhos == tamanho)[0]
+                grade = participante[inicio[selecionadas][:, None] + np.arange(tamanho)]
+                jogo = jogo_partida[selecionadas]
+                repetido = np.zeros(grade.shape, dtype=bool)  # Jogador que já apareceu antes na mesma partida
+                for p in range(1, tamanho):
+                    repetido[:, p] = (grade[:, :p] == grade[:, p:p + 1]).any(axis=1)
+                for p in range(tamanho):
+                    for q in range(p + 1, tamanho):
+                        validas = ~(repetido[:, p] | repetido[:, q])
+                        contagens = np.zeros((int(validas.sum()), 4), dtype=np.int64)
+                        contagens[:, 0] = 1
+                        contagens[:, 2] = q - p
+                        acrescentar(grade[validas, p], grade[validas, q], jogo[validas], contagens)
+
+        for registro in registros:
+            if not registro["chaves"]:
+                continue
+            jogadores = np.array([self.internar_jogador(j) for j in registro["jogadores"]], dtype=np.int64)
+            jogos = np.array([self.internar_jogo(jogo) for jogo in registro["jogos"]], dtype=np.int64)
+            par, jogo = np.divmod(np.array(registro["chaves"], dtype=np.int64), CONFRONTOS_JOGOS)
+            a, b = np.divmod(par, CONFRONTOS_JOGADORES)
+            contagens = np.array(registro["contagens"], dtype=np.int64).reshape(-1, 4)
+            acrescentar(jogadores[a], jogadores[b], jogos[jogo], contagens)
+
+        if partes_chaves:
+            self.estado = (*agrupar_confrontos(np.concatenate(partes_chaves), np.concatenate(partes_contagens)), {})
+        return self
+
+    def precisa_consolidar(self):
+        return np is not None and self.compacta and len(self.estado[2]) >= CONFRONTOS_RECENTES
+
+    def consolidar(self):
+        """Incorpora os recentes aos arrays ordenados (roda no executor, com as escritas paradas)"""
+        chaves, contagens, recentes = self.estado
+        if np is None or not self.compacta or not recentes:
+            return
+        novas_chaves = np.fromiter(recentes.keys(), dtype=np.int64, count=len(recentes))
+        novas_contagens = np.array(list(recentes.values()), dtype=np.int64).reshape(-1, 4)
+        if chaves is not None:
+            novas_chaves = np.concatenate([chaves, novas_chaves])
+            novas_contagens = np.concatenate([contagens, novas_contagens])
+        self.estado = (*agrupar_confrontos(novas_chaves, novas_contagens), {})
+
+    def consultar(self, jogador_a, jogador_b):
+        """{jogo: [vitórias de A, vitórias de B, vantagens de A, vantagens de B]} do ponto de vista de A"""
+        a, b = self.indice_jogador.get(jogador_a), self.indice_jogador.get(jogador_b)
+        if a is None or b is None or a == b:
+            return {}
+        chaves, contagens, recentes = self.estado
+        if not self.compacta:
+            par = (min(a, b), max(a, b))
+            por_jogo = {jogo: list(recentes[(*par, jogo)]) for jogo in range(len(self.jogos)) if (*par, jogo) in recentes}
+            return self.do_ponto_de_vista(por_jogo, a > b)
+        base = chave_confronto(min(a, b), max(a, b), 0)
+        por_jogo = {}
+        if chaves is not None:
+            inicio, fim = np.searchsorted(chaves, [base, base + CONFRONTOS_JOGOS]).tolist()
+            for chave, linha in zip(chaves[inicio:fim].tolist(), contagens[inicio:fim].tolist()):
+                por_jogo[chave - base] = linha
+        for jogo in range(len(self.jogos)):
+            extra = recentes.get(base + jogo)
+            if extra:
+                por_jogo[jogo] = [x + y for x, y in zip(por_jogo.get(jogo, (0, 0, 0, 0)), extra)]
+        return self.do_ponto_de_vista(por_jogo, a > b)
+
+    def do_ponto_de_vista(self, por_jogo, invertido):
+        return {
+            self.jogos[jogo]: [linha[1], linha[0], linha[3], linha[2]] if invertido else linha
+            for jogo, linha in por_jogo.items()
+        }
+
+    def registros(self):
+        """Matriz serializável (índices locais), guardada junto de cada ano arquivado"""
+        self.consolidar()
+        chaves, contagens, recentes = self.estado
+        if chaves is not None:
+            lista_chaves, lista_contagens = chaves.tolist(), contagens.ravel().tolist()
+        else:
+            lista_chaves = sorted(recentes)
+            lista_contagens = [valor for chave in lista_chaves for valor in recentes[chave]]
+            if not self.compacta:
+                lista_chaves = [list(chave) for chave in lista_chaves]
+        return {"jogadores": self.jogadores, "jogos": self.jogos, "chaves": lista_chaves, "contagens": lista_contagens}
+
+    def memoria_estimada(self):
+        chaves, contagens, recentes = self.estado
+        consolidada = chaves.nbytes + contagens.nbytes if chaves is not None else 0
+        return consolidada + len(recentes) * BYTES_POR_CONFRONTO
+
+def agrupar_confrontos(chaves, contagens):
+    """Soma as contagens de chaves repetidas; retorna (chaves únicas ordenadas, contagens int32)"""
+    unicas, inverso = np.unique(chaves, return_inverse=True)
+    somas = np.empty((len(unicas), 4), dtype=np.int32)
+    for coluna in range(4):
+        somas[:, coluna] = np.bincount(inverso, weights=contagens[:, coluna], minlength=len(unicas))
+    return unicas, somas
+
+def confrontos_de_partidas(partidas):
+    colunas = HistoricoColunar()
+    for partida in partidas:
+        colunas.adicionar(partida, 0.0)
+    return MatrizConfrontos().construir(colunas)
+
+class IndicesDerivados:
+    """Estruturas derivadas de `partidas` (o segmento vivo), atualizadas a cada nova partida.
+    As colunas guardam as próprias partidas, na ordem de registro: depois de montar os índices,
+    `partidas` (a lista de dicts) pode ser descartada em favor de self.partidas.
+    Os agregados gerais partem dos totais dos anos arquivados, sem ler as partidas deles."""
+
+    def __init__(self, partidas=(), arquivados=None):
+        self.arquivados = arquivados.agregados() if arquivados else {}  # Totais dos anos fechados
+        self.colunas = HistoricoColunar()
+        self.partidas = PartidasColunares(self.colunas)  # índice nas colunas (= ordem de registro) -> partida
+        self.impressoes = array("Q")  # índice nas colunas -> resumo_partida (checkpoints dos ratings)
+        # Linha do tempo: jogo (ou None) -> (timestamps em ordem crescente, índices das partidas na mesma ordem)
+        self.linha_do_tempo = {}
+        self.por_jogador = {}  # índice do jogador -> linhas das suas participações
+        self.baldes = BaldesDiarios()
+        self.prefixos = PrefixosHistorico()  # Hash do segmento vivo, na ordem de registro, para os backups
+        partidas = list(partidas)
+        momentos = [datetime.fromisoformat(partida["data"]) for partida in partidas]
+        for partida, momento in zip(partidas, momentos):
+            self.indexar(partida, momento.timestamp())
+        # Linha do tempo e baldes em ordem cronológica: só acréscimos no final (empates na ordem de registro)
+        for indice in sorted(range(len(partidas)), key=self.colunas.ts.__getitem__):
+            self.posicionar(indice)
+            self.baldes.adicionar(partidas[indice], momentos[indice].toordinal())
+        # Agregados iniciais em uma única passada sobre as colunas
+        self.agregados = self.colunas.agregar_por_jogo()  # jogo (minúsculo) ou None -> {jogador_id: estatísticas}
+        if self.arquivados:
+            vivos, self.agregados = self.agregados, {}
+            for origem in (self.arquivados, vivos):  # Anos arquivados primeiro: ordem de primeira aparição
+                for jogo, estatisticas in origem.items():
+                    somar_estatisticas(self.agregados.setdefault(jogo, {}), estatisticas)
+        # Confrontos diretos: segmento vivo + matrizes guardadas com cada ano arquivado
+        self.confrontos = MatrizConfrontos().construir(
+            self.colunas, arquivados.registros_confrontos() if arquivados else ()
+        )
 
+    def indexar(self, partida, ts):
+        """Colunas, resumo e índice por jogador; a linha do tempo e os baldes ficam com quem chama"""
+        indice = self.colunas.adicionar(partida, ts)
+        self.impressoes.append(resumo_partida(partida))
+
+        vistos = set()
+        for linha in self.colunas.linhas(indice):
+            jogador = self.colunas.participante[linha]
+            # Como no /rank_jogador original, vale a primeira posição do jogador na partida
+            if jogador not in vistos:
+                vistos.add(jogador)
+                self.por_jogador.setdefault(jogador, array("I")).append(linha)
+        return indice
+
+    def posicionar(self, indice):
+        """Põe a partida `indice` na linha do tempo geral e na do seu jogo"""
+        ts = self.colunas.ts[indice]
+        for chave in (None, self.colunas.jogos[self.colunas.jogo[indice]]):
+            timestamps, ordenadas = self.linha_do_tempo.setdefault(chave, (array("d"), array("I")))
+            if not timestamps or ts >= timestamps[-1]:
+                timestamps.append(ts)
+                ordenadas.append(indice)
+            else:
+                pos = bisect.bisect_right(timestamps, ts)
+                timestamps.insert(pos, ts)
+                ordenadas.insert(pos, indice)
+
+    def adicionar(self, partida):
+        momento = datetime.fromisoformat(partida["data"])
+        self.posicionar(self.indexar(partida, momento.timestamp()))
+        self.baldes.adicionar(partida, momento.toordinal())
+        self.confrontos.adicionar(partida)
+        total_jogadores = len(partida["jogadores"])
+        geral = self.agregados.setdefault(None, {})
+        por_jogo = self.agregados.setdefault(partida["jogo"].lower(), {})
+        for pos, jogador_id in enumerate(partida["jogadores"]):
+            acumular_estatisticas(geral, jogador_id, pos, total_jogadores)
+            acumular_estatisticas(por_jogo, jogador_id, pos, total_jogadores)
+
+    def estatisticas(self, jogo=None):
+        return self.agregados.get(jogo.lower() if jogo else None, {})
+
+    def estatisticas_jogador(self, jogador_id):
+        """Totais e desempenho por jogo de um jogador, percorrendo apenas as partidas dele"""
+        colunas = self.colunas
+        totais = {}
+        por_jogo = {}
+        for jogo, estatisticas in self.arquivados.items():
             if jogador_id not in estatisticas:
-                estatisticas[jogador_id] = {
-                    "pontos": 0,
-                    "partidas": 0,
-                    "vitorias": 0,
-                    "fracassos": 0
+                continue
+            if jogo is None:
+                somar_estatisticas(totais, {jogador_id: estatisticas[jogador_id]})
+            else:
+                somar_estatisticas(por_jogo, {jogo: estatisticas[jogador_id]})
+        jogador = colunas.indice_jogador.get(jogador_id)
+        for linha in self.por_jogador.get(jogador, ()):
+            indice = colunas.partida_da_linha[linha]
+            pos = colunas.posicao[linha]
+            total_jogadores = colunas.inicio[indice + 1] - colunas.inicio[indice]
+            acumular_estatisticas(totais, jogador_id, pos, total_jogadores)
+            acumular_estatisticas(por_jogo, colunas.jogos[colunas.jogo[indice]], pos, total_jogadores)
+
+        estatisticas = totais.get(jogador_id, {"pontos": 0, "partidas": 0, "vitorias": 0, "fracassos": 0})
+        estatisticas["por_jogo"] = por_jogo
+        return estatisticas
+
+    def inicio_periodo(self, limite=None, jogo=None):
+        """Posição da primeira partida com timestamp >= limite na linha do tempo do jogo"""
+        if limite is None:
+            return 0
+        timestamps, _ = self.linha_do_tempo.get(jogo.lower() if jogo else None, ((), ()))
+        return bisect.bisect_left(timestamps, limite)
+
+    def estatisticas_desde(self, limite, jogo=None):
+        """Ranking de uma janela: baldes dos dias completos + partidas do dia em que a janela começa"""
+        dia_limite = limite.toordinal()
+        fim_do_primeiro_dia = datetime.combine(limite.date() + timedelta(days=1), datetime.min.time())
+        ultimo_dia = max(datetime.now().toordinal(), self.baldes.ultimo_dia or 0)
+        estatisticas = self.baldes.somar({}, dia_limite + 1, ultimo_dia, jogo)
+
+        colunas = self.colunas
+        timestamps, ordenadas = self.linha_do_tempo.get(jogo.lower() if jogo else None, ((), ()))
+        inicio = bisect.bisect_left(timestamps, limite.timestamp())
+        fim = bisect.bisect_left(timestamps, fim_do_primeiro_dia.timestamp())
+        for indice in ordenadas[inicio:fim]:
+            linhas = colunas.linhas(indice)
+            for linha in linhas:
+                jogador_id = colunas.jogadores[colunas.participante[linha]]
+                acumular_estatisticas(estatisticas, jogador_id, colunas.posicao[linha], len(linhas))
+        return estatisticas
+
+    def verificar_consistencia(self, pontuacao):
+        """Compara os agregados com o dicionário legado `pontuacao`; retorna as divergências"""
+        geral = self.agregados.get(None, {})
+        divergencias = {}
+        for jogador_id in set(geral) | set(pontuacao):
+            calculado = geral.get(jogador_id, {}).get("pontos", 0)
+            registrado = pontuacao.get(jogador_id, 0)
+            if calculado != registrado:
+                divergencias[jogador_id] = (registrado, calculado)
+        return divergencias
+
+def atualizar_elo(ratings, jogadores):
+    """Elo multijogador: cada par da partida é um confronto vencido por quem terminou na frente, com K
+    dividido pelo número de adversários. Todos os ajustes usam os ratings de antes da partida."""
+    unicos = list(dict.fromkeys(jogadores))  # Vale a primeira posição de quem aparece repetido
+    if len(unicos) < 2:
+        return
+    antes = [ratings.get(jogador_id, RATING_INICIAL) for jogador_id in unicos]
+    ajustes = [0.0] * len(unicos)
+    k = RATING_K / (len(unicos) - 1)
+    for i in range(len(unicos)):
+        for j in range(i + 1, len(unicos)):
+            ajuste = k * (1 - 1 / (1 + 10 ** ((antes[j] - antes[i]) / 400)))
+            ajustes[i] += ajuste
+            ajustes[j] -= ajuste
+    for jogador_id, rating, ajuste in zip(unicos, antes, ajustes):
+        ratings[jogador_id] = rating + ajuste
+
+class RatingsElo:
+    """Ratings (geral e por jogo) atualizados partida a partida, em ordem cronológica.
+
+    A cada RATING_CHECKPOINT_A_CADA partidas guarda um checkpoint: posição, impressão das partidas
+    anteriores (soma dos resumo_partida) e uma cópia dos ratings. Quando o histórico muda (upload,
+    restauração, partida fora de ordem), sincronizado() recomeça do checkpoint mais recente cuja
+    impressão ainda confere, em vez de refazer o histórico inteiro."""
+
+    def __init__(self):
+        self.geral = {}  # jogador_id -> rating
+        self.por_jogo = {}  # jogo (minúsculo) -> {jogador_id: rating}
+        self.posicao = 0  # Partidas já aplicadas
+        self.impressao = 0
+        self.ultimo_ts = float("-inf")
+        self.checkpoints = []  # Do mais antigo ao mais recente
+        self.fora_de_ordem = False  # Chegou uma partida anterior à última aplicada: precisa sincronizar
+        self.salvar_pendente = False
+
+    @classmethod
+    def carregar(cls, caminho):
+        ratings = cls()
+        if os.path.exists(caminho):
+            with gzip.open(caminho, "rb") as f:
+                ratings.checkpoints = msgspec.json.decode(f.read())["checkpoints"]
+            # Cada checkpoint decodificado teria a própria cópia de cada id: todos passam a usar a internada
+            for checkpoint in ratings.checkpoints:
+                checkpoint["geral"] = {sys.intern(j): r for j, r in checkpoint["geral"].items()}
+                checkpoint["por_jogo"] = {
+                    sys.intern(jogo): {sys.intern(j): r for j, r in por_jogador.items()}
+                    for jogo, por_jogador in checkpoint["por_jogo"].items()
                 }
+        return ratings
+
+    def salvar(self, caminho):
+        temp_file = caminho + ".tmp"
+        with gzip.open(temp_file, "wb", compresslevel=6) as f:
+            f.write(codificador_json.encode({"checkpoints": self.checkpoints}))
+        os.replace(temp_file, caminho)
+        self.salvar_pendente = False
+
+    def adicionar(self, partida, ts, impressao):
+        """Aplica uma partida nova; se ela for anterior à última aplicada, só marca para sincronizar"""
+        if self.fora_de_ordem or ts < self.ultimo_ts:
+            self.fora_de_ordem = True
+            return
+        self.aplicar(partida, ts, impressao)
+
+    def aplicar(self, partida, ts, impressao):
+        atualizar_elo(self.geral, partida["jogadores"])
+        atualizar_elo(self.por_jogo.setdefault(partida["jogo"].lower(), {}), partida["jogadores"])
+        self.posicao += 1
+        self.impressao = (self.impressao + impressao) % (1 << 64)
+        self.ultimo_ts = ts
+        if self.posicao % RATING_CHECKPOINT_A_CADA == 0:
+            self.checkpoints.append(self.estado(copiar=True))
+            del self.checkpoints[:-RATING_CHECKPOINTS_MAX]
+            self.salvar_pendente = True
+
+    def estado(self, copiar=False):
+        geral, por_jogo = self.geral, self.por_jogo
+        if copiar:
+            geral, por_jogo = dict(geral), {jogo: dict(ratings) for jogo, ratings in por_jogo.items()}
+        return {"posicao": self.posicao, "impressao": self.impressao, "ultimo_ts": self.ultimo_ts,
+                "geral": geral, "por_jogo": por_jogo}
+
+    def restaurar(self, estado):
+        self.posicao = estado["posicao"]
+        self.impressao = estado["impressao"]
+        self.ultimo_ts = estado["ultimo_ts"]
+        self.geral = dict(estado["geral"])
+        self.por_jogo = {jogo: dict(ratings) for jogo, ratings in estado["por_jogo"].items()}
+
+    def sincronizado(self, historico):
+        """Cópia destes ratings alinhada com `historico` (HistoricoCronologico): parte do estado atual ou do
+        checkpoint válido mais recente e refaz só as partidas seguintes. Não altera este objeto, que
+        continua servindo as consultas até a troca."""
+        inicio = RatingsElo().estado()
+        candidatos = sorted([self.estado(), *self.checkpoints], key=lambda estado: estado["posicao"], reverse=True)
+        base = next((
+            estado for estado in candidatos
+            if estado["posicao"] <= len(historico) and historico.impressao(estado["posicao"]) == estado["impressao"]
+        ), inicio)
+        novo = RatingsElo()
+        novo.restaurar(base)
+        novo.checkpoints = [c for c in self.checkpoints if c["posicao"] <= base["posicao"]]
+        for partida, ts, impressao in historico.partidas_desde(base["posicao"]):
+            novo.aplicar(partida, ts, impressao)
+        novo.salvar_pendente = novo.salvar_pendente or len(novo.checkpoints) != len(self.checkpoints)
+        if novo.posicao > base["posicao"]:
+            print(f"📈 Ratings: {novo.posicao - base['posicao']} partidas refeitas a partir da posição {base['posicao']}")
+        return novo
+
+    def ratings(self, jogo=None):
+        return self.por_jogo.get(jogo.lower(), {}) if jogo else self.geral
+
+    def memoria_estimada(self):
+        entradas = sum(len(estado["geral"]) + sum(map(len, estado["por_jogo"].values()))
+                       for estado in [self.estado(), *self.checkpoints])
+        return entradas * BYTES_POR_RATING
+
+class HistoricoCronologico:
+    """Todas as partidas de uma guilda em ordem cronológica: anos arquivados, depois a linha do tempo do
+    segmento vivo. As impressões de prefixo usam o índice do arquivo e os resumos já calculados nos
+    índices; partidas arquivadas só são lidas quando o trecho a refazer (ou a conferir) cai nelas."""
+
+    def __init__(self, arquivados, indices):
+        self.arquivados = arquivados
+        self.indices = indices
+        self.anos = sorted(arquivados.anos)
+        self.arquivadas = arquivados.total_partidas()
+        _, self.ordenadas = indices.linha_do_tempo.get(None, ((), ()))
+
+    def __len__(self):
+        return self.arquivadas + len(self.ordenadas)
+
+    def partidas_ano(self, ano):
+        return sorted(self.arquivados.ler_partidas(ano), key=timestamp_partida)
+
+    def impressao(self, posicao):
+        """Impressão das `posicao` primeiras partidas"""
+        total = 0
+        for ano in self.anos:
+            entrada = self.arquivados.anos[ano]
+            if posicao < entrada["partidas"]:
+                return (total + impressao_partidas(self.partidas_ano(ano)[:posicao])) % (1 << 64)
+            total += entrada["impressao"]
+            posicao -= entrada["partidas"]
+        impressoes = self.indices.impressoes
+        return (total + sum(impressoes[indice] for indice in self.ordenadas[:posicao])) % (1 << 64)
+
+    def partidas_desde(self, posicao):
+        """(partida, timestamp, resumo) a partir da posição `posicao`"""
+        for ano in self.anos:
+            quantidade = self.arquivados.anos[ano]["partidas"]
+            if posicao < quantidade:
+                for partida in self.partidas_ano(ano)[posicao:]:
+                    yield partida, timestamp_partida(partida), resumo_partida(partida)
+                posicao = 0
+            else:
+                posicao -= quantidade
+        colunas, impressoes, partidas = self.indices.colunas, self.indices.impressoes, self.indices.partidas
+        for indice in self.ordenadas[posicao:]:
+            yield partidas[indice], colunas.ts[indice], impressoes[indice]
+
+class ArmazemDados:
+    """Mantém os dados de uma guilda em memória e grava as alterações pelo backend configurado"""
+
+    def __init__(self, backend=None, guild_id=GUILD_ID, caminhos=CAMINHOS_PADRAO):
+        self.backend = backend
+        self.guild_id = guild_id
+        self.caminhos = caminhos
+        self.rankings = CacheRankings()  # Mensagens de ranking já renderizadas desta guilda
+        self.ultimo_uso = time.monotonic()
+        self.indices = IndicesDerivados()
+        self.dados = {"partidas": self.indices.partidas, "pontuacao": {}}
+        self.arquivados = HistoricoArquivado(caminhos.arquivo)  # Anos fechados; dados["partidas"] é só o segmento vivo
+        self.ratings = RatingsElo()
+        self.carregado = False
+        self.versao = 0  # Incrementada a cada alteração; usada como chave de cache
+        self.lock = asyncio.Lock()  # Serializa as escritas feitas a partir do event loop
+        self.fila = []  # (partida, future) aguardando a próxima escrita em grupo
+        self.escritor = None  # Tarefa que grava a fila; existe só enquanto há partidas pendentes
+
+    def carregar(self):
+        """Lê os dados do backend uma única vez e passa a servir as consultas da memória"""
+        self.dados, self.arquivados, self.indices, self.ratings = self.ler_do_disco()
+        self.carregado = True
+        self.alterado()
+        self.anunciar_carga()
+
+    def ler_do_disco(self):
+        """Segmento vivo (backend) e índice do arquivo, com os anos que fecharam desde a última carga já arquivados.
+        Os ratings partem do último checkpoint gravado e só refazem as partidas posteriores a ele."""
+        dados = self.backend.carregar()
+        arquivados = HistoricoArquivado(self.caminhos.arquivo).carregar()
+        dados = self.arquivar_fechados(dados, arquivados)
+        indices = construir_indices(dados, arquivados)
+        ratings = RatingsElo.carregar(self.caminhos.ratings).sincronizado(HistoricoCronologico(arquivados, indices))
+        if ratings.salvar_pendente:
+            ratings.salvar(self.caminhos.ratings)
+        return dados, arquivados, indices, ratings
+
+    def anunciar_carga(self):
+        arquivadas = self.arquivados.total_partidas()
+        print(f"📊 Dados carregados em memória ({self.backend.nome}): {len(self.dados['partidas'])} partidas"
+              + (f" (+ {arquivadas} arquivadas de {', '.join(map(str, sorted(self.arquivados.anos)))})" if arquivadas else ""))
+
+    def arquivar_fechados(self, dados, arquivados, agora=None):
+        """Move para o arquivo as partidas dos anos fechados e regrava o segmento vivo sem elas"""
+        fechadas, vivas = separar_anos_fechados(dados["partidas"], corte_arquivo(agora))
+        if not fechadas:
+            return dados
+        arquivados.arquivar(fechadas)
+        dados = {"partidas": vivas, "pontuacao": dados["pontuacao"]}
+        self.backend.substituir(dados)
+        print(f"🗄️ {sum(len(partidas) for partidas in fechadas.values())} partidas de "
+              f"{', '.join(map(str, sorted(fechadas)))} movidas para o arquivo")
+        return dados
+
+    def precisa_arquivar(self, agora=None):
+        """A partida mais antiga do segmento vivo já é de um ano fechado"""
+        timestamps, _ = self.indices.linha_do_tempo.get(None, ((), ()))
+        return self.carregado and len(timestamps) > 0 and timestamps[0] < corte_arquivo(agora).timestamp()
+
+    def obter(self):
+        if not self.carregado:
+            self.carregar()
+        return self.dados
+
+    def alterado(self):
+        self.versao += 1
+        self.rankings.limpar()
+
+    def ocupado(self):
+        """Há escrita em andamento ou pendente (não pode ser descarregado agora)"""
+        return self.lock.locked() or bool(self.fila) or (self.escritor is not None and not self.escritor.done())
+
+    def memoria_estimada(self):
+        if not self.carregado:
+            return 0
+        partidas = len(self.dados["partidas"]) + self.arquivados.partidas_carregadas()
+        return (partidas * BYTES_POR_PARTIDA + self.indices.confrontos.memoria_estimada()
+                + self.ratings.memoria_estimada())
+
+    def total_partidas(self):
+        """Partidas da guilda, incluindo as dos anos arquivados"""
+        return self.arquivados.total_partidas() + len(self.dados["partidas"])
+
+    def chave_periodo(self, periodo=None, jogo=None):
+        """Identifica o conteúdo de um ranking: versão dos dados + início da janela do período"""
+        self.obter()
+        limite = limite_periodo(periodo)
+        inicio = self.indices.inicio_periodo(limite.timestamp() if limite else None, jogo)
+        return (self.versao, periodo, jogo.lower() if jogo else None, inicio)
+
+    @cronometrado("bot_agregacao_segundos", consulta="geral")
+    def estatisticas(self, jogo=None):
+        """Estatísticas acumuladas por jogador (de um jogo ou de todos)"""
+        self.obter()
+        return self.indices.estatisticas(jogo)
+
+    def jogos(self):
+        """Nomes (minúsculos) dos jogos registrados, em ordem alfabética"""
+        self.obter()
+        return sorted(jogo for jogo in self.indices.agregados if jogo is not None)
+
+    @cronometrado("bot_agregacao_segundos", consulta="jogador")
+    def estatisticas_jogador(self, jogador_id):
+        self.obter()
+        return self.indices.estatisticas_jogador(jogador_id)
+
+    @cronometrado("bot_agregacao_segundos", consulta="confronto")
+    def confronto(self, jogador_a, jogador_b):
+        """Confrontos diretos de A contra B: {jogo (None = todos): {"partidas", "vitorias", "derrotas", "diferenca_media"}},
+        com a diferença média de colocação positiva quando A costuma terminar na frente"""
+        self.obter()
+        por_jogo = self.indices.confrontos.consultar(jogador_a, jogador_b)
+        if por_jogo:
+            por_jogo[None] = [sum(coluna) for coluna in zip(*por_jogo.values())]
+        resultado = {}
+        for jogo, (vitorias, derrotas, vantagem_a, vantagem_b) in por_jogo.items():
+            partidas = vitorias + derrotas
+            resultado[jogo] = {
+                "partidas": partidas,
+                "vitorias": vitorias,
+                "derrotas": derrotas,
+                "diferenca_media": (vantagem_a - vantagem_b) / partidas,
+            }
+        return resultado
+
+    @cronometrado("bot_agregacao_segundos", consulta="periodo")
+    def estatisticas_periodo(self, periodo=None, jogo=None):
+        """Estatísticas por jogador do período (janela móvel) e jogo"""
+        limite = limite_periodo(periodo)
+        if limite is None:
+            return self.estatisticas(jogo)
+        self.obter()
+        return self.indices.estatisticas_desde(limite, jogo)
+
+    @cronometrado("bot_agregacao_segundos", consulta="rating")
+    def estatisticas_rating(self, periodo=None, jogo=None):
+        """Estatísticas do período com o rating atual de cada jogador ("rating"), só para quem já tem
+        RATING_MINIMO_PARTIDAS no jogo (ou no total)"""
+        estatisticas = self.estatisticas_periodo(periodo, jogo)
+        totais = self.estatisticas(jogo)
+        ratings = self.ratings.ratings(jogo)
+        return {
+            jogador_id: {**stats, "rating": ratings[jogador_id]}
+            for jogador_id, stats in estatisticas.items()
+            if jogador_id in ratings and totais[jogador_id]["partidas"] >= RATING_MINIMO_PARTIDAS
+        }
 
-            estatisticas[jogador_id]["pontos"] += pontos
-            estatisticas[jogador_id]["partidas"] += 1
+    def rating_jogador(self, jogador_id, jogo=None):
+        self.obter()
+        return self.ratings.ratings(jogo).get(jogador_id)
 
-            if pos == 0:
-                estatisticas[jogador_id]["vitorias"] += 1
-            if pos == total_jogadores - 1:
-                estatisticas[jogador_id]["fracassos"] += 1
+    def historico(self):
+        return HistoricoCronologico(self.arquivados, self.indices)
 
-    ranking = []
-    for jogador_id, stats in estatisticas.items():
+    def aplicar_rating(self, partida):
+        """Leva aos ratings a partida que acabou de entrar nos índices"""
+        indice = len(self.indices.partidas) - 1
+        self.ratings.adicionar(partida, self.indices.colunas.ts[indice], self.indices.impressoes[indice])
+
+    def compactar(self):
+        if self.carregado:
+            self.backend.compactar(self.dados)
+
+    def salvar_ratings(self, ratings=None):
+        try:
+            (self.ratings if ratings is None else ratings).salvar(self.caminhos.ratings)
+        except Exception as e:
+            # Os checkpoints só aceleram a próxima carga; ficam para o próximo
+            print(f"⚠️ Falha ao salvar checkpoints dos ratings: {e}")
+
+    def anos_exportacao(self, desde=None, ate=None):
+        """Anos arquivados que têm partidas no intervalo [desde, ate)"""
+        return [
+            ano for ano in sorted(self.arquivados.anos)
+            if (desde is None or desde < datetime(ano + 1, 1, 1)) and (ate is None or datetime(ano, 1, 1) < ate)
+        ]
+
+    def selecionar_exportacao(self, desde=None, ate=None, segmentos=None):
+        """Partidas a exportar (anos arquivados primeiro) e a pontuação (None quando precisa ser recalculada).
+        Sem filtro, mantém a ordem de registro; com filtro, sai em ordem cronológica. `segmentos` traz os
+        anos arquivados já lidos (ver exportar_async); os que faltarem são lidos aqui. As partidas do
+        segmento vivo saem como iterável fixado agora: os dicts só são montados durante a escrita."""
+        dados = self.obter()
+        segmentos = segmentos or {}
+        arquivadas = [
+            p for ano in self.anos_exportacao(desde, ate)
+            for p in (segmentos[ano] if ano in segmentos else self.arquivados.ler_partidas(ano))
+        ]
+        if desde is None and ate is None:
+            return itertools.chain(arquivadas, dados["partidas"].retrato()), dict(dados["pontuacao"])
+        inicio = desde.timestamp() if desde else float("-inf")
+        fim = ate.timestamp() if ate else float("inf")
+        selecionadas = sorted((p for p in arquivadas if inicio <= timestamp_partida(p) < fim), key=timestamp_partida)
+
+        timestamps, ordenadas = self.indices.linha_do_tempo.get(None, ((), ()))
+        primeira = bisect.bisect_left(timestamps, inicio)
+        ultima = bisect.bisect_left(timestamps, fim)
+        vivas = map(self.indices.partidas.__getitem__, ordenadas[primeira:ultima])
+        return itertools.chain(selecionadas, vivas), None
+
+    def exportar(self, caminho, compactado=True, desde=None, ate=None):
+        """Grava em `caminho` as partidas do intervalo [desde, ate) (padrão: todas)"""
+        partidas, pontuacao = self.selecionar_exportacao(desde, ate)
+        return exportar_partidas(partidas, caminho, pontuacao, compactado)
+
+    def preparar_substituicao(self, novos_dados, arquivo=None, indices=None, arquivados=None, completo=True):
+        """Parte de disco da troca de todo o conjunto de dados (upload/reset), feita no executor com o lock:
+        monta e instala o arquivo, sincroniza os ratings e grava os novos dados no backend. O estado em
+        memória só muda depois, no event loop, com instalar_estado.
+        `novos_dados` é o histórico completo: os anos fechados vão para um arquivo novo ou, com completo=False
+        (backup do segmento vivo), são acrescentados ao atual. `arquivados` e `indices` já montados a partir
+        de `novos_dados` (ver preparar_upload) evitam refazê-los aqui."""
+        novos_dados.setdefault("partidas", [])
+        novos_dados.setdefault("pontuacao", {})
+        if arquivados is None:
+            fechadas, novos_dados["partidas"] = separar_anos_fechados(novos_dados["partidas"], corte_arquivo())
+            if completo:
+                arquivados = montar_arquivo(pasta_arquivo_temporaria(self.caminhos), fechadas)
+            else:
+                arquivados = self.arquivados
+                if fechadas:
+                    arquivados.arquivar(fechadas)
+            indices = None
         try:
-            jogador = await bot.get_guild(GUILD_ID).fetch_member(int(jogador_id))
-            media = stats["pontos"] / stats["partidas"] if stats["partidas"] > 0 else 0
-            ranking.append({
-                "nome": jogador.display_name,
-                "pontos": stats["pontos"],
-                "partidas": stats["partidas"],
-                "media": round(media, 2),
-                "vitorias": stats["vitorias"],
-                "fracassos": stats["fracassos"]
-            })
-        except:
+            if indices is None:
+                indices = construir_indices(novos_dados, arquivados)
+            ratings = self.ratings.sincronizado(HistoricoCronologico(arquivados, indices))
+            if arquivados is not self.arquivados:
+                # O arquivo atual não é apagado: vai para a pasta de backups, e quem ainda segura o
+                # histórico anterior continua lendo dele lá
+                guardar_em = self.pasta_arquivo_anterior() if self.arquivados.anos else None
+                arquivados.instalar(self.caminhos.arquivo, guardar_em)
+                if guardar_em:
+                    self.arquivados.mudar_pasta(guardar_em)
+                    print(f"🗄️ Arquivo anterior ({self.arquivados.total_partidas()} partidas) guardado em: {guardar_em}")
+        finally:
+            # Um arquivo montado ao lado que não chegou a ser instalado não fica para trás
+            if arquivados.pasta != self.caminhos.arquivo and os.path.exists(arquivados.pasta):
+                shutil.rmtree(arquivados.pasta)
+        if arquivo:
+            self.backend.instalar_upload(arquivo, novos_dados)
+        else:
+            self.backend.substituir(novos_dados)
+        if ratings.salvar_pendente:
+            self.salvar_ratings(ratings)
+        return novos_dados, indices, arquivados, ratings
+
+    def pasta_arquivo_anterior(self):
+        """Pasta livre, dentro dos backups, para guardar o arquivo substituído por um upload/reset"""
+        carimbo = datetime.now().strftime('%Y%m%d_%H%M%S')
+        pasta = os.path.join(self.caminhos.backups, f"arquivo_anterior_{carimbo}")
+        sufixo = 1
+        while os.path.exists(pasta):
+            pasta = os.path.join(self.caminhos.backups, f"arquivo_anterior_{carimbo}_{sufixo}")
+            sufixo += 1
+        return pasta
+
+    def instalar_estado(self, dados, indices, arquivados, ratings):
+        """Troca o estado em memória de uma vez (no event loop); retorna os dados, índices e arquivo anteriores"""
+        anteriores = (self.dados, self.indices, self.arquivados)
+        if arquivados is not self.arquivados:
+            self.arquivados.segmentos.clear()  # O anterior continua legível do disco; o cache dele não fica
+        self.dados, self.indices, self.arquivados, self.ratings = dados, indices, arquivados, ratings
+        self.carregado = True
+        self.alterado()
+        return anteriores
+
+    # Versões assíncronas: o trabalho de disco vai para o executor e o loop só aplica o resultado
+    async def carregar_async(self):
+        async with self.lock:
+            if self.carregado:
+                return  # Outro comando carregou enquanto este esperava o lock
+            self.dados, self.arquivados, self.indices, self.ratings = await em_executor(self.ler_do_disco)
+            self.carregado = True
+            self.alterado()
+        self.anunciar_carga()
+
+    async def registrar_partida_async(self, partida):
+        """Enfileira a partida e só retorna quando a escrita em grupo que a contém for durável"""
+        futuro = asyncio.get_running_loop().create_future()
+        self.fila.append((partida, futuro))
+        if self.escritor is None or self.escritor.done():
+            self.escritor = asyncio.create_task(self.gravar_fila())
+        await futuro
+
+    async def gravar_fila(self):
+        """Escritor único: cada volta grava de uma vez tudo o que chegou enquanto a anterior estava no disco,
+        então a espera de uma partida fica limitada a duas escritas"""
+        while self.fila:
+            lote, self.fila = self.fila[:GRUPO_MAX], self.fila[GRUPO_MAX:]
+            partidas = [partida for partida, _ in lote]
+            try:
+                async with self.lock:
+                    dados = self.obter()
+                    await em_executor(self.backend.registrar, partidas, len(dados["partidas"]))
+                    for partida in partidas:
+                        # dados["partidas"] são as colunas dos índices: a partida entra nelas
+                        somar_pontuacao(dados["pontuacao"], partida)
+                        self.indices.adicionar(partida)
+                        self.aplicar_rating(partida)
+                    self.alterado()
+                    for _, futuro in lote:
+                        if not futuro.done():
+                            futuro.set_result(None)
+
+                    if self.indices.confrontos.precisa_consolidar():
+                        await em_executor(self.indices.confrontos.consolidar)
+                    if self.ratings.fora_de_ordem:
+                        # Partida anterior à última aplicada: refaz a partir do checkpoint anterior a ela
+                        self.ratings = await em_executor(self.ratings.sincronizado, self.historico())
+                        self.alterado()
+                    if self.ratings.salvar_pendente:
+                        await em_executor(self.salvar_ratings)
+                    if self.backend.precisa_compactar():
+                        try:
+                            await em_executor(self.compactar)
+                        except Exception as e:
+                            print(f"⚠️ Falha ao compactar: {e}")
+            except Exception as e:
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+    async def compactar_async(self):
+        async with self.lock:
+            await em_executor(self.compactar)
+
+    async def exportar_async(self, caminho, compactado=True, desde=None, ate=None):
+        """Só a leitura dos anos arquivados e a seleção seguram o lock; a escrita roda no executor sobre a cópia"""
+        async with self.lock:
+            segmentos = await em_executor(self.arquivados.ler_anos, self.anos_exportacao(desde, ate))
+            partidas, pontuacao = self.selecionar_exportacao(desde, ate, segmentos)
+        return await em_executor(exportar_partidas, partidas, caminho, pontuacao, compactado)
+
+    async def backup_async(self):
+        async with self.lock:
+            return await em_executor(criar_backup_automatico, self)
+
+    async def substituir_async(self, novos_dados, arquivo=None, indices=None, arquivados=None, completo=True):
+        """Troca os dados; com `arquivo`, instala o upload já validado em vez de salvar"""
+        async with self.lock:
+            await em_executor(self.compactar)
+            novo_estado = await em_executor(
+                self.preparar_substituicao, novos_dados, arquivo, indices, arquivados, completo
+            )
+            return self.instalar_estado(*novo_estado)
+
+    async def arquivar_async(self):
+        """Arquiva os anos que fecharam enquanto a guilda estava em memória"""
+        async with self.lock:
+            if not self.precisa_arquivar():
+                return
+            await em_executor(self.compactar)
+            dados = await em_executor(self.arquivar_fechados, self.dados, self.arquivados)
+            self.dados, self.indices = dados, await em_executor(construir_indices, dados, self.arquivados)
+            self.alterado()
+
+@cronometrado("bot_armazenamento_segundos", operacao="indexar")
+def construir_indices(dados, arquivados=None):
+    """Reconstrói os índices a partir de `partidas` (+ totais arquivados) e confere com `pontuacao`.
+    A lista de partidas de `dados` é trocada pela vista das colunas, que passam a ser a única cópia."""
+    indices = IndicesDerivados(dados["partidas"], arquivados)
+    dados["partidas"] = indices.partidas
+    divergencias = indices.verificar_consistencia(dados["pontuacao"])
+    if divergencias:
+        print(f"⚠️ Pontuação divergente das partidas para {len(divergencias)} jogadores")
+        for jogador_id, (registrado, calculado) in list(divergencias.items())[:10]:
+            print(f"├─ {jogador_id}: pontuacao={registrado} | partidas={calculado}")
+    return indices
+
+def preparar_upload(caminho, caminhos=CAMINHOS_PADRAO):
+    """Valida o arquivo enviado e monta tudo o que deriva dele, antes de tocar nos dados em uso.
+    Os anos fechados vão para um arquivo novo, montado ao lado do atual. Retorna
+    (dados do segmento vivo, arquivo, índices, jogadores cuja pontuação no arquivo não batia com as partidas)."""
+    dados = validar_arquivo_upload(caminho)
+    pontuacao = recalcular_pontuacao(dados["partidas"])
+    divergentes = sum(
+        1 for jogador_id in set(pontuacao) | set(dados["pontuacao"])
+        if pontuacao.get(jogador_id, 0) != dados["pontuacao"].get(jogador_id, 0)
+    )
+    dados["pontuacao"] = pontuacao
+    fechadas, dados["partidas"] = separar_anos_fechados(dados["partidas"], corte_arquivo())
+    arquivados = montar_arquivo(pasta_arquivo_temporaria(caminhos), fechadas)
+    try:
+        indices = IndicesDerivados(dados["partidas"], arquivados)
+        dados["partidas"] = indices.partidas
+        return dados, arquivados, indices, divergentes
+    except Exception:
+        shutil.rmtree(arquivados.pasta, ignore_errors=True)
+        raise
+
+def resumir_diferencas(antigos, novos):
+    """Partidas adicionadas/removidas e jogadores com estatísticas alteradas entre dois (dados, índices, arquivo)"""
+    (dados_antigos, indices_antigos, arquivo_antigo), (dados_novos, indices_novos, arquivo_novo) = antigos, novos
+    contagem = Counter(map(chave_partida, dados_novos["partidas"]))
+    contagem.subtract(map(chave_partida, dados_antigos["partidas"]))
+    # Anos arquivados com o mesmo conteúdo dos dois lados nem precisam ser lidos
+    for ano in set(arquivo_antigo.anos) | set(arquivo_novo.anos):
+        antigo, novo = arquivo_antigo.anos.get(ano), arquivo_novo.anos.get(ano)
+        if antigo and novo and antigo["hash"] == novo["hash"]:
             continue
+        if novo:
+            contagem.update(map(chave_partida, arquivo_novo.ler_partidas(ano)))
+        if antigo:
+            contagem.subtract(map(chave_partida, arquivo_antigo.ler_partidas(ano)))
+    geral_antigo = indices_antigos.agregados.get(None, {})
+    geral_novo = indices_novos.agregados.get(None, {})
+    return {
+        "adicionadas": sum(n for n in contagem.values() if n > 0),
+        "removidas": -sum(n for n in contagem.values() if n < 0),
+        "jogadores": sum(
+            1 for jogador_id in set(geral_antigo) | set(geral_novo)
+            if geral_antigo.get(jogador_id) != geral_novo.get(jogador_id)
+        ),
+    }
+
+class CacheRankings:
+    """Cache LRU das mensagens de ranking renderizadas, com contadores de acerto/falha"""
+
+    def __init__(self, maximo=RANKINGS_CACHE_MAX):
+        self.maximo = maximo
+        self.mensagens = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        mensagem = self.mensagens.get(chave)
+        if mensagem is None:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        self.mensagens.move_to_end(chave)
+        return mensagem
+
+    def guardar(self, chave, mensagem):
+        self.mensagens[chave] = mensagem
+        self.mensagens.move_to_end(chave)
+        while len(self.mensagens) > self.maximo:
+            self.mensagens.popitem(last=False)
+
+    def limpar(self):
+        self.mensagens.clear()
+
+# ======================
+# GUILDAS
+# ======================
+def ler_config_guildas():
+    if not os.path.exists(GUILDAS_FILE):
+        return {}
+    try:
+        with open(GUILDAS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Configuração das guildas ilegível, usando os padrões: {e}")
+        return {}
+
+def salvar_config_guildas(config):
+    temp_file = GUILDAS_FILE + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(temp_file, GUILDAS_FILE)
+
+class ArmazensGuildas:
+    """Um ArmazemDados por guilda, carregado no primeiro comando e descarregado quando ocioso.
+    A memória acompanha as guildas ativas: além da ociosidade, as menos usadas recentemente
+    são descarregadas enquanto a estimativa total passar do orçamento."""
+
+    def __init__(self, orcamento=MEMORIA_GUILDAS, ociosidade=GUILDA_OCIOSA):
+        self.orcamento = orcamento
+        self.ociosidade = ociosidade
+        self.armazens = OrderedDict()  # guild_id -> ArmazemDados, do uso mais antigo ao mais recente
+        self.em_uso = Counter()  # guild_id -> comandos/jobs em andamento que seguram o armazém
+        self.config = None  # guild_id (str) -> configuração; lida uma vez de GUILDAS_FILE
+
+    def caminhos(self, guild_id):
+        if guild_id == GUILD_ID:
+            return CAMINHOS_PADRAO
+        return Caminhos(os.path.join(GUILDAS_DIR, str(guild_id)))
+
+    async def obter(self, guild_id, interaction=None, ephemeral=False):
+        """Armazém carregado da guilda; o primeiro acesso lê os dados do disco fora do event loop.
+        Com `interaction`, uma carga do disco adia a resposta antes (o Discord só espera 3 s);
+        o comando então responde com responder()."""
+        if guild_id is None:
+            raise ValueError("Este comando só pode ser usado em um servidor")
+        with self.fixada(guild_id):  # Não é descarregado no meio da própria carga
+            armazem = self.armazens.get(guild_id)
+            if (armazem is None or not armazem.carregado) and interaction is not None \
+                    and not interaction.response.is_done():
+                await interaction.response.defer(ephemeral=ephemeral)
+                armazem = self.armazens.get(guild_id)
+            if armazem is None:
+                caminhos = self.caminhos(guild_id)
+                armazem = ArmazemDados(criar_backend(caminhos), guild_id, caminhos)
+                self.armazens[guild_id] = armazem
+                await em_executor(init_persistence, caminhos)
+            self.armazens.move_to_end(guild_id)
+            armazem.ultimo_uso = time.monotonic()
+            if not armazem.carregado:
+                await armazem.carregar_async()
+                await self.liberar()
+            return armazem
+
+    @contextlib.contextmanager
+    def fixada(self, guild_id):
+        """Segura o armazém da guilda na memória: liberar() não o descarrega enquanto alguém o usa,
+        e um obter() seguinte não monta um segundo ArmazemDados sobre o mesmo journal"""
+        self.em_uso[guild_id] += 1
+        try:
+            yield
+        finally:
+            self.em_uso[guild_id] -= 1
+            if not self.em_uso[guild_id]:
+                del self.em_uso[guild_id]
+
+    def carregados(self):
+        return [armazem for armazem in self.armazens.values() if armazem.carregado]
+
+    def memoria_estimada(self):
+        return sum(armazem.memoria_estimada() for armazem in self.armazens.values())
+
+    async def liberar(self):
+        """Descarrega guildas ociosas e, se preciso, as menos recentes até caber no orçamento"""
+        agora = time.monotonic()
+        for guild_id, armazem in list(self.armazens.items()):
+            if agora - armazem.ultimo_uso > self.ociosidade and not (self.em_uso[guild_id] or armazem.ocupado()):
+                await self.descarregar(guild_id)
+
+        excesso = self.memoria_estimada() - self.orcamento
+        for guild_id, armazem in list(self.armazens.items())[:-1]:  # A mais recente sempre fica
+            if excesso <= 0:
+                break
+            if not (self.em_uso[guild_id] or armazem.ocupado()):
+                excesso -= armazem.memoria_estimada()
+                await self.descarregar(guild_id)
+
+    async def descarregar(self, guild_id):
+        # Tudo já está durável (snapshot + journal ou SQLite); basta soltar a memória
+        armazem = self.armazens.pop(guild_id)
+        await em_executor(armazem.backend.fechar)
+        print(f"💤 Guilda {guild_id} descarregada da memória ({len(armazem.dados['partidas'])} partidas)")
+
+    async def obter_config(self, guild_id):
+        """Configuração da guilda com os padrões preenchidos"""
+        if self.config is None:
+            self.config = await em_executor(ler_config_guildas)
+        padrao = {
+            "canal_ranking": CANAL_RANKING_ID if guild_id == GUILD_ID else None,
+            "minimo_jogadores": MINIMO_JOGADORES,
+        }
+        return {**padrao, **self.config.get(str(guild_id), {})}
+
+    async def configurar(self, guild_id, **valores):
+        config = await self.obter_config(guild_id)
+        config.update(valores)
+        self.config[str(guild_id)] = config
+        await em_executor(salvar_config_guildas, dict(self.config))
+        return config
+
+    async def guildas_com_canal(self):
+        """{guild_id: canal de rankings} de todas as guildas em que o bot está e que têm canal configurado"""
+        canais = {}
+        for guild in bot.guilds:
+            canal = (await self.obter_config(guild.id))["canal_ranking"]
+            if canal:
+                canais[guild.id] = canal
+        return canais
+
+guildas = ArmazensGuildas()
+
+def criar_backups_guildas():
+    """Backup automático de todas as guildas em memória (ao encerrar o processo)"""
+    for armazem in guildas.carregados():
+        criar_backup_automatico(armazem)
 
-    ranking.sort(key=lambda x: x["pontos"], reverse=True)
+# ======================
+# NOMES DOS JOGADORES
+# ======================
+class CacheNomes:
+    """Cache LRU com TTL dos nomes de exibição (por guilda), evitando um fetch_member por jogador"""
+
+    def __init__(self, ttl=NOMES_TTL, maximo=NOMES_MAX):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.nomes = OrderedDict()  # (guild_id, id) -> (nome, instante em que foi obtido)
+
+    def guardar(self, guild_id, jogador_id, nome):
+        chave = (guild_id, str(jogador_id))
+        self.nomes[chave] = (nome, time.monotonic())
+        self.nomes.move_to_end(chave)
+        while len(self.nomes) > self.maximo:
+            self.nomes.popitem(last=False)
+
+    def obter(self, guild_id, jogador_id, aceitar_expirado=False):
+        chave = (guild_id, str(jogador_id))
+        entrada = self.nomes.get(chave)
+        if entrada is None:
+            return None
+        nome, instante = entrada
+        if not aceitar_expirado and time.monotonic() - instante > self.ttl:
+            return None
+        self.nomes.move_to_end(chave)
+        return nome
+
+    async def resolver(self, guild, jogador_ids):
+        """Retorna {id: nome} usando cache, cache do gateway e uma busca em lote para o resto"""
+        guild_id = guild.id if guild is not None else None
+        nomes = {}
+        faltando = []
+        for jogador_id in jogador_ids:
+            nome = self.obter(guild_id, jogador_id)
+            if nome is None and guild is not None:
+                membro = guild.get_member(int(jogador_id))
+                if membro is not None:
+                    nome = membro.display_name
+                    self.guardar(guild_id, jogador_id, nome)
+            if nome is None:
+                faltando.append(jogador_id)
+            else:
+                nomes[jogador_id] = nome
+
+        # Busca em lote pelo gateway (até 100 ids por requisição, sem chamadas REST)
+        if faltando and guild is not None:
+            for i in range(0, len(faltando), 100):
+                lote = [int(j) for j in faltando[i:i + 100]]
+                metricas.incrementar("bot_consultas_membros_total", comando=comando_atual.get() or "-")
+                try:
+                    membros = await guild.query_members(user_ids=lote, limit=len(lote))
+                except Exception as e:
+                    print(f"⚠️ Falha ao buscar membros em lote: {e}")
+                    continue
+                for membro in membros:
+                    self.guardar(guild_id, membro.id, membro.display_name)
+                    nomes[str(membro.id)] = membro.display_name
+
+        # Quem saiu do servidor fica com o último nome conhecido
+        for jogador_id in faltando:
+            if jogador_id not in nomes:
+                nomes[jogador_id] = self.nome_reserva(guild_id, jogador_id)
+        return nomes
+
+    def nome_reserva(self, guild_id, jogador_id):
+        nome = self.obter(guild_id, jogador_id, aceitar_expirado=True)
+        if nome is None:
+            usuario = bot.get_user(int(jogador_id))
+            nome = usuario.display_name if usuario else f"Ex-membro #{str(jogador_id)[-4:]}"
+        return nome
+
+cache_nomes = CacheNomes()
+
+# ======================
+# FUNÇÕES AUXILIARES
+# ======================
+def calcular_pontos(pos, total_jogadores):
+    if pos == 0: return 3
+    elif pos == 1: return 1
+    elif pos == total_jogadores - 1: return -1
+    else: return 0
+
+def acumular_estatisticas(estatisticas, jogador_id, pos, total_jogadores):
+    """Soma o resultado de um jogador em uma partida às suas estatísticas"""
+    if jogador_id not in estatisticas:
+        estatisticas[jogador_id] = {
+            "pontos": 0,
+            "partidas": 0,
+            "vitorias": 0,
+            "fracassos": 0
+        }
+
+    stats = estatisticas[jogador_id]
+    stats["pontos"] += calcular_pontos(pos, total_jogadores)
+    stats["partidas"] += 1
+    if pos == 0:
+        stats["vitorias"] += 1
+    if pos == total_jogadores - 1:
+        stats["fracassos"] += 1
+
+def limite_periodo(periodo, agora=None):
+    """Data mais antiga incluída no período (None = sem limite)"""
+    agora = agora or datetime.now()
+    if periodo == "semana":
+        return agora - timedelta(weeks=1)
+    elif periodo == "mes":
+        return agora - timedelta(days=30)
+    elif periodo == "ano":
+        return agora - timedelta(days=365)
+    return None
+
+def somar_estatisticas(destino, origem):
+    """Acumula em `destino` as estatísticas por jogador de `origem`"""
+    for jogador_id, stats in origem.items():
+        if jogador_id not in destino:
+            destino[jogador_id] = dict(stats)
+        else:
+            alvo = destino[jogador_id]
+            for chave, valor in stats.items():
+                alvo[chave] += valor
+    return destino
+
+def top_jogadores(estatisticas, limite=10, modo="pontos"):
+    criterio = "rating" if modo == "rating" else "pontos"
+    return sorted(estatisticas.items(), key=lambda item: item[1][criterio], reverse=True)[:limite]
+
+def formatar_por_modo(top, nomes, titulo, modo="pontos"):
+    return formatar_ranking_rating(top, nomes, titulo) if modo == "rating" else formatar_ranking(top, nomes, titulo)
+
+async def montar_ranking(estatisticas, titulo, guild, modo="pontos"):
+    # Ordena antes de resolver nomes: só o top 10 precisa deles
+    top = top_jogadores(estatisticas, modo=modo)
+    nomes = await cache_nomes.resolver(guild, [jogador_id for jogador_id, _ in top])
+    return formatar_por_modo(top, nomes, titulo, modo)
+
+async def montar_rankings(grupos, guild, modo="pontos"):
+    """Monta vários rankings ({titulo: estatisticas}) resolvendo todos os nomes em um único lote"""
+    tops = {titulo: top_jogadores(estatisticas, modo=modo) for titulo, estatisticas in grupos.items()}
+    ids = list(dict.fromkeys(jogador_id for top in tops.values() for jogador_id, _ in top))
+    nomes = await cache_nomes.resolver(guild, ids)
+    return [formatar_por_modo(top, nomes, titulo, modo) for titulo, top in tops.items() if top]
+
+async def gerar_ranking(armazem, periodo, jogo, titulo, modo="pontos"):
+    """Ranking do período/jogo da guilda, servido do cache enquanto os dados e a janela não mudarem.
+    No modo "rating", ordena quem jogou no período pelo rating (Elo) atual."""
+    chave = armazem.chave_periodo(periodo, jogo) + (titulo, modo)
+    mensagem = armazem.rankings.obter(chave)
+    if mensagem is None:
+        if modo == "rating":
+            estatisticas = armazem.estatisticas_rating(periodo, jogo)
+        else:
+            estatisticas = armazem.estatisticas_periodo(periodo, jogo)
+        mensagem = await montar_ranking(estatisticas, titulo, bot.get_guild(armazem.guild_id), modo)
+        armazem.rankings.guardar(chave, mensagem)
+    return mensagem
+
+async def gerar_rankings_jogos(armazem, guild, modo="pontos"):
+    """Rankings de todos os jogos em uma única mensagem (/rank_all), com cache"""
+    chave = armazem.chave_periodo() + ("rank_all", modo)
+    mensagem = armazem.rankings.obter(chave)
+    if mensagem is None:
+        # Agregados já materializados por jogo + uma única resolução de nomes para todos os rankings
+        if modo == "rating":
+            grupos = {f"Rating - {jogo.capitalize()}": armazem.estatisticas_rating(None, jogo) for jogo in armazem.jogos()}
+        else:
+            grupos = {f"Ranking - {jogo.capitalize()}": armazem.estatisticas(jogo) for jogo in armazem.jogos()}
+        rankings = await montar_rankings(grupos, guild, modo)
+        mensagem = "".join(f"{ranking}\n\n" for ranking in rankings)
+        armazem.rankings.guardar(chave, mensagem)
+    return mensagem
+
+def formatar_ranking(top, nomes, titulo):
+    ranking = []
+    for jogador_id, stats in top:
+        media = stats["pontos"] / stats["partidas"] if stats["partidas"] > 0 else 0
+        ranking.append({
+            "nome": nomes[jogador_id],
+            "pontos": stats["pontos"],
+            "partidas": stats["partidas"],
+            "media": round(media, 2),
+            "vitorias": stats["vitorias"],
+            "fracassos": stats["fracassos"]
+        })
 
     mensagem = f"**🏆 {titulo.upper()}**\n\n"
-    for pos, jogador in enumerate(ranking[:10], start=1):
+    for pos, jogador in enumerate(ranking, start=1):
         emoji = POSICOES[pos-1] if pos <= len(POSICOES) else f"{pos}️⃣"
         mensagem += (
             f"**{emoji} {jogador['nome']} | Total: {jogador['pontos']} pts**\n"
@@ -206,108 +2756,232 @@ async def criar_embed_ranking(partidas, titulo):
 
     return mensagem.strip()
 
+def formatar_ranking_rating(top, nomes, titulo):
+    mensagem = f"**📈 {titulo.upper()}**\n\n"
+    for pos, (jogador_id, stats) in enumerate(top, start=1):
+        emoji = POSICOES[pos-1] if pos <= len(POSICOES) else f"{pos}️⃣"
+        mensagem += (
+            f"**{emoji} {nomes[jogador_id]} | Rating: {round(stats['rating'])}**\n"
+            f"📊 Partidas: {stats['partidas']}\n"
+            f"🥇 Vitórias: {stats['vitorias']}\n"
+            f"💀 Fracassos: {stats['fracassos']}\n\n"
+        )
+
+    return mensagem.strip()
+
 # ======================
 # COMANDOS DE GERENCIAMENTO DE DADOS
 # ======================
+def ler_data(texto):
+    """Converte uma data DD/MM/AAAA informada em um comando"""
+    try:
+        return datetime.strptime(texto.strip(), "%d/%m/%Y")
+    except ValueError:
+        raise ValueError(f"Data inválida '{texto}' (use DD/MM/AAAA)")
+
 @bot.tree.command(name="get_data", description="📥 Baixa o arquivo de dados (apenas admin)")
+@app_commands.guild_only()
+@app_commands.describe(
+    compactado="Envia o arquivo comprimido em gzip (padrão: sim)",
+    desde="(Opcional) Exporta só partidas a partir desta data (DD/MM/AAAA)",
+    ate="(Opcional) Exporta só partidas até esta data, inclusive (DD/MM/AAAA)"
+)
 @app_commands.default_permissions(administrator=True)
-async def download_data(interaction: discord.Interaction):
+@medir_comando
+async def download_data(interaction: discord.Interaction, compactado: bool = True, desde: str = None, ate: str = None):
     try:
-        if not os.path.exists(DADOS_FILE) or os.path.getsize(DADOS_FILE) == 0:
-            return await interaction.response.send_message(
-                "⚠️ O arquivo de dados está vazio!",
-                ephemeral=True
-            )
+        inicio = ler_data(desde) if desde else None
+        fim = ler_data(ate) + timedelta(days=1) if ate else None
+    except ValueError as e:
+        return await interaction.response.send_message(f"❌ {e}", ephemeral=True)
 
-        await interaction.response.send_message(
-            content="📤 Aqui está o arquivo de dados atual:",
-            file=discord.File(DADOS_FILE),
+    await interaction.response.defer(ephemeral=True)
+    try:
+        armazem = await guildas.obter(interaction.guild_id)
+        nome = "dados.json.gz" if compactado else "dados.json"
+        # Um arquivo por interação: exportações simultâneas não se sobrescrevem
+        caminho = os.path.join(armazem.caminhos.pasta, "temp", f"export_{interaction.id}_{nome}")
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+        # Gerado a partir da memória (inclui o journal), com a pontuação recalculada quando há filtro de datas
+        quantidade = await armazem.exportar_async(caminho, compactado, inicio, fim)
+        if quantidade == 0:
+            return await interaction.followup.send("⚠️ Nenhuma partida para exportar!", ephemeral=True)
+
+        periodo = f" ({desde or 'início'} → {ate or 'hoje'})" if desde or ate else ""
+        await interaction.followup.send(
+            content=f"📤 Aqui está o arquivo de dados atual{periodo}: {quantidade} partidas",
+            file=discord.File(caminho, filename=nome),
             ephemeral=True
         )
     except Exception as e:
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"❌ Erro ao preparar arquivo para download: {str(e)}",
             ephemeral=True
         )
+    finally:
+        if 'caminho' in locals() and os.path.exists(caminho):
+            os.remove(caminho)
 
 @bot.tree.command(name="upload_data", description="📤 Envia um novo arquivo de dados (substitui o atual)")
+@app_commands.guild_only()
 @app_commands.default_permissions(administrator=True)
+@medir_comando
 async def upload_data(interaction: discord.Interaction, arquivo: discord.Attachment):
     try:
-        # 1. Verifica se é um arquivo JSON
-        if not arquivo.filename.lower().endswith('.json'):
-            return await interaction.response.send_message("❌ O arquivo deve ser um JSON (.json)!", ephemeral=True)
+        # 1. Verifica se é um arquivo JSON (comprimido ou não, como o gerado pelo /get_data)
+        nome = arquivo.filename.lower()
+        if not nome.endswith(('.json', '.json.gz')):
+            return await interaction.response.send_message("❌ O arquivo deve ser um JSON (.json ou .json.gz)!", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        armazem = await guildas.obter(interaction.guild_id)
 
         # 2. Cria diretório temporário se não existir
-        temp_dir = os.path.join(DATA_DIR, "temp")
+        temp_dir = os.path.join(armazem.caminhos.pasta, "temp")
         os.makedirs(temp_dir, exist_ok=True)
 
-        temp_path = os.path.join(temp_dir, "dados_temp.json")
+        temp_path = os.path.join(
+            temp_dir, f"dados_temp_{interaction.id}" + (".json.gz" if nome.endswith(".gz") else ".json")
+        )
 
         # 3. Baixa o arquivo
         await arquivo.save(temp_path)
 
-        # 4. Valida o conteúdo
-        with open(temp_path, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
+        # 4. Valida todas as partidas e reconstrói pontuação e índices (fora do event loop, sem o lock:
+        #    os comandos continuam respondendo com os dados atuais enquanto isso)
+        dados, arquivados, indices, divergentes = await em_executor(preparar_upload, temp_path, armazem.caminhos)
 
-            # Verifica estrutura básica
-            if not all(key in dados for key in ["partidas", "pontuacao"]):
-                raise ValueError("Estrutura inválida: devem existir 'partidas' e 'pontuacao'")
+        # 5. Backup do arquivo atual, gravação e troca atômica dos dados em memória
+        anteriores = await armazem.substituir_async(dados, arquivo=temp_path, indices=indices, arquivados=arquivados)
+        diferencas = await em_executor(resumir_diferencas, anteriores, (dados, indices, arquivados))
 
-        # 5. Backup do arquivo atual
-        if os.path.exists(DADOS_FILE):
-            backup_path = os.path.join(BACKUP_DIR, f"backup_pre_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-            shutil.copy2(DADOS_FILE, backup_path)
-
-        # 6. Substitui o arquivo
-        shutil.move(temp_path, DADOS_FILE)
-
-        # 7. Confirmação
-        await interaction.response.send_message(
+        # 6. Confirmação
+        mensagem = (
             "✅ Banco de dados atualizado com sucesso!\n"
-            f"📊 Partidas: {len(dados['partidas'])}\n"  # CORREÇÃO APLICADA AQUI
-            f"👥 Jogadores: {len(dados['pontuacao'])}",
-            ephemeral=True
+            f"📊 Partidas: {armazem.total_partidas()} "
+            f"(➕ {diferencas['adicionadas']} | ➖ {diferencas['removidas']})\n"
+            f"👥 Jogadores: {len(dados['pontuacao'])} ({diferencas['jogadores']} com estatísticas alteradas)"
         )
+        if divergentes:
+            mensagem += f"\n⚠️ A pontuação do arquivo divergia das partidas para {divergentes} jogadores e foi recalculada"
+        await interaction.followup.send(mensagem, ephemeral=True)
 
-    except json.JSONDecodeError:
-        await interaction.response.send_message("❌ Arquivo JSON inválido ou corrompido!", ephemeral=True)
+    except (msgspec.DecodeError, gzip.BadGzipFile, EOFError):
+        await interaction.followup.send("❌ Arquivo JSON inválido ou corrompido!", ephemeral=True)
     except Exception as e:
         error_msg = f"❌ Erro crítico: {str(e)}"
         print(error_msg)
         traceback.print_exc()
-        await interaction.response.send_message(error_msg, ephemeral=True)
+        await interaction.followup.send(error_msg, ephemeral=True)
 
-        # Limpeza em caso de erro
+    finally:
+        # Limpeza do temporário se ele não foi instalado
         if 'temp_path' in locals() and os.path.exists(temp_path):
             os.remove(temp_path)
 
+class PaginasDados(discord.ui.View):
+    """Navegação pelas partidas registradas (mais recentes primeiro); só a página atual é renderizada.
+    Os anos arquivados vêm antes do segmento vivo e só são lidos quando a navegação chega neles."""
+
+    def __init__(self, interaction, partidas, total_jogadores, arquivados=None):
+        super().__init__(timeout=300)
+        self.interaction = interaction
+        # As partidas só recebem acréscimos no final (uma substituição troca as colunas inteiras),
+        # então a vista e o total fixam um retrato consistente sem copiar nada
+        self.partidas = partidas
+        self.arquivados = arquivados
+        self.segmentos = {}  # Só os anos arquivados da página atual, lidos sem passar pelo cache do armazém
+        self.inicio_anos = []  # (primeiro índice, ano) de cada ano arquivado
+        self.arquivadas = 0
+        for ano in sorted(arquivados.anos if arquivados else ()):
+            self.inicio_anos.append((self.arquivadas, ano))
+            self.arquivadas += arquivados.anos[ano]["partidas"]
+        self.total = self.arquivadas + len(partidas)
+        self.total_jogadores = total_jogadores
+        self.paginas = max(1, -(-self.total // PARTIDAS_POR_PAGINA))
+        self.pagina = 0
+
+    def intervalo(self):
+        fim = self.total - self.pagina * PARTIDAS_POR_PAGINA
+        return max(0, fim - PARTIDAS_POR_PAGINA), fim
+
+    def localizar(self, indice):
+        """(ano, posição no ano) de uma partida arquivada"""
+        primeiro, ano = self.inicio_anos[bisect.bisect_right(self.inicio_anos, (indice, float("inf"))) - 1]
+        return ano, indice - primeiro
+
+    def partida(self, indice):
+        if indice >= self.arquivadas:
+            return self.partidas[indice - self.arquivadas]
+        ano, posicao = self.localizar(indice)
+        return self.segmentos[ano][posicao]
+
+    async def carregar_pagina(self):
+        """Lê fora do event loop os anos arquivados que a página atual mostra"""
+        inicio, fim = self.intervalo()
+        if inicio < self.arquivadas:
+            anos = {self.localizar(indice)[0] for indice in range(inicio, min(fim, self.arquivadas))}
+            lidos = await em_executor(self.arquivados.ler_anos, anos - set(self.segmentos))
+            self.segmentos = {ano: lidos[ano] if ano in lidos else self.segmentos[ano] for ano in anos}
+
+    def renderizar(self):
+        inicio, fim = self.intervalo()
+        pagina = {str(indice): self.partida(indice) for indice in range(fim - 1, inicio - 1, -1)}
+        conteudo = msgspec.json.format(codificador_json.encode(pagina), indent=2).decode()
+        if len(conteudo) > 1800:
+            conteudo = conteudo[:1800] + "\n…"
+
+        self.primeira.disabled = self.anterior.disabled = self.pagina == 0
+        self.proxima.disabled = self.ultima.disabled = self.pagina >= self.paginas - 1
+        return (
+            f"📊 Partidas {inicio + 1}–{fim} de {self.total} · 👥 {self.total_jogadores} jogadores "
+            f"(página {self.pagina + 1}/{self.paginas})```json\n{conteudo}```"
+        )
+
+    async def ir_para(self, interaction, pagina):
+        self.pagina = min(max(pagina, 0), self.paginas - 1)
+        await self.carregar_pagina()
+        await interaction.response.edit_message(content=self.renderizar(), view=self)
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def primeira(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.ir_para(interaction, 0)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.primary)
+    async def anterior(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.ir_para(interaction, self.pagina - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.primary)
+    async def proxima(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.ir_para(interaction, self.pagina + 1)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def ultima(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.ir_para(interaction, self.paginas - 1)
+
+    async def on_timeout(self):
+        try:
+            await self.interaction.edit_original_response(view=None)
+        except discord.HTTPException:
+            pass
+
 @bot.tree.command(name="view_data", description="👁️ Mostra os dados atuais (apenas admin)")
+@app_commands.guild_only()
 @app_commands.default_permissions(administrator=True)
+@medir_comando
 async def view_data(interaction: discord.Interaction):
     try:
-        dados = carregar_dados()
-        formatted_data = json.dumps(dados, indent=2, ensure_ascii=False)
-
-        if len(formatted_data) > 1500:
-            parts = [formatted_data[i:i+1500] for i in range(0, len(formatted_data), 1500)]
-            await interaction.response.send_message(
-                "📊 Dados atuais (parte 1/{}):```json\n{}```".format(len(parts), parts[0]),
-                ephemeral=True
-            )
-            for part in parts[1:]:
-                await interaction.followup.send(
-                    "```json\n{}```".format(part),
-                    ephemeral=True
-                )
-        else:
-            await interaction.response.send_message(
-                f"📊 Dados atuais:```json\n{formatted_data}```",
-                ephemeral=True
-            )
+        armazem = await guildas.obter(interaction.guild_id, interaction, ephemeral=True)
+        dados = armazem.obter()
+        if not armazem.total_partidas():
+            return await responder(interaction, "📭 Nenhuma partida registrada ainda!", ephemeral=True)
+
+        paginas = PaginasDados(interaction, dados["partidas"], len(dados["pontuacao"]), armazem.arquivados)
+        await paginas.carregar_pagina()
+        await responder(interaction, paginas.renderizar(), view=paginas, ephemeral=True)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao exibir dados: {str(e)}",
             ephemeral=True
         )
@@ -316,6 +2990,7 @@ async def view_data(interaction: discord.Interaction):
 # COMANDOS DE REGISTRO
 # ======================
 @bot.tree.command(name="game", description="Registra uma partida competitiva")
+@app_commands.guild_only()
 @app_commands.describe(
     jogo="Nome do jogo (ex: Uno, Xadrez)",
     duracao="Duração (ex: 1h30m)",
@@ -328,6 +3003,7 @@ async def view_data(interaction: discord.Interaction):
     jogador7="7º lugar (opcional)",
     jogador8="8º lugar (opcional)"
 )
+@medir_comando
 async def registrar_partida(interaction: discord.Interaction, jogo: str, duracao: str, 
                           jogador1: discord.Member, jogador2: discord.Member,
                           jogador3: discord.Member = None, jogador4: discord.Member = None,
@@ -337,14 +3013,15 @@ async def registrar_partida(interaction: discord.Interaction, jogo: str, duracao
     jogadores = [j for j in [jogador1, jogador2, jogador3, jogador4, 
                             jogador5, jogador6, jogador7, jogador8] if j is not None]
 
-    if len(jogadores) < MINIMO_JOGADORES:
+    minimo = (await guildas.obter_config(interaction.guild_id))["minimo_jogadores"]
+    if len(jogadores) < minimo:
         return await interaction.response.send_message(
-            f"❌ Mínimo de {MINIMO_JOGADORES} jogadores para registrar!",
+            f"❌ Mínimo de {minimo} jogadores para registrar!",
             ephemeral=True
         )
 
     try:
-        dados = carregar_dados()
+        armazem = await guildas.obter(interaction.guild_id, interaction)
 
         # Cria a nova partida
         nova_partida = {
@@ -354,17 +3031,11 @@ async def registrar_partida(interaction: discord.Interaction, jogo: str, duracao
             "jogadores": [str(j.id) for j in jogadores]
         }
 
-        # Adiciona à lista de partidas
-        dados["partidas"].append(nova_partida)
-
-        # Atualiza pontuação acumulada
-        total_jogadores = len(jogadores)
-        for pos, jogador in enumerate(jogadores):
-            pontos = calcular_pontos(pos, total_jogadores)
-            jogador_id = str(jogador.id)
-            dados["pontuacao"][jogador_id] = dados["pontuacao"].get(jogador_id, 0) + pontos
-
-        salvar_dados(dados)
+        # Adiciona à memória, atualiza a pontuação acumulada e persiste
+        await armazem.registrar_partida_async(nova_partida)
+        for jogador in jogadores:
+            cache_nomes.guardar(interaction.guild_id, jogador.id, jogador.display_name)
+        dados = armazem.obter()
 
         # Monta mensagem de resultado
         resultado = f"🎮 {jogo} | ⏱️ {duracao}\n\n"
@@ -378,9 +3049,10 @@ async def registrar_partida(interaction: discord.Interaction, jogo: str, duracao
             jogador_id = str(jogador.id)
             resultado += f"{jogador.display_name}: {dados['pontuacao'].get(jogador_id, 0)} pts\n"
 
-        await interaction.response.send_message(resultado)
+        await responder(interaction, resultado)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao registrar partida: {str(e)}",
             ephemeral=True
         )
@@ -390,99 +3062,119 @@ async def registrar_partida(interaction: discord.Interaction, jogo: str, duracao
 # COMANDOS DE CONSULTA
 # ======================
 @bot.tree.command(name="jogos", description="Lista todos os jogos registrados")
+@app_commands.guild_only()
+@medir_comando
 async def listar_jogos(interaction: discord.Interaction):
     try:
-        dados = carregar_dados()
-        jogos = obter_jogos_unicos(dados)
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        jogos = armazem.jogos()
 
         if not jogos:
-            return await interaction.response.send_message("❌ Nenhum jogo registrado ainda!", ephemeral=True)
+            return await responder(interaction, "❌ Nenhum jogo registrado ainda!", ephemeral=True)
 
         mensagem = "**🎲 Jogos Registrados:**\n\n" + "\n".join(f"• {jogo.capitalize()}" for jogo in jogos)
-        await interaction.response.send_message(mensagem)
+        await responder(interaction, mensagem)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao listar jogos: {str(e)}",
             ephemeral=True
         )
 
 @bot.tree.command(name="rank", description="Mostra o ranking geral")
-@app_commands.describe(jogo="(Opcional) Filtra por um jogo específico")
-async def rank_geral(interaction: discord.Interaction, jogo: str = None):
-    try:
-        dados = carregar_dados()
-        partidas = filtrar_partidas_por_periodo_e_jogo(dados, None, jogo)
-        titulo = "Ranking Geral" + (f" - {jogo.capitalize()}" if jogo else "")
-        mensagem = await criar_embed_ranking(partidas, titulo)
-        await interaction.response.send_message(mensagem)
+@app_commands.guild_only()
+@app_commands.describe(
+    jogo="(Opcional) Filtra por um jogo específico",
+    modo="(Opcional) pontos (padrão) ou rating (Elo pela ordem de chegada, com pelo menos 5 partidas)"
+)
+@medir_comando
+async def rank_geral(interaction: discord.Interaction, jogo: str = None, modo: Literal["pontos", "rating"] = "pontos"):
+    try:
+        titulo = ("Rating" if modo == "rating" else "Ranking") + " Geral" + (f" - {jogo.capitalize()}" if jogo else "")
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        mensagem = await gerar_ranking(armazem, None, jogo, titulo, modo)
+        await responder(interaction, mensagem)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao gerar ranking: {str(e)}",
             ephemeral=True
         )
 
 @bot.tree.command(name="rank_semanal", description="Mostra o ranking da semana")
-@app_commands.describe(jogo="(Opcional) Filtra por um jogo específico")
-async def rank_semanal(interaction: discord.Interaction, jogo: str = None):
-    try:
-        dados = carregar_dados()
-        partidas = filtrar_partidas_por_periodo_e_jogo(dados, "semana", jogo)
-        titulo = "Ranking Semanal" + (f" - {jogo.capitalize()}" if jogo else "")
-        mensagem = await criar_embed_ranking(partidas, titulo)
-        await interaction.response.send_message(mensagem)
+@app_commands.guild_only()
+@app_commands.describe(
+    jogo="(Opcional) Filtra por um jogo específico",
+    modo="(Opcional) pontos (padrão) ou rating (Elo pela ordem de chegada, com pelo menos 5 partidas)"
+)
+@medir_comando
+async def rank_semanal(interaction: discord.Interaction, jogo: str = None, modo: Literal["pontos", "rating"] = "pontos"):
+    try:
+        titulo = ("Rating" if modo == "rating" else "Ranking") + " Semanal" + (f" - {jogo.capitalize()}" if jogo else "")
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        mensagem = await gerar_ranking(armazem, "semana", jogo, titulo, modo)
+        await responder(interaction, mensagem)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao gerar ranking semanal: {str(e)}",
             ephemeral=True
         )
 
 @bot.tree.command(name="rank_mensal", description="Mostra o ranking do mês")
-@app_commands.describe(jogo="(Opcional) Filtra por um jogo específico")
-async def rank_mensal(interaction: discord.Interaction, jogo: str = None):
-    try:
-        dados = carregar_dados()
-        partidas = filtrar_partidas_por_periodo_e_jogo(dados, "mes", jogo)
-        titulo = "Ranking Mensal" + (f" - {jogo.capitalize()}" if jogo else "")
-        mensagem = await criar_embed_ranking(partidas, titulo)
-        await interaction.response.send_message(mensagem)
+@app_commands.guild_only()
+@app_commands.describe(
+    jogo="(Opcional) Filtra por um jogo específico",
+    modo="(Opcional) pontos (padrão) ou rating (Elo pela ordem de chegada, com pelo menos 5 partidas)"
+)
+@medir_comando
+async def rank_mensal(interaction: discord.Interaction, jogo: str = None, modo: Literal["pontos", "rating"] = "pontos"):
+    try:
+        titulo = ("Rating" if modo == "rating" else "Ranking") + " Mensal" + (f" - {jogo.capitalize()}" if jogo else "")
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        mensagem = await gerar_ranking(armazem, "mes", jogo, titulo, modo)
+        await responder(interaction, mensagem)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao gerar ranking mensal: {str(e)}",
             ephemeral=True
         )
 
 @bot.tree.command(name="rank_anual", description="Mostra o ranking do ano")
-@app_commands.describe(jogo="(Opcional) Filtra por um jogo específico")
-async def rank_anual(interaction: discord.Interaction, jogo: str = None):
-    try:
-        dados = carregar_dados()
-        partidas = filtrar_partidas_por_periodo_e_jogo(dados, "ano", jogo)
-        titulo = "Ranking Anual" + (f" - {jogo.capitalize()}" if jogo else "")
-        mensagem = await criar_embed_ranking(partidas, titulo)
-        await interaction.response.send_message(mensagem)
+@app_commands.guild_only()
+@app_commands.describe(
+    jogo="(Opcional) Filtra por um jogo específico",
+    modo="(Opcional) pontos (padrão) ou rating (Elo pela ordem de chegada, com pelo menos 5 partidas)"
+)
+@medir_comando
+async def rank_anual(interaction: discord.Interaction, jogo: str = None, modo: Literal["pontos", "rating"] = "pontos"):
+    try:
+        titulo = ("Rating" if modo == "rating" else "Ranking") + " Anual" + (f" - {jogo.capitalize()}" if jogo else "")
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        mensagem = await gerar_ranking(armazem, "ano", jogo, titulo, modo)
+        await responder(interaction, mensagem)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao gerar ranking anual: {str(e)}",
             ephemeral=True
         )
 
 @bot.tree.command(name="rank_all", description="Mostra o ranking de todos os jogos")
-async def rank_all(interaction: discord.Interaction):
+@app_commands.guild_only()
+@app_commands.describe(modo="(Opcional) pontos (padrão) ou rating (Elo pela ordem de chegada, com pelo menos 5 partidas)")
+@medir_comando
+async def rank_all(interaction: discord.Interaction, modo: Literal["pontos", "rating"] = "pontos"):
     try:
-        dados = carregar_dados()
-        jogos = obter_jogos_unicos(dados)
+        await interaction.response.defer()
+        armazem = await guildas.obter(interaction.guild_id)
+        jogos = armazem.jogos()
 
         if not jogos:
-            return await interaction.response.send_message("❌ Nenhuma partida registrada ainda!")
+            return await interaction.followup.send("❌ Nenhuma partida registrada ainda!")
 
-        await interaction.response.defer()
-
-        mensagem_final = ""
-        for jogo in jogos:
-            partidas = filtrar_partidas_por_periodo_e_jogo(dados, None, jogo)
-            if partidas:
-                ranking = await criar_embed_ranking(partidas, f"Ranking - {jogo.capitalize()}")
-                mensagem_final += f"{ranking}\n\n"
+        mensagem_final = await gerar_rankings_jogos(armazem, interaction.guild, modo)
 
         if not mensagem_final:
             return await interaction.followup.send("❌ Nenhum ranking disponível!")
@@ -491,68 +3183,36 @@ async def rank_all(interaction: discord.Interaction):
         for parte in partes:
             await interaction.followup.send(parte)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao gerar rankings: {str(e)}",
             ephemeral=True
         )
 
 @bot.tree.command(name="rank_jogador", description="Mostra estatísticas de um jogador específico")
+@app_commands.guild_only()
 @app_commands.describe(jogador="Jogador para ver as estatísticas")
+@medir_comando
 async def rank_jogador(interaction: discord.Interaction, jogador: discord.Member):
     try:
-        dados = carregar_dados()
-        jogador_id = str(jogador.id)
-
-        estatisticas = {
-            "pontos": 0,
-            "partidas": 0,
-            "vitorias": 0,
-            "fracassos": 0,
-            "por_jogo": {}
-        }
-
-        for partida in dados["partidas"]:
-            if jogador_id in partida["jogadores"]:
-                pos = partida["jogadores"].index(jogador_id)
-                total_jogadores = len(partida["jogadores"])
-                pontos = calcular_pontos(pos, total_jogadores)
-
-                estatisticas["pontos"] += pontos
-                estatisticas["partidas"] += 1
-
-                if pos == 0:
-                    estatisticas["vitorias"] += 1
-                if pos == total_jogadores - 1:
-                    estatisticas["fracassos"] += 1
-
-                # Estatísticas por jogo
-                jogo = partida["jogo"].lower()
-                if jogo not in estatisticas["por_jogo"]:
-                    estatisticas["por_jogo"][jogo] = {
-                        "pontos": 0,
-                        "partidas": 0,
-                        "vitorias": 0,
-                        "fracassos": 0
-                    }
-
-                estatisticas["por_jogo"][jogo]["pontos"] += pontos
-                estatisticas["por_jogo"][jogo]["partidas"] += 1
-                if pos == 0:
-                    estatisticas["por_jogo"][jogo]["vitorias"] += 1
-                if pos == total_jogadores - 1:
-                    estatisticas["por_jogo"][jogo]["fracassos"] += 1
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        estatisticas = armazem.estatisticas_jogador(str(jogador.id))
 
         if estatisticas["partidas"] == 0:
-            return await interaction.response.send_message(
+            return await responder(
+                interaction,
                 f"ℹ️ {jogador.display_name} não possui partidas registradas!",
                 ephemeral=True
             )
 
         media = estatisticas["pontos"] / estatisticas["partidas"]
+        rating = armazem.rating_jogador(str(jogador.id))
+        linha_rating = f"📈 **Rating (Elo):** {round(rating)}\n" if rating is not None else ""
 
         mensagem = (
             f"**📊 Estatísticas de {jogador.display_name}**\n\n"
             f"🏆 **Pontuação Total:** {estatisticas['pontos']}\n"
+            f"{linha_rating}"
             f"🎮 **Partidas Jogadas:** {estatisticas['partidas']}\n"
             f"🥇 **Vitórias:** {estatisticas['vitorias']}\n"
             f"💀 **Fracassos:** {estatisticas['fracassos']}\n"
@@ -569,33 +3229,229 @@ async def rank_jogador(interaction: discord.Interaction, jogador: discord.Member
                 f"{stats['fracassos']}💀"
             )
 
-        await interaction.response.send_message(mensagem)
+        await responder(interaction, mensagem)
     except Exception as e:
-        await interaction.response.send_message(
+        await responder(
+            interaction,
             f"❌ Erro ao gerar estatísticas do jogador: {str(e)}",
             ephemeral=True
         )
 
+@bot.tree.command(name="h2h", description="Mostra o confronto direto entre dois jogadores")
+@app_commands.guild_only()
+@app_commands.describe(jogador1="Primeiro jogador", jogador2="Segundo jogador")
+@medir_comando
+async def h2h(interaction: discord.Interaction, jogador1: discord.Member, jogador2: discord.Member):
+    try:
+        if jogador1.id == jogador2.id:
+            return await interaction.response.send_message("❌ Escolha dois jogadores diferentes!", ephemeral=True)
+
+        armazem = await guildas.obter(interaction.guild_id, interaction)
+        confrontos = armazem.confronto(str(jogador1.id), str(jogador2.id))
+        if not confrontos:
+            return await responder(
+                interaction,
+                f"ℹ️ {jogador1.display_name} e {jogador2.display_name} ainda não jogaram uma partida juntos!",
+                ephemeral=True
+            )
+
+        geral = confrontos.pop(None)
+        mensagem = (
+            f"**⚔️ {jogador1.display_name} x {jogador2.display_name}**\n\n"
+            f"🎮 **Partidas juntos:** {geral['partidas']}\n"
+            f"🥇 **{jogador1.display_name} na frente:** {geral['vitorias']}\n"
+            f"🥇 **{jogador2.display_name} na frente:** {geral['derrotas']}\n"
+            f"📏 **Diferença média de colocação:** {geral['diferenca_media']:+.2f} "
+            f"(positiva quando {jogador1.display_name} termina na frente)\n\n"
+            f"**🎲 Por Jogo:**\n"
+        )
+
+        for jogo, stats in sorted(confrontos.items(), key=lambda item: -item[1]["partidas"]):
+            mensagem += (
+                f"\n**{jogo.capitalize()}:** "
+                f"{stats['partidas']} partidas | "
+                f"{stats['vitorias']} x {stats['derrotas']} | "
+                f"{stats['diferenca_media']:+.2f}"
+            )
+
+        if len(mensagem) > 2000:
+            mensagem = mensagem[:1990] + "\n…"
+        await responder(interaction, mensagem)
+    except Exception as e:
+        await responder(
+            interaction,
+            f"❌ Erro ao gerar confronto direto: {str(e)}",
+            ephemeral=True
+        )
+
 # ======================
 # COMANDOS DE BACKUP
 # ======================
 @bot.tree.command(name="backup", description="🔵 Cria um backup dos dados (apenas admin)")
+@app_commands.guild_only()
 @app_commands.default_permissions(administrator=True)
+@medir_comando
 async def criar_backup(interaction: discord.Interaction):
     try:
-        criar_backup_automatico()
-        await interaction.response.send_message(
-            "✅ Backup criado com sucesso!",
+        armazem = await guildas.obter(interaction.guild_id, interaction, ephemeral=True)
+        entrada = await armazem.backup_async()
+        if entrada is None:
+            mensagem = "ℹ️ Nada mudou desde o último backup, nenhum arquivo novo foi criado."
+        else:
+            mensagem = f"✅ Backup criado com sucesso! ({entrada['tipo']}: `{entrada['arquivo']}`)"
+        await responder(interaction, mensagem, ephemeral=True)
+    except Exception as e:
+        await responder(
+            interaction,
+            f"❌ Erro ao criar backup: {str(e)}",
+            ephemeral=True
+        )
+
+@bot.tree.command(name="backups", description="🗂️ Lista os backups disponíveis (apenas admin)")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@medir_comando
+async def listar_backups(interaction: discord.Interaction):
+    try:
+        armazem = await guildas.obter(interaction.guild_id, interaction, ephemeral=True)
+        manifesto = await em_executor(ler_manifesto_backups, armazem.caminhos)
+        if not manifesto["backups"]:
+            return await responder(interaction, "❌ Nenhum backup disponível!", ephemeral=True)
+
+        linhas = [
+            f"• `{e['arquivo']}` | {e['tipo']} | {e['partidas']} partidas | "
+            f"{datetime.fromisoformat(e['criado']).strftime('%d/%m/%Y %H:%M')}"
+            for e in manifesto["backups"][-15:]
+        ]
+        await responder(
+            interaction,
+            f"**🗂️ Backups ({len(manifesto['backups'])} no total, mais recentes por último):**\n" + "\n".join(linhas),
             ephemeral=True
         )
     except Exception as e:
-        await interaction.response.send_message(
-            f"❌ Erro ao criar backup: {str(e)}",
+        await responder(interaction, f"❌ Erro ao listar backups: {str(e)}", ephemeral=True)
+
+@bot.tree.command(name="restaurar_backup", description="♻️ Restaura os dados de um backup (apenas admin)")
+@app_commands.guild_only()
+@app_commands.describe(arquivo="(Opcional) Nome do backup listado em /backups; padrão: o mais recente")
+@app_commands.default_permissions(administrator=True)
+@medir_comando
+async def restaurar_backup_cmd(interaction: discord.Interaction, arquivo: str = None):
+    try:
+        await interaction.response.defer(ephemeral=True)
+        armazem = await guildas.obter(interaction.guild_id)
+        dados = await em_executor(restaurar_backup, arquivo, armazem.caminhos)
+        # Com o mesmo arquivo de anos fechados, só o segmento vivo muda; senão o arquivo do backup volta junto
+        anos = await em_executor(restaurar_arquivo_backup, arquivo, armazem.arquivados, armazem.caminhos)
+        await armazem.backup_async()  # Guarda o estado atual antes de sobrescrever
+        if anos is None:
+            await armazem.substituir_async(dados, completo=False)
+        else:
+            dados["partidas"] = [p for ano in sorted(anos) for p in anos[ano]] + dados["partidas"]
+            await armazem.substituir_async(dados)
+        await interaction.followup.send(
+            "✅ Backup restaurado com sucesso!\n"
+            f"📊 Partidas: {armazem.total_partidas()}\n"
+            f"👥 Jogadores: {len(dados['pontuacao'])}",
             ephemeral=True
         )
+    except Exception as e:
+        await interaction.followup.send(f"❌ Erro ao restaurar backup: {str(e)}", ephemeral=True)
+
+@bot.tree.command(name="cache_info", description="🧮 Mostra o uso do cache de rankings (apenas admin)")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@medir_comando
+async def cache_info(interaction: discord.Interaction):
+    try:
+        armazem = await guildas.obter(interaction.guild_id, interaction, ephemeral=True)
+        rankings = armazem.rankings
+        total = rankings.acertos + rankings.falhas
+        taxa = rankings.acertos / total * 100 if total else 0
+        await responder(
+            interaction,
+            f"**🧮 Cache de rankings**\n"
+            f"✅ Acertos: {rankings.acertos}\n"
+            f"❌ Falhas: {rankings.falhas}\n"
+            f"📈 Taxa de acerto: {taxa:.1f}%\n"
+            f"📦 Entradas: {len(rankings.mensagens)}/{rankings.maximo}\n"
+            f"🔢 Versão dos dados: {armazem.versao}\n"
+            f"🗄️ Arquivo: {armazem.arquivados.total_partidas()} partidas "
+            f"(anos: {', '.join(map(str, sorted(armazem.arquivados.anos))) or 'nenhum'}; "
+            f"{armazem.arquivados.partidas_carregadas()} em memória)\n"
+            f"📈 Ratings: {armazem.ratings.posicao} partidas aplicadas "
+            f"({len(armazem.ratings.checkpoints)} checkpoints a cada {RATING_CHECKPOINT_A_CADA})\n"
+            f"🗄️ Guildas em memória: {len(guildas.carregados())} "
+            f"(~{guildas.memoria_estimada() / 1024 / 1024:.1f} de {guildas.orcamento / 1024 / 1024:.0f} MB)",
+            ephemeral=True
+        )
+    except Exception as e:
+        await responder(interaction, f"❌ Erro ao consultar o cache: {str(e)}", ephemeral=True)
+
+def formatar_segundos(valor):
+    return "∞" if valor == float("inf") else (f"{valor * 1000:.0f} ms" if valor < 1 else f"{valor:.1f} s")
+
+@bot.tree.command(name="stats", description="📈 Mostra as métricas de desempenho do bot (apenas admin)")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@medir_comando
+async def stats(interaction: discord.Interaction):
+    try:
+        # Só o registro em memória: o arquivo .prom (e os tamanhos em disco) fica com exportar_metricas
+        rest = {}
+        for rotulos, total in metricas.obter("bot_discord_rest_total").items():
+            comando = dict(rotulos)["comando"]
+            rest[comando] = rest.get(comando, 0) + total
+        erros = {dict(r)["comando"]: total for r, total in metricas.obter("bot_comando_erros_total").items()}
+
+        linhas = ["**📈 Métricas do bot**", "", "**⏱️ Comandos** (execuções | p50 | p99 | REST/execução)"]
+        comandos = sorted(metricas.obter("bot_comando_latencia_segundos").items(), key=lambda item: -item[1].total)
+        for rotulos, hist in comandos:
+            comando = dict(rotulos)["comando"]
+            linha = (f"• /{comando}: {hist.total} | ≤{formatar_segundos(hist.percentil(0.5))} | "
+                     f"≤{formatar_segundos(hist.percentil(0.99))} | {rest.get(comando, 0) / hist.total:.1f}")
+            if erros.get(comando):
+                linha += f" | ❌ {erros[comando]}"
+            linhas.append(linha)
+
+        for titulo, nome, rotulo in (("💾 Armazenamento", "bot_armazenamento_segundos", "operacao"),
+                                     ("🧮 Agregação", "bot_agregacao_segundos", "consulta")):
+            linhas += ["", f"**{titulo}** (chamadas | tempo total | p99)"]
+            for rotulos, hist in sorted(metricas.obter(nome).items()):
+                linhas.append(f"• {dict(rotulos)[rotulo]}: {hist.total} | {formatar_segundos(hist.soma)} | "
+                              f"≤{formatar_segundos(hist.percentil(0.99))}")
+
+        consultas = sum(metricas.obter("bot_consultas_membros_total").values())
+        lag = metricas.obter("bot_event_loop_atraso_segundos").get((), Histograma())
+        linhas += [
+            "",
+            f"🌐 Chamadas REST: {sum(rest.values())} | 👥 Buscas de membros em lote: {consultas}",
+            f"🔁 Lag do event loop: último {formatar_segundos(lag_loop['ultimo'])} | "
+            f"máximo {formatar_segundos(lag_loop['maximo'])} | p99 ≤{formatar_segundos(lag.percentil(0.99))}",
+        ]
+
+        tamanhos = {}  # Da última exportação
+        for rotulos, tamanho in metricas.obter("bot_arquivo_dados_bytes").items():
+            guild_id = dict(rotulos)["guild"]
+            tamanhos[guild_id] = tamanhos.get(guild_id, 0) + tamanho
+        for armazem in guildas.carregados():
+            guild_id = armazem.guild_id
+            marcador = " (este servidor)" if guild_id == interaction.guild_id else ""
+            disco = f"{tamanhos[guild_id] / 1024 / 1024:.2f} MB em disco" if guild_id in tamanhos else "disco: na próxima exportação"
+            linhas.append(f"🗄️ Guilda {guild_id}{marcador}: {armazem.total_partidas()} partidas | {disco}")
+        linhas.append(f"📄 Exportado a cada {METRICAS_INTERVALO} s em `{METRICAS_FILE}`")
+
+        mensagem = "\n".join(linhas)
+        if len(mensagem) > 2000:
+            mensagem = mensagem[:1990] + "\n…"
+        await interaction.response.send_message(mensagem, ephemeral=True)
+    except Exception as e:
+        await interaction.response.send_message(f"❌ Erro ao coletar métricas: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="reset_data", description="🔴 RESETA todos os dados (apenas admin)")
+@app_commands.guild_only()
 @app_commands.default_permissions(administrator=True)
+@medir_comando
 async def reset_data(interaction: discord.Interaction, confirmacao: str):
     if confirmacao.lower() != "confirmar-reset-total":
         return await interaction.response.send_message(
@@ -604,21 +3460,58 @@ async def reset_data(interaction: discord.Interaction, confirmacao: str):
         )
 
     try:
-        criar_backup_automatico()
-        with open(DADOS_FILE, "w") as f:
-            json.dump({"partidas": [], "pontuacao": {}}, f)
-
-        await interaction.response.send_message(
-            "✅ Banco de dados resetado com sucesso! Todos os registros foram apagados.",
+        armazem = await guildas.obter(interaction.guild_id, interaction, ephemeral=True)
+        await armazem.backup_async()
+        arquivadas = armazem.arquivados.total_partidas()
+        await armazem.substituir_async({"partidas": [], "pontuacao": {}})
+
+        mensagem = "✅ Banco de dados resetado com sucesso! Todos os registros foram apagados."
+        if arquivadas:
+            mensagem += f"\n🗄️ As {arquivadas} partidas dos anos arquivados foram guardadas na pasta de backups."
+        await responder(interaction, mensagem, ephemeral=True)
+    except Exception as e:
+        await responder(
+            interaction,
+            f"❌ Erro ao resetar: {str(e)}",
             ephemeral=True
         )
-    except Exception as e:
+
+@bot.tree.command(name="configurar", description="⚙️ Configura o bot neste servidor (apenas admin)")
+@app_commands.guild_only()
+@app_commands.describe(
+    canal="(Opcional) Canal dos rankings automáticos",
+    minimo_jogadores="(Opcional) Mínimo de jogadores para registrar uma partida"
+)
+@app_commands.default_permissions(administrator=True)
+@medir_comando
+async def configurar(interaction: discord.Interaction, canal: discord.TextChannel = None,
+                     minimo_jogadores: app_commands.Range[int, MINIMO_JOGADORES, len(POSICOES)] = None):
+    try:
+        valores = {}
+        if canal is not None:
+            valores["canal_ranking"] = canal.id
+        if minimo_jogadores is not None:
+            valores["minimo_jogadores"] = minimo_jogadores
+        if valores:
+            config = await guildas.configurar(interaction.guild_id, **valores)
+            if canal is not None:
+                agendador_alterado.set()
+        else:
+            config = await guildas.obter_config(interaction.guild_id)
+
+        canal_atual = f"<#{config['canal_ranking']}>" if config["canal_ranking"] else "nenhum (sem rankings automáticos)"
         await interaction.response.send_message(
-            f"❌ Erro ao resetar: {str(e)}",
+            f"**⚙️ Configuração{' atualizada' if valores else ''}**\n"
+            f"📣 Canal de rankings: {canal_atual}\n"
+            f"👥 Mínimo de jogadores: {config['minimo_jogadores']}",
             ephemeral=True
         )
+    except Exception as e:
+        await interaction.response.send_message(f"❌ Erro ao configurar: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="debug_files", description="Mostra estrutura de arquivos")
+@app_commands.guild_only()
+@medir_comando
 async def debug_files(interaction: discord.Interaction):
     try:
         import os
@@ -630,14 +3523,17 @@ async def debug_files(interaction: discord.Interaction):
             for filename in filenames:
                 files.append(os.path.join(root, filename))
 
-        # Verifica se o arquivo de dados existe
-        dados_exists = os.path.exists(DADOS_FILE)
+        # Verifica se o arquivo de dados da guilda existe
+        dados_file = guildas.caminhos(interaction.guild_id).dados
+        dados_exists = os.path.exists(dados_file)
 
         # Mostra informações
         message = (
             f"📁 Diretório atual: {os.getcwd()}\n"
             f"📄 Arquivo de dados existe: {dados_exists}\n"
-            f"📄 Caminho completo: {os.path.abspath(DADOS_FILE)}\n\n"
+            f"📄 Caminho completo: {os.path.abspath(dados_file)}\n"
+            f"⏱️ Lag do event loop: último {lag_loop['ultimo'] * 1000:.0f} ms | "
+            f"máximo {lag_loop['maximo'] * 1000:.0f} ms | alertas {lag_loop['alertas']}\n\n"
             f"📂 Arquivos encontrados:\n" + "\n".join(files[:20])  # Limita a 20 arquivos
         )
 
@@ -648,52 +3544,211 @@ async def debug_files(interaction: discord.Interaction):
 # ======================
 # SISTEMA AUTOMÁTICO
 # ======================
+def fim_do_mes(data):
+    return (data.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+def proximo_semanal(depois):
+    """Próximo domingo às 23:59 estritamente depois de `depois`"""
+    alvo = (depois + timedelta(days=(6 - depois.weekday()) % 7)).replace(hour=23, minute=59, second=0, microsecond=0)
+    if alvo <= depois:
+        alvo += timedelta(weeks=1)
+    return alvo
+
+def proximo_mensal(depois):
+    """Próximo último dia do mês às 23:59 estritamente depois de `depois`"""
+    alvo = fim_do_mes(depois).replace(hour=23, minute=59, second=0, microsecond=0)
+    if alvo <= depois:
+        alvo = fim_do_mes(alvo + timedelta(days=1)).replace(hour=23, minute=59, second=0, microsecond=0)
+    return alvo
+
+def proximo_anual(depois):
+    """Próximo 31/12 às 23:59 estritamente depois de `depois`"""
+    alvo = depois.replace(month=12, day=31, hour=23, minute=59, second=0, microsecond=0)
+    if alvo <= depois:
+        alvo = alvo.replace(year=alvo.year + 1)
+    return alvo
+
+# nome do job -> (cálculo do próximo prazo, período do ranking, título)
+JOBS_RANKING = {
+    "semanal": (proximo_semanal, "semana", "Ranking Semanal"),
+    "mensal": (proximo_mensal, "mes", "Ranking Mensal"),
+    "anual": (proximo_anual, "ano", "Ranking Anual"),
+}
+
+def ler_estado_agendador():
+    """{guild_id (str): {job: última execução}}"""
+    if not os.path.exists(AGENDADOR_FILE):
+        return {}
+    try:
+        with open(AGENDADOR_FILE, "r", encoding="utf-8") as f:
+            estado = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Estado do agendador ilegível, recomeçando: {e}")
+        return {}
+    if set(estado) & set(JOBS_RANKING):
+        estado = {str(GUILD_ID): estado}  # Formato antigo, de uma guilda só
+    return estado
+
+def salvar_estado_agendador(estado):
+    temp_file = AGENDADOR_FILE + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temp_file, AGENDADOR_FILE)
+
+# Acorda o agendador quando o /configurar muda o canal de rankings de alguma guilda
+agendador_alterado = asyncio.Event()
+
+async def aguardar_agendador(segundos=None):
+    """Dorme até `segundos` (None: sem limite) ou até alguém sinalizar agendador_alterado"""
+    try:
+        await asyncio.wait_for(agendador_alterado.wait(), timeout=segundos)
+    except asyncio.TimeoutError:
+        pass
+    agendador_alterado.clear()
+
+async def executar_job_ranking(guild_id, nome, canal_id, prazo, estado, agora):
+    """Posta um ranking vencido e marca o job como feito. Sem o canal, o prazo é pulado:
+    continuaria vencido e o agendador tentaria de novo sem parar."""
+    _, periodo, titulo = JOBS_RANKING[nome]
+    with guildas.fixada(guild_id):
+        canal = bot.get_channel(canal_id)
+        armazem = None
+        if not canal:
+            print(f"❌ Canal de rankings ({canal_id}) da guilda {guild_id} não encontrado! {titulo} pulado")
+        else:
+            armazem = await guildas.obter(guild_id)
+            mensagem = await gerar_ranking(armazem, periodo, None, titulo)
+            await canal.send(mensagem)
+        estado[str(guild_id)][nome] = agora.isoformat()
+        await em_executor(salvar_estado_agendador, {g: dict(jobs) for g, jobs in estado.items()})
+        if armazem is not None:
+            print(f"📣 {titulo} enviado para a guilda {guild_id} (prazo {prazo.strftime('%d/%m/%Y %H:%M')})")
+            await armazem.backup_async()
+
 async def enviar_rankings_automaticos():
+    """Dorme até o próximo prazo dos jobs de todas as guildas com canal configurado;
+    posts perdidos enquanto o bot estava fora são enviados ao voltar"""
     await bot.wait_until_ready()
-    canal = bot.get_channel(CANAL_RANKING_ID)
-    if not canal:
-        print(f"❌ Canal de rankings ({CANAL_RANKING_ID}) não encontrado!")
-        return
 
-    while not bot.is_closed():
-        now = datetime.now()
+    estado = await em_executor(ler_estado_agendador)
+    inicio = datetime.now().isoformat()
+    anunciado = None
+    adiados = {}  # (guild_id, job) -> quando tentar de novo um job que falhou
 
+    while not bot.is_closed():
         try:
-            # Domingo às 23:59 - Ranking Semanal
-            if now.weekday() == 6 and now.hour == 23 and now.minute == 59:
-                dados = carregar_dados()
-                partidas = filtrar_partidas_por_periodo_e_jogo(dados, "semana")
-                mensagem = await criar_embed_ranking(partidas, "Ranking Semanal")
-                await canal.send(mensagem)
-                criar_backup_automatico()
-
-            # Último dia do mês às 23:59 - Ranking Mensal
-            if (now + timedelta(days=1)).month != now.month and now.hour == 23 and now.minute == 59:
-                dados = carregar_dados()
-                partidas = filtrar_partidas_por_periodo_e_jogo(dados, "mes")
-                mensagem = await criar_embed_ranking(partidas, "Ranking Mensal")
-                await canal.send(mensagem)
-                criar_backup_automatico()
-
-            # 31/12 às 23:59 - Ranking Anual
-            if now.month == 12 and now.day == 31 and now.hour == 23 and now.minute == 59:
-                dados = carregar_dados()
-                partidas = filtrar_partidas_por_periodo_e_jogo(dados, "ano")
-                mensagem = await criar_embed_ranking(partidas, "Ranking Anual")
-                await canal.send(mensagem)
-                criar_backup_automatico()
-
-            await asyncio.sleep(60)
+            canais = await guildas.guildas_com_canal()
+            prazos = {}
+            for guild_id in canais:
+                # Primeira execução da guilda: não posta rankings retroativos
+                ultimos = estado.setdefault(str(guild_id), {})
+                for nome, (proximo, _, _) in JOBS_RANKING.items():
+                    prazo = proximo(datetime.fromisoformat(ultimos.setdefault(nome, inicio)))
+                    prazos[(guild_id, nome)] = max(prazo, adiados.get((guild_id, nome), prazo))
+            if not prazos:
+                await aguardar_agendador()  # Nenhum canal configurado ainda
+                continue
+
+            proximo_prazo = min(prazos.values())
+            espera = (proximo_prazo - datetime.now()).total_seconds()
+            if espera > 0:
+                if proximo_prazo != anunciado:
+                    print(f"⏰ Próximo ranking automático em {proximo_prazo.strftime('%d/%m/%Y %H:%M')}")
+                    anunciado = proximo_prazo
+                # Um canal configurado nesse meio-tempo acorda antes do prazo: recalcula
+                await aguardar_agendador(espera)
+                continue
+
+            agora = datetime.now()
+            for (guild_id, nome), prazo in prazos.items():
+                if prazo > agora:
+                    continue
+                # Cada job falha sozinho: os das outras guildas seguem, e ele é tentado de novo mais tarde
+                try:
+                    await executar_job_ranking(guild_id, nome, canais[guild_id], prazo, estado, agora)
+                    adiados.pop((guild_id, nome), None)
+                except Exception as e:
+                    print(f"⚠️ Erro no ranking automático '{nome}' da guilda {guild_id}: {e}")
+                    adiados[(guild_id, nome)] = agora + timedelta(seconds=AGENDADOR_REPETIR)
         except Exception as e:
             print(f"⚠️ Erro no sistema automático: {e}")
             await asyncio.sleep(60)
 
+async def monitorar_lag_loop():
+    """Mede quanto o event loop atrasa para acordar de um sleep curto"""
+    loop = asyncio.get_running_loop()
+    while not bot.is_closed():
+        inicio = loop.time()
+        await asyncio.sleep(LAG_INTERVALO)
+        atraso = max(0.0, loop.time() - inicio - LAG_INTERVALO)
+
+        lag_loop["ultimo"] = atraso
+        metricas.observar("bot_event_loop_atraso_segundos", atraso)
+        lag_loop["maximo"] = max(lag_loop["maximo"], atraso)
+        if atraso >= LAG_ALERTA:
+            lag_loop["alertas"] += 1
+            print(f"⚠️ Event loop atrasado em {atraso * 1000:.0f} ms")
+
+def gravar_metricas(guildas_ativas):
+    """Atualiza os medidores de dados e grava o arquivo de métricas (roda no executor)"""
+    metricas.remover("bot_partidas")
+    metricas.remover("bot_arquivo_dados_bytes")
+    for guild_id, partidas, caminhos in guildas_ativas:
+        metricas.definir("bot_partidas", partidas, guild=guild_id)
+        for arquivo in (caminhos.dados, caminhos.journal, caminhos.sqlite):
+            if os.path.exists(arquivo):
+                metricas.definir("bot_arquivo_dados_bytes", os.path.getsize(arquivo),
+                                 guild=guild_id, arquivo=os.path.basename(arquivo))
+        if os.path.isdir(caminhos.arquivo):
+            for nome in os.listdir(caminhos.arquivo):
+                metricas.definir("bot_arquivo_dados_bytes", os.path.getsize(os.path.join(caminhos.arquivo, nome)),
+                                 guild=guild_id, arquivo=f"arquivo/{nome}")
+
+    temp_file = METRICAS_FILE + ".tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        f.write(metricas.prometheus())
+    os.replace(temp_file, METRICAS_FILE)
+
+async def exportar_metricas():
+    """Exporta as métricas periodicamente para METRICAS_FILE"""
+    while not bot.is_closed():
+        await asyncio.sleep(METRICAS_INTERVALO)
+        try:
+            await atualizar_metricas()
+        except Exception as e:
+            print(f"⚠️ Erro ao exportar métricas: {e}")
+
+async def atualizar_metricas():
+    ativas = [(a.guild_id, a.total_partidas(), a.caminhos) for a in guildas.carregados()]
+    await em_executor(gravar_metricas, ativas)
+
+async def liberar_guildas_ociosas():
+    """Descarrega periodicamente as guildas sem comandos recentes e arquiva os anos que fecharam"""
+    while not bot.is_closed():
+        await asyncio.sleep(GUILDAS_VERIFICAR)
+        try:
+            await guildas.liberar()
+            for armazem in guildas.carregados():
+                if armazem.precisa_arquivar():
+                    await armazem.arquivar_async()
+        except Exception as e:
+            print(f"⚠️ Erro ao liberar guildas ociosas: {e}")
+
+tarefa_rankings = None
+tarefa_lag = None
+tarefa_guildas = None
+tarefa_metricas = None
+
 # ======================
 # EVENTOS DO BOT
 # ======================
 @bot.event
 async def on_ready():
-    init_persistence()  # Garante que os diretórios e arquivos existam
+    global tarefa_rankings, tarefa_lag, tarefa_guildas, tarefa_metricas
+    await em_executor(init_persistence)  # Garante que os diretórios e arquivos existam
+    # A guilda original já sobe carregada; as demais carregam no primeiro comando.
+    # Reconexões reaproveitam o que estiver em memória.
+    await guildas.obter(GUILD_ID)
 
     # Cabeçalho de inicialização
     print("\n" + "="*50)
@@ -702,7 +3757,8 @@ async def on_ready():
     print(f"🔷 Nome: {bot.user.name}")
     print(f"🔷 ID: {bot.user.id}")
     print(f"🔷 Versão Discord.py: {discord.__version__}")
-    print(f"🔷 Caminho dos dados: {os.path.abspath(DADOS_FILE)}")
+    print(f"🔷 Caminho dos dados: {os.path.abspath(DATA_DIR)}")
+    print(f"🔷 Guildas: {len(bot.guilds)}")
     print("="*50)
 
     # Sincronização de comandos
@@ -720,13 +3776,31 @@ async def on_ready():
         type=discord.ActivityType.watching,
         name="/game e /rank"
     ))
-    bot.loop.create_task(enviar_rankings_automaticos())
+    # Reconexões disparam on_ready de novo: cada tarefa só é criada se ainda não estiver rodando
+    if tarefa_rankings is None or tarefa_rankings.done():
+        tarefa_rankings = bot.loop.create_task(enviar_rankings_automaticos())
+    if tarefa_lag is None or tarefa_lag.done():
+        tarefa_lag = bot.loop.create_task(monitorar_lag_loop())
+    if tarefa_guildas is None or tarefa_guildas.done():
+        tarefa_guildas = bot.loop.create_task(liberar_guildas_ociosas())
+    if tarefa_metricas is None or tarefa_metricas.done():
+        tarefa_metricas = bot.loop.create_task(exportar_metricas())
 
     print("\n" + "="*50)
     print("✅ BOT PRONTO PARA USO")
     print(f"🕒 Última inicialização: {datetime.now().strftime('%H:%M:%S')}")
     print("="*50 + "\n")
 
+@bot.event
+async def on_member_update(before, after):
+    if after.guild.id in guildas.armazens:  # Só guildas ativas ocupam o cache de nomes
+        cache_nomes.guardar(after.guild.id, after.id, after.display_name)
+
+@bot.event
+async def on_member_join(member):
+    if member.guild.id in guildas.armazens:
+        cache_nomes.guardar(member.guild.id, member.id, member.display_name)
+
 # ======================
 # COMANDOS DE ADMINISTRAÇÃO
 # ======================
@@ -756,11 +3830,11 @@ if __name__ == "__main__":
             json.dump({"partidas": [], "pontuacao": {}}, f)
 
     # Registra backup automático ao sair
-    atexit.register(criar_backup_automatico)
+    atexit.register(criar_backups_guildas)
 
     try:
         bot.run(TOKEN)
     except Exception as e:
         print(f"❌ Erro fatal: {e}")
         traceback.print_exc()
-        criar_backup_automatico()
\ No newline at end of file
+        criar_backups_guildas()
\ No newline at end of file
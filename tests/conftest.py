@@ -0,0 +1,11 @@
+import pytest
+
+import main
+
+@pytest.fixture
+def caminhos(tmp_path, monkeypatch):
+    """Pasta de dados de uma guilda, vazia e isolada em tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    caminhos = main.Caminhos(str(tmp_path / "guilda"))
+    main.init_persistence(caminhos)
+    return caminhos
@@ -0,0 +1,45 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import main
+
+def test_canal_inexistente_pula_o_prazo_sem_travar_o_loop(caminhos, monkeypatch, tmp_path):
+    agendador = tmp_path / "agendador.json"
+    passado = (datetime.now() - timedelta(days=40)).isoformat()
+    agendador.write_text(json.dumps({"1": {nome: passado for nome in main.JOBS_RANKING}}))
+    monkeypatch.setattr(main, "AGENDADOR_FILE", str(agendador))
+
+    async def canais():
+        return {1: 99}
+
+    async def pronto():
+        pass
+
+    consultas = []
+
+    def get_channel(canal_id):
+        # Um loop que gira sem aguardar nada pediria o canal sem parar
+        consultas.append(canal_id)
+        if len(consultas) > 10:
+            raise RuntimeError("agendador preso no mesmo prazo")
+        return None
+
+    monkeypatch.setattr(main.guildas, "guildas_com_canal", canais)
+    monkeypatch.setattr(main.bot, "wait_until_ready", pronto)
+    monkeypatch.setattr(main.bot, "get_channel", get_channel)
+
+    async def cenario():
+        tarefa = asyncio.create_task(main.enviar_rankings_automaticos())
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        tarefa.cancel()
+
+    asyncio.run(cenario())
+
+    estado = json.loads(agendador.read_text())["1"]
+    vencidos = [nome for nome, (proximo, _, _) in main.JOBS_RANKING.items()
+                if proximo(datetime.fromisoformat(passado)) <= datetime.now()]
+    assert len(consultas) == len(vencidos)
+    for nome in main.JOBS_RANKING:
+        assert (estado[nome] != passado) == (nome in vencidos)
@@ -0,0 +1,81 @@
+import asyncio
+import gzip
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from benchmarks.gerador import gerar_dados
+
+import main
+
+@pytest.fixture
+def historico(caminhos):
+    """Dois anos e meio de partidas gravados no dados.json, ainda sem arquivo"""
+    dados = gerar_dados(2000, jogadores=30, jogos=4, dias=900, semente=14)
+    main.salvar_dados(dados, caminhos.dados)
+    return dados["partidas"]
+
+def carregar(caminhos):
+    armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+    armazem.carregar()
+    return armazem
+
+def test_anos_fechados_saem_do_segmento_vivo_sem_perder_nada(caminhos, historico, monkeypatch):
+    armazem = carregar(caminhos)
+    assert armazem.arquivados.anos and len(armazem.dados["partidas"]) < len(historico)
+    assert armazem.arquivados.todas_partidas() + list(armazem.dados["partidas"]) == historico
+    assert armazem.estatisticas() == main.IndicesDerivados(historico).estatisticas()
+
+    # Recarregar lê o mesmo estado, sem arquivar de novo
+    recarregado = carregar(caminhos)
+    assert recarregado.dados == armazem.dados and recarregado.arquivados.anos == armazem.arquivados.anos
+
+    # Gravar de novo anos já arquivados (queda entre o arquivo e o dados.json) não duplica nada
+    ano = min(armazem.arquivados.anos)
+    assert armazem.arquivados.arquivar({ano: armazem.arquivados.ler_partidas(ano)}) == 0
+
+    # Mais um ano fecha com a guilda em memória
+    corte_arquivo = main.corte_arquivo
+    monkeypatch.setattr(main, "corte_arquivo", lambda agora=None: corte_arquivo(datetime.now() + timedelta(days=366)))
+    anos = set(armazem.arquivados.anos)
+    asyncio.run(armazem.arquivar_async())
+    assert set(armazem.arquivados.anos) > anos
+    assert armazem.total_partidas() == len(historico)
+    assert armazem.estatisticas() == main.IndicesDerivados(historico).estatisticas()
+    recarregado = carregar(caminhos)
+    assert recarregado.dados == armazem.dados and recarregado.arquivados.anos == armazem.arquivados.anos
+
+def test_backup_guarda_os_segmentos_uma_vez_e_restaura_o_arquivo(caminhos, historico):
+    armazem = carregar(caminhos)
+    anos = dict(armazem.arquivados.anos)
+    entrada = main.criar_backup_automatico(armazem)
+    assert set(entrada["anos_arquivados"]) == {str(ano) for ano in anos}
+    copias = sorted(os.listdir(caminhos.backups_arquivo))
+    assert copias == sorted(f"{e['hash']}.json.gz" for e in anos.values())
+    momentos = [os.path.getmtime(os.path.join(caminhos.backups_arquivo, nome)) for nome in copias]
+
+    async def nova_partida():
+        await armazem.registrar_partida_async(dict(armazem.dados["partidas"][-1]))
+    asyncio.run(nova_partida())
+    segundo = main.criar_backup_automatico(armazem)
+    assert segundo["tipo"] == "delta"
+    assert [os.path.getmtime(os.path.join(caminhos.backups_arquivo, nome)) for nome in copias] == momentos
+
+    # Outro histórico no lugar (reset): restaurar traz de volta também os anos arquivados
+    asyncio.run(armazem.substituir_async({"partidas": [], "pontuacao": {}}))
+    assert not armazem.arquivados.anos
+    por_ano = main.restaurar_arquivo_backup(segundo["arquivo"], armazem.arquivados, caminhos)
+    dados = main.restaurar_backup(segundo["arquivo"], caminhos)
+    dados["partidas"] = [p for ano in sorted(por_ano) for p in por_ano[ano]] + dados["partidas"]
+    asyncio.run(armazem.substituir_async(dados))
+    assert {ano: e["hash"] for ano, e in armazem.arquivados.anos.items()} == {ano: e["hash"] for ano, e in anos.items()}
+    assert armazem.total_partidas() == len(historico) + 1
+
+    # Com o mesmo arquivo, nada a ler; com a cópia corrompida, a restauração recusa
+    assert main.restaurar_arquivo_backup(segundo["arquivo"], armazem.arquivados, caminhos) is None
+    copia = os.path.join(caminhos.backups_arquivo, copias[0])
+    os.chmod(copia, 0o644)
+    with gzip.open(copia, "wb") as f:
+        f.write(b'{"ano": 0, "partidas": []}')
+    with pytest.raises(ValueError):
+        main.restaurar_arquivo_backup(segundo["arquivo"], None, caminhos)
@@ -0,0 +1,84 @@
+import os
+from datetime import datetime, timedelta
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+AGORA = datetime(2026, 3, 1, 12, 0)
+
+def historico(partidas):
+    return {"partidas": partidas, "pontuacao": main.recalcular_pontuacao(partidas)}
+
+def test_delta_so_quando_o_snapshot_e_prefixo_do_historico(caminhos):
+    partidas = gerar_dados(40, jogadores=12, jogos=3, semente=2)["partidas"]
+    manifesto = {"backups": []}
+
+    snapshot = main.registrar_backup(manifesto, historico(partidas[:20]), AGORA, caminhos)
+    delta = main.registrar_backup(manifesto, historico(partidas[:30]), AGORA + timedelta(hours=1), caminhos)
+    assert snapshot["tipo"] == "snapshot"
+    assert delta["tipo"] == "delta" and delta["base"] == snapshot["arquivo"]
+
+    # Nada mudou: nenhum arquivo novo
+    assert main.registrar_backup(manifesto, historico(partidas[:30]), AGORA + timedelta(hours=2), caminhos) is None
+
+    main.salvar_manifesto_backups(manifesto, caminhos)
+    assert main.restaurar_backup(delta["arquivo"], caminhos)["partidas"] == partidas[:30]
+
+    # Uma partida do meio do snapshot foi editada: o delta não poderia reconstruí-la
+    editadas = [dict(partida) for partida in partidas[:35]]
+    editadas[5]["jogo"] = "Outro jogo"
+    novo = main.registrar_backup(manifesto, historico(editadas), AGORA + timedelta(hours=3), caminhos)
+    assert novo["tipo"] == "snapshot"
+    main.salvar_manifesto_backups(manifesto, caminhos)
+    assert main.restaurar_backup(caminhos=caminhos)["partidas"] == editadas
+
+def test_retencao_mantem_um_por_balde_e_os_snapshots_dos_deltas(caminhos):
+    partidas = gerar_dados(300, jogadores=12, jogos=3, semente=3)["partidas"]
+    manifesto = {"backups": []}
+    base = main.registrar_backup(manifesto, historico(partidas[:10]), AGORA - timedelta(days=400), caminhos)
+
+    # Um backup a cada 6 horas nos últimos 60 dias, todos deltas do snapshot acima
+    criados = [AGORA - timedelta(hours=6 * n) for n in range(240, -1, -1)]
+    for n, criado in enumerate(criados):
+        entrada = main.registrar_backup(manifesto, historico(partidas[:11 + n]), criado, caminhos)
+        assert entrada["tipo"] == "delta"
+
+    removidos = main.aplicar_retencao_backups(manifesto, AGORA, caminhos)
+    mantidos = manifesto["backups"]
+    assert removidos and len(mantidos) + len(removidos) == len(criados) + 1
+
+    # A base dos deltas ficou, mesmo fora de todas as janelas
+    assert base["arquivo"] in {e["arquivo"] for e in mantidos}
+    assert mantidos[-1]["criado"] == AGORA.isoformat()
+
+    # No máximo um backup por hora (últimas 24 h), por dia (30 dias) e por mês (o resto)
+    baldes = []
+    for entrada in mantidos[1:]:
+        idade = AGORA - datetime.fromisoformat(entrada["criado"])
+        formato = "%Y%m%d%H" if idade <= timedelta(hours=24) else "%Y%m%d" if idade <= timedelta(days=30) else "%Y%m"
+        baldes.append(datetime.fromisoformat(entrada["criado"]).strftime(formato))
+    assert len(baldes) == len(set(baldes))
+
+    for entrada in removidos:
+        assert not os.path.exists(os.path.join(caminhos.backups, entrada["arquivo"]))
+    main.salvar_manifesto_backups(manifesto, caminhos)
+    for entrada in mantidos:
+        assert os.path.exists(os.path.join(caminhos.backups, entrada["arquivo"]))
+        quantidade = entrada["partidas"]
+        assert main.restaurar_backup(entrada["arquivo"], caminhos)["partidas"] == partidas[:quantidade]
+
+def test_prefixo_mantido_so_passa_pelas_partidas_novas(caminhos, monkeypatch):
+    partidas = gerar_dados(60, jogadores=12, jogos=3, semente=4)["partidas"]
+    manifesto = {"backups": []}
+    prefixos = main.PrefixosHistorico()
+    main.registrar_backup(manifesto, historico(partidas[:40]), AGORA, caminhos, prefixos)
+
+    lidas = []
+    atualizar_prefixo = main.atualizar_prefixo
+    monkeypatch.setattr(main, "atualizar_prefixo", lambda h, novas: lidas.append(len(novas)) or atualizar_prefixo(h, novas))
+    delta = main.registrar_backup(manifesto, historico(partidas[:50]), AGORA + timedelta(hours=1), caminhos, prefixos)
+    assert delta["tipo"] == "delta" and sum(lidas) == 10
+
+    # Mesmo prefixo que um hash feito do zero
+    assert delta["prefixo"] == main.PrefixosHistorico().prefixo(partidas, 50)
@@ -0,0 +1,41 @@
+import asyncio
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def test_ranking_em_cache_ate_a_versao_dos_dados_mudar(caminhos, monkeypatch):
+    partidas = gerar_dados(40, jogadores=12, jogos=3, dias=3, semente=6)["partidas"]
+    montados = []
+    montar_ranking = main.montar_ranking
+
+    async def contar(estatisticas, titulo, guild, modo="pontos"):
+        montados.append(titulo)
+        return await montar_ranking(estatisticas, titulo, guild, modo)
+    monkeypatch.setattr(main, "montar_ranking", contar)
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+        for partida in partidas[:30]:
+            await armazem.registrar_partida_async(partida)
+
+        primeiro = await main.gerar_ranking(armazem, None, None, "Ranking Geral")
+        assert await main.gerar_ranking(armazem, None, None, "Ranking Geral") is primeiro
+        assert len(montados) == 1 and armazem.rankings.acertos == 1
+
+        # Nova partida: a versão muda e a mensagem é refeita com os novos totais
+        versao = armazem.versao
+        for partida in partidas[30:]:
+            await armazem.registrar_partida_async(partida)
+        assert armazem.versao > versao
+        atualizado = await main.gerar_ranking(armazem, None, None, "Ranking Geral")
+        assert len(montados) == 2 and atualizado != primeiro
+        estatisticas = {}
+        for partida in partidas:
+            for pos, jogador_id in enumerate(partida["jogadores"]):
+                main.acumular_estatisticas(estatisticas, jogador_id, pos, len(partida["jogadores"]))
+        esperado = await montar_ranking(estatisticas, "Ranking Geral", None)
+        assert atualizado == esperado
+
+    asyncio.run(cenario())
@@ -0,0 +1,45 @@
+import gc
+import json
+import random
+import tracemalloc
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def test_colunas_devolvem_as_partidas_na_ordem_de_registro():
+    partidas = gerar_dados(300, jogadores=20, jogos=4, dias=60, semente=8)["partidas"]
+    random.Random(8).shuffle(partidas)  # Registro fora da ordem cronológica (upload, journal)
+    esperadas = json.loads(json.dumps(partidas))
+    indices = main.IndicesDerivados(partidas)
+
+    assert indices.partidas == esperadas
+    assert indices.partidas[-1] == esperadas[-1] and indices.partidas[10:20] == esperadas[10:20]
+    retrato = indices.partidas.retrato()
+    indices.adicionar(dict(esperadas[0]))
+    assert len(indices.partidas) == len(esperadas) + 1 and retrato == esperadas
+
+    # A linha do tempo continua em ordem cronológica
+    timestamps, ordenadas = indices.linha_do_tempo[None]
+    assert list(timestamps) == sorted(timestamps)
+    assert [indices.colunas.ts[i] for i in ordenadas] == list(timestamps)
+
+def test_colunas_ocupam_menos_que_o_json_load(tmp_path):
+    caminho = tmp_path / "dados.json"
+    main.salvar_dados(gerar_dados(5000, jogadores=500, jogos=10, semente=9), str(caminho))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with open(caminho, "rb") as f:
+            dados = json.load(f)
+        json_load = tracemalloc.get_traced_memory()[0]
+        colunas = main.HistoricoColunar()
+        for partida in dados["partidas"]:
+            colunas.adicionar(partida, main.timestamp_partida(partida))
+        del dados
+        gc.collect()
+        historico = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(colunas) == 5000
+    assert historico * 4 < json_load
@@ -0,0 +1,55 @@
+import asyncio
+import itertools
+
+import pytest
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def confronto_direto(partidas, a, b):
+    """Confrontos de A contra B contados partida a partida"""
+    contagens = {}
+    for partida in partidas:
+        posicoes = {}
+        for pos, jogador_id in enumerate(partida["jogadores"]):
+            posicoes.setdefault(jogador_id, pos)
+        if a not in posicoes or b not in posicoes:
+            continue
+        for jogo in (None, partida["jogo"].lower()):
+            vitorias, derrotas, vantagem = contagens.setdefault(jogo, [0, 0, 0])
+            if posicoes[a] < posicoes[b]:
+                contagens[jogo] = [vitorias + 1, derrotas, vantagem + posicoes[b] - posicoes[a]]
+            else:
+                contagens[jogo] = [vitorias, derrotas + 1, vantagem - (posicoes[a] - posicoes[b])]
+    return {
+        jogo: {"partidas": v + d, "vitorias": v, "derrotas": d, "diferenca_media": vantagem / (v + d)}
+        for jogo, (v, d, vantagem) in contagens.items()
+    }
+
+@pytest.mark.parametrize("variante", ["numpy", "sem_numpy", "tuplas"])
+def test_matriz_de_confrontos_bate_com_a_contagem_direta(caminhos, monkeypatch, variante):
+    if variante == "numpy" and main.np is None:
+        pytest.skip("NumPy não instalado")
+    if variante == "sem_numpy":
+        monkeypatch.setattr(main, "np", None)
+    if variante == "tuplas":
+        monkeypatch.setattr(main, "CONFRONTOS_JOGADORES", 8)  # Estoura as chaves empacotadas
+    monkeypatch.setattr(main, "CONFRONTOS_RECENTES", 50)  # Consolida várias vezes durante o teste
+
+    # Anos arquivados (matrizes gravadas com os segmentos) + segmento vivo + partidas novas
+    partidas = gerar_dados(900, jogadores=15, jogos=3, dias=800, semente=15)["partidas"]
+    main.salvar_dados({"partidas": partidas[:700], "pontuacao": main.recalcular_pontuacao(partidas[:700])}, caminhos.dados)
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+        assert armazem.arquivados.anos
+        for partida in partidas[700:]:
+            await armazem.registrar_partida_async(dict(partida))
+        return armazem
+
+    armazem = asyncio.run(cenario())
+    jogadores = sorted(main.recalcular_pontuacao(partidas))
+    for a, b in itertools.permutations(jogadores[:8], 2):
+        assert armazem.confronto(a, b) == confronto_direto(partidas, a, b)
+    assert armazem.confronto(jogadores[0], "1") == {}
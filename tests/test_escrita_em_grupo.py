@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def partidas_do_journal(caminhos):
+    with open(caminhos.journal, "rb") as f:
+        return [json.loads(linha)["partida"] for linha in f]
+
+def test_rajada_vira_poucas_escritas_e_so_confirma_o_que_esta_no_disco(caminhos, monkeypatch):
+    partidas = gerar_dados(60, jogadores=12, jogos=3, dias=3, semente=11)["partidas"]
+    escritas = []
+    registrar = main.BackendJSON.registrar
+
+    def registrar_medido(backend, lote, indice):
+        escritas.append((len(lote), indice))
+        registrar(backend, lote, indice)
+    monkeypatch.setattr(main.BackendJSON, "registrar", registrar_medido)
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+
+        async def enviar(partida):
+            await armazem.registrar_partida_async(partida)
+            # Confirmada só depois de estar no journal
+            assert partida in partidas_do_journal(caminhos)
+
+        await asyncio.gather(*(enviar(dict(partida)) for partida in partidas))
+        return armazem
+
+    armazem = asyncio.run(cenario())
+    assert sum(tamanho for tamanho, _ in escritas) == len(partidas)
+    assert len(escritas) < len(partidas) // 10
+    assert [indice for _, indice in escritas] == [sum(t for t, _ in escritas[:n]) for n in range(len(escritas))]
+    assert armazem.dados["partidas"] == partidas
+    assert main.BackendJSON(caminhos).carregar()["partidas"] == partidas
+
+def test_falha_na_escrita_recusa_o_grupo_inteiro(caminhos, monkeypatch):
+    partidas = gerar_dados(10, jogadores=12, jogos=3, dias=3, semente=12)["partidas"]
+    registrar = main.BackendJSON.registrar
+    falhas = [OSError("disco cheio")]
+
+    def registrar_falho(backend, lote, indice):
+        if falhas:
+            raise falhas.pop()
+        registrar(backend, lote, indice)
+    monkeypatch.setattr(main.BackendJSON, "registrar", registrar_falho)
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+        resultados = await asyncio.gather(
+            *(armazem.registrar_partida_async(dict(p)) for p in partidas[:5]), return_exceptions=True
+        )
+        assert all(isinstance(r, OSError) for r in resultados)
+        assert len(armazem.dados["partidas"]) == 0 and armazem.dados["pontuacao"] == {}
+
+        await armazem.registrar_partida_async(dict(partidas[5]))
+        return armazem
+
+    armazem = asyncio.run(cenario())
+    assert armazem.dados["partidas"] == partidas[5:6]
+    assert main.BackendJSON(caminhos).carregar()["partidas"] == partidas[5:6]
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+class Resposta:
+    def __init__(self, eventos):
+        self.eventos = eventos
+        self.feita = False
+
+    def is_done(self):
+        return self.feita
+
+    async def defer(self, ephemeral=False):
+        self.eventos.append("defer")
+        self.feita = True
+
+class Interacao:
+    def __init__(self, guild_id, eventos):
+        self.guild_id = guild_id
+        self.response = Resposta(eventos)
+
+def test_guildas_ociosas_e_as_menos_recentes_saem_da_memoria_mas_nao_as_em_uso(caminhos):
+    partidas = gerar_dados(20, jogadores=12, jogos=3, dias=3, semente=13)["partidas"]
+
+    async def cenario():
+        guildas = main.ArmazensGuildas(orcamento=-1)  # Toda guilda passa do orçamento
+        primeira = await guildas.obter(1)
+        for partida in partidas:
+            await primeira.registrar_partida_async(dict(partida))
+
+        # Fixada (comando em andamento): sobrevive à carga de outra guilda
+        with guildas.fixada(1):
+            await guildas.obter(2)
+            assert guildas.armazens.get(1) is primeira
+        # Livre: a menos recente sai quando a próxima é carregada
+        await guildas.obter(3)
+        assert list(guildas.armazens) == [3] and not guildas.em_uso
+
+        # Escrita pendente também segura o armazém
+        terceira = guildas.armazens[3]
+        terceira.fila.append((dict(partidas[0]), asyncio.get_running_loop().create_future()))
+        await guildas.obter(4)
+        assert 3 in guildas.armazens
+        terceira.fila.clear()
+
+        # Ociosidade: sai mesmo com orçamento de sobra
+        guildas.orcamento, guildas.ociosidade = float("inf"), 60
+        guildas.armazens[4].ultimo_uso = time.monotonic() - 120
+        await guildas.obter(5)
+        assert 4 not in guildas.armazens
+
+        # Nada se perde ao descarregar: a próxima carga lê do disco
+        recarregada = await guildas.obter(1)
+        assert recarregada is not primeira and recarregada.dados == primeira.dados
+
+    asyncio.run(cenario())
+
+def test_carga_fria_adia_a_resposta_antes_de_ler_o_disco(caminhos, monkeypatch):
+    eventos = []
+    carregar_async = main.ArmazemDados.carregar_async
+
+    async def carregar_medido(armazem):
+        eventos.append("carga")
+        await carregar_async(armazem)
+    monkeypatch.setattr(main.ArmazemDados, "carregar_async", carregar_medido)
+
+    async def cenario():
+        guildas = main.ArmazensGuildas()
+        await guildas.obter(1, Interacao(1, eventos), ephemeral=True)
+        assert eventos == ["defer", "carga"]
+        # Já em memória: nada a adiar
+        await guildas.obter(1, Interacao(1, eventos))
+        assert eventos == ["defer", "carga"]
+
+    asyncio.run(cenario())
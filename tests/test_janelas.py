@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+from benchmarks.gerador import gerar_dados
+
+import main
+
+@pytest.fixture(scope="module")
+def dados():
+    # Mais de um ano: parte das partidas já saiu do anel de baldes diários
+    return gerar_dados(3000, jogadores=30, jogos=4, dias=420, semente=7)
+
+def contagem_direta(partidas, limite, jogo=None):
+    estatisticas = {}
+    for partida in partidas:
+        if datetime.fromisoformat(partida["data"]) < limite:
+            continue
+        if jogo and partida["jogo"].lower() != jogo.lower():
+            continue
+        for pos, jogador_id in enumerate(partida["jogadores"]):
+            main.acumular_estatisticas(estatisticas, jogador_id, pos, len(partida["jogadores"]))
+    return estatisticas
+
+@pytest.mark.parametrize("periodo", ["semana", "mes", "ano"])
+def test_janelas_dos_baldes_batem_com_a_contagem_direta(dados, periodo):
+    partidas = dados["partidas"]
+    metade = len(partidas) // 2
+    construidos = main.IndicesDerivados(partidas)
+    incrementais = main.IndicesDerivados(partidas[:metade])
+    for partida in partidas[metade:]:
+        incrementais.adicionar(partida)
+
+    limite = main.limite_periodo(periodo)
+    for jogo in (None, partidas[-1]["jogo"]):
+        esperado = contagem_direta(partidas, limite, jogo)
+        assert esperado
+        assert construidos.estatisticas_desde(limite, jogo) == esperado
+        assert incrementais.estatisticas_desde(limite, jogo) == esperado
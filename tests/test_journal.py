@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def partidas_recentes(quantidade, semente=1):
+    return gerar_dados(quantidade, jogadores=12, jogos=3, dias=3, semente=semente)["partidas"]
+
+def test_journal_descarta_linha_truncada_e_recupera_o_resto(caminhos):
+    partidas = partidas_recentes(5)
+    backend = main.BackendJSON(caminhos)
+    backend.carregar()
+    backend.registrar(partidas[:3], 0)
+    backend.registrar(partidas[3:], 3)
+
+    # Queda no meio da última escrita: só parte da linha chegou ao disco
+    with open(caminhos.journal, "rb") as f:
+        conteudo = f.read()
+    valido = conteudo.rindex(b"\n", 0, len(conteudo) - 1) + 1
+    with open(caminhos.journal, "r+b") as f:
+        f.truncate(len(conteudo) - 20)
+
+    recuperado = main.BackendJSON(caminhos)
+    dados = recuperado.carregar()
+    assert dados["partidas"] == partidas[:4]
+    assert dados["pontuacao"] == main.recalcular_pontuacao(partidas[:4])
+    assert recuperado.pendentes == 4
+    assert os.path.getsize(caminhos.journal) == valido
+
+    # O próximo append não fica grudado na cauda descartada
+    recuperado.registrar(partidas[4:], 4)
+    assert main.BackendJSON(caminhos).carregar()["partidas"] == partidas
+
+def test_compactar_consolida_o_journal_no_snapshot(caminhos):
+    partidas = partidas_recentes(30)
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+        for partida in partidas:
+            await armazem.registrar_partida_async(partida)
+        assert armazem.backend.pendentes == len(partidas)
+        assert main.carregar_dados(caminhos)["partidas"] == []  # Por enquanto só no journal
+        await armazem.compactar_async()
+        return armazem
+
+    armazem = asyncio.run(cenario())
+    assert armazem.backend.pendentes == 0
+    assert not os.path.exists(caminhos.journal)
+    snapshot = main.carregar_dados(caminhos)
+    assert snapshot["partidas"] == partidas
+    assert snapshot["pontuacao"] == main.recalcular_pontuacao(partidas)
@@ -0,0 +1,45 @@
+import pytest
+from benchmarks.gerador import gerar_dados
+
+import main
+
+@pytest.fixture(autouse=True)
+def checkpoints_curtos(monkeypatch):
+    monkeypatch.setattr(main, "RATING_CHECKPOINT_A_CADA", 100)
+
+def historico(partidas, tmp_path):
+    arquivados = main.HistoricoArquivado(str(tmp_path / "arquivo"))
+    return main.HistoricoCronologico(arquivados, main.IndicesDerivados(partidas, arquivados))
+
+def do_zero(partidas, tmp_path):
+    return main.RatingsElo().sincronizado(historico(partidas, tmp_path))
+
+def test_checkpoint_que_nao_confere_e_descartado(tmp_path, capsys):
+    partidas = gerar_dados(450, jogadores=20, jogos=3, dias=30, semente=4)["partidas"]
+    ratings = do_zero(partidas, tmp_path)
+    assert [c["posicao"] for c in ratings.checkpoints] == [100, 200, 300, 400]
+    capsys.readouterr()
+
+    # Uma partida entre o 2º e o 3º checkpoint muda de resultado: os checkpoints 300 e 400 não servem mais
+    editadas = [dict(partida) for partida in partidas]
+    editadas[250]["jogadores"] = list(reversed(editadas[250]["jogadores"]))
+    sincronizados = ratings.sincronizado(historico(editadas, tmp_path))
+
+    assert "refeitas a partir da posição 200" in capsys.readouterr().out
+    referencia = do_zero(editadas, tmp_path)
+    assert sincronizados.geral == referencia.geral
+    assert sincronizados.por_jogo == referencia.por_jogo
+    assert [c["impressao"] for c in sincronizados.checkpoints] == [c["impressao"] for c in referencia.checkpoints]
+    assert sincronizados.geral != ratings.geral
+
+def test_historico_sem_checkpoint_valido_recomeca_do_zero(tmp_path, capsys):
+    partidas = gerar_dados(250, jogadores=20, jogos=3, dias=30, semente=5)["partidas"]
+    ratings = do_zero(partidas, tmp_path)
+    capsys.readouterr()
+
+    editadas = [dict(partida) for partida in partidas]
+    editadas[3]["jogo"] = "Outro jogo"
+    sincronizados = ratings.sincronizado(historico(editadas, tmp_path))
+
+    assert "refeitas a partir da posição 0" in capsys.readouterr().out
+    assert sincronizados.geral == do_zero(editadas, tmp_path).geral
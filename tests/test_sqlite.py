@@ -0,0 +1,27 @@
+import asyncio
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def test_sqlite_migra_o_json_e_devolve_o_mesmo_historico(caminhos):
+    dados = gerar_dados(80, jogadores=12, jogos=3, dias=30, semente=5)
+    antigas, novas = dados["partidas"][:60], dados["partidas"][60:]
+    json_backend = main.BackendJSON(caminhos)
+    json_backend.carregar()
+    json_backend.substituir({"partidas": antigas, "pontuacao": main.recalcular_pontuacao(antigas)})
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendSQLite(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+        assert armazem.obter()["partidas"] == antigas  # Migrado do dados.json na primeira abertura
+        for partida in novas:
+            await armazem.registrar_partida_async(partida)
+        armazem.backend.fechar()
+
+    asyncio.run(cenario())
+    sqlite = main.BackendSQLite(caminhos)
+    recarregado = sqlite.carregar()
+    sqlite.fechar()
+    assert recarregado["partidas"] == dados["partidas"]
+    assert recarregado["pontuacao"] == main.recalcular_pontuacao(dados["partidas"])
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+
+from benchmarks.gerador import gerar_dados
+
+import main
+
+def test_upload_resume_diferencas_e_troca_tudo_de_uma_vez(caminhos):
+    # Dois anos e meio: parte do histórico vai para o arquivo de anos fechados
+    partidas = gerar_dados(1500, jogadores=30, jogos=4, dias=900, semente=10)["partidas"]
+    main.salvar_dados({"partidas": partidas[:1200], "pontuacao": main.recalcular_pontuacao(partidas[:1200])}, caminhos.dados)
+    enviadas = partidas[100:]  # 100 removidas (do ano mais antigo), 300 novas
+    upload = os.path.join(caminhos.pasta, "upload.json")
+    with open(upload, "w") as f:
+        json.dump({"partidas": enviadas, "pontuacao": {}}, f)  # Pontuação errada: é recalculada
+
+    async def cenario():
+        armazem = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+        await armazem.carregar_async()
+        assert armazem.arquivados.anos
+        antes = armazem.total_partidas()
+        vista_antiga = main.PaginasDados(None, armazem.dados["partidas"], 0, armazem.arquivados)
+        versao = armazem.versao
+
+        dados, arquivados, indices, divergentes = await main.em_executor(main.preparar_upload, upload, caminhos)
+        assert armazem.total_partidas() == antes  # Nada muda antes da troca
+        anteriores = await armazem.substituir_async(dados, arquivo=upload, indices=indices, arquivados=arquivados)
+        diferencas = await main.em_executor(main.resumir_diferencas, anteriores, (dados, indices, arquivados))
+        return armazem, antes, vista_antiga, versao, divergentes, diferencas
+
+    armazem, antes, vista_antiga, versao, divergentes, diferencas = asyncio.run(cenario())
+    assert antes == 1200
+    assert diferencas["adicionadas"] == 300 and diferencas["removidas"] == 100 and diferencas["jogadores"] > 0
+    assert divergentes > 0
+
+    # Estado novo inteiro em memória, rankings invalidados
+    assert armazem.versao > versao and armazem.total_partidas() == len(enviadas)
+    assert armazem.estatisticas() == main.IndicesDerivados(enviadas).estatisticas()
+    assert armazem.dados["pontuacao"] == main.recalcular_pontuacao(enviadas)
+    assert not os.path.exists(upload)
+
+    # Quem estava navegando no histórico anterior continua vendo o retrato antigo
+    assert vista_antiga.total == 1200
+    vista_antiga.pagina = vista_antiga.paginas - 1
+    asyncio.run(vista_antiga.carregar_pagina())
+    assert vista_antiga.partida(0) == partidas[0]
+
+    # E o disco tem exatamente o que está em memória
+    recarregado = main.ArmazemDados(main.BackendJSON(caminhos), 1, caminhos)
+    recarregado.carregar()
+    assert recarregado.dados == armazem.dados and recarregado.arquivados.anos == armazem.arquivados.anos